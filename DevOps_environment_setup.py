@@ -3,6 +3,19 @@
 import subprocess
 import os
 import shutil
+import json
+import threading
+import hashlib
+import time
+import fcntl
+import contextlib
+import contextvars
+import functools
+import socket
+import urllib.parse
+import urllib.request
+import http.client
+from concurrent.futures import ThreadPoolExecutor
 
 
 # Define categories and their related tools
@@ -13,349 +26,3022 @@ APP_CATEGORIES = {
     "Development Tools": ["code", "python3", "node"]
 }
 
+# Detection runs through a bounded pool
+DETECT_WORKERS = 8
+
+# Inventory shared by the menu options for the rest of the run
+_inventory = None
+_inventory_lock = threading.Lock()
+
+# Places nvm is commonly installed to
+NVM_PATHS = [
+    os.path.expanduser("~/.nvm"),
+    "/usr/local/share/nvm",
+    "/opt/nvm"
+]
+
+# On-disk detection cache, reused across runs until a tool's fingerprint changes
+CACHE_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "devops-setup")
+DETECT_CACHE_FILE = os.path.join(CACHE_DIR, "detect.json")
+USE_DETECT_CACHE = True
+
+_detect_cache = None
+_detect_cache_lock = threading.Lock()
+
+# ✅ Tracing: every subprocess, download and operation becomes a timed span
+# Spans are appended as JSON lines here, across runs, for the `report` command
+TRACE_FILE = os.environ.get("DEVOPS_TRACE") or os.path.join(CACHE_DIR, "trace.jsonl")
+# The trace is rotated to TRACE_FILE + ".1" once it grows past this size
+TRACE_MAX_BYTES = 16 * 1024 * 1024
+TRACE_COMMAND_CHARS = 300
+
+_run_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}"
+_current_span = contextvars.ContextVar("current_span", default=None)
+# Set while a background prefetch runs (see Prefetcher): its downloads are staged,
+# throttled, cancellable and silent
+_prefetch_control = contextvars.ContextVar("prefetch_control", default=None)
+_span_ids = iter(range(1, 1 << 62))
+_trace_lock = threading.Lock()
+_trace_rotated = False
+
+def _write_span(record):
+    global _trace_rotated
+    line = json.dumps(record, default=str) + "\n"
+    with _trace_lock:
+        try:
+            os.makedirs(os.path.dirname(TRACE_FILE) or ".", exist_ok=True)
+            if not _trace_rotated:
+                _trace_rotated = True
+                if os.path.exists(TRACE_FILE) and os.path.getsize(TRACE_FILE) > TRACE_MAX_BYTES:
+                    os.replace(TRACE_FILE, TRACE_FILE + ".1")
+            with open(TRACE_FILE, "a") as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                f.write(line)
+        except OSError:
+            pass
+
+@contextlib.contextmanager
+def span(name, kind="operation", tool=None, **fields):
+    """Times the enclosed block and records it under the span that is currently open.
+
+    Yields the record so the block can add fields such as bytes or exit_code."""
+    parent = _current_span.get()
+    operation = name if kind in ("operation", "step") else parent and parent["operation"]
+    record = {"run": _run_id, "id": next(_span_ids), "parent": parent and parent["id"],
+              "operation": operation, "name": name, "kind": kind,
+              "tool": tool or (parent and parent["tool"]), "started": time.time(), **fields}
+    token = _current_span.set(record)
+    started = time.monotonic()
+    try:
+        yield record
+    except BaseException as e:
+        record.setdefault("error", f"{type(e).__name__}: {e}"[:TRACE_COMMAND_CHARS])
+        raise
+    finally:
+        _current_span.reset(token)
+        record["seconds"] = round(time.monotonic() - started, 4)
+        _write_span(record)
+
+def traced(name, kind="operation"):
+    """Decorator form of span() for functions that make up one whole operation."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name, kind):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def _propagate(fn):
+    """Wraps fn so spans it opens in a worker thread nest under the caller's span,
+    and downloads it starts for a prefetch stay part of that prefetch."""
+    parent = _current_span.get()
+    control = _prefetch_control.get()
+
+    def run_under_parent(*args, **kwargs):
+        token = _current_span.set(parent)
+        control_token = _prefetch_control.set(control)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _prefetch_control.reset(control_token)
+            _current_span.reset(token)
+    return run_under_parent
+
+def _notify(message):
+    """print(), except from a background prefetch, which must not talk over the prompts."""
+    if _prefetch_control.get() is None:
+        print(message)
+
+def _describe_command(args):
+    import shlex
+
+    if isinstance(args, str):
+        return args.split(None, 1)[0] if args.strip() else args, args[:TRACE_COMMAND_CHARS]
+    args = [os.fspath(a) for a in args]
+    return os.path.basename(args[0]), shlex.join(args)[:TRACE_COMMAND_CHARS]
+
+def run_command(args, **kwargs):
+    """subprocess.run() recorded as a span with its command line and exit code."""
+    name, command = _describe_command(args)
+    with span(name, kind="subprocess", command=command, cwd=kwargs.get("cwd")) as record:
+        try:
+            result = subprocess.run(args, **kwargs)
+        except subprocess.CalledProcessError as e:
+            record["exit_code"] = e.returncode
+            raise
+        except subprocess.TimeoutExpired:
+            record["exit_code"] = None
+            raise
+        record["exit_code"] = result.returncode
+        return result
+
+@contextlib.contextmanager
+def popen_command(args, **kwargs):
+    """subprocess.Popen() for streaming readers, recorded as a span once the block exits."""
+    name, command = _describe_command(args)
+    with span(name, kind="subprocess", command=command, cwd=kwargs.get("cwd")) as record:
+        proc = subprocess.Popen(args, **kwargs)
+        try:
+            yield proc
+        except BaseException:
+            proc.kill()
+            raise
+        finally:
+            record["exit_code"] = proc.wait()
+
+# ✅ Connectivity: concurrent TCP/HTTP probes and fastest-source selection
+CONNECTIVITY_TIMEOUT = 2.0
+# Probe results are reused for this many seconds, across runs too
+CONNECTIVITY_TTL = 300
+# Failures are only trusted briefly, so one dropped probe doesn't mean "offline" for minutes
+CONNECTIVITY_NEGATIVE_TTL = 15
+CONNECTIVITY_CACHE_FILE = os.path.join(CACHE_DIR, "connectivity.json")
+
+# TCP endpoints that answer on networks which filter ICMP
+INTERNET_PROBES = [("1.1.1.1", 443), ("8.8.8.8", 53), ("dl.k8s.io", 443)]
+
+# Interchangeable base URLs per download source. Put internal artifact proxies or
+# extra mirrors in a JSON file named by DEVOPS_ENDPOINTS; they are tried alongside these.
+SOURCE_ENDPOINTS = {
+    "kubernetes": ["https://dl.k8s.io", "https://cdn.dl.k8s.io"],
+    "minikube": ["https://github.com/kubernetes/minikube/releases/download",
+                 "https://storage.googleapis.com/minikube/releases"],
+    "helm": ["https://get.helm.sh"],
+    "glab": ["https://gitlab.com/gitlab-org/cli/-/releases"],
+    "node": ["https://nodejs.org/dist"],
+    "github-api": ["https://api.github.com"],
+    "gitlab-api": ["https://gitlab.com/api/v4"],
+}
+
+_connectivity_cache = None
+_connectivity_lock = threading.Lock()
+
+def _connectivity_cached(key):
+    global _connectivity_cache
+    with _connectivity_lock:
+        if _connectivity_cache is None:
+            try:
+                with open(CONNECTIVITY_CACHE_FILE) as f:
+                    _connectivity_cache = json.load(f)
+            except (OSError, ValueError):
+                _connectivity_cache = {}
+        entry = _connectivity_cache.get(key)
+    if not entry:
+        return None
+    failed = entry.get("online") is False or ("latency" in entry and entry["latency"] is None)
+    if time.time() - entry["at"] < (CONNECTIVITY_NEGATIVE_TTL if failed else CONNECTIVITY_TTL):
+        return entry
+    return None
+
+def _connectivity_store(key, **values):
+    with _connectivity_lock:
+        _connectivity_cache[key] = {"at": time.time(), **values}
+        try:
+            os.makedirs(os.path.dirname(CONNECTIVITY_CACHE_FILE), exist_ok=True)
+            tmp_file = f"{CONNECTIVITY_CACHE_FILE}.{os.getpid()}.tmp"
+            with open(tmp_file, "w") as f:
+                json.dump(_connectivity_cache, f)
+            os.replace(tmp_file, CONNECTIVITY_CACHE_FILE)
+        except OSError:
+            pass
+
+def _tcp_probe(host, port, timeout):
+    started = time.monotonic()
+    with socket.create_connection((host, port), timeout=timeout):
+        return time.monotonic() - started
+
+def _head_probe(url, timeout):
+    """Seconds until the endpoint answers a HEAD request; raises if unreachable or failing."""
+    parts = urllib.parse.urlsplit(url)
+    conn, absolute = _open_connection(parts)
+    conn.timeout = timeout
+    target = url if absolute else urllib.parse.urlunsplit(("", "", parts.path or "/", parts.query, ""))
+    started = time.monotonic()
+    try:
+        conn.request("HEAD", target)
+        status = conn.getresponse().status
+    finally:
+        conn.close()
+    if status >= 500:
+        raise OSError(f"HTTP {status} from {url}")
+    return time.monotonic() - started
+
 # ✅ Check internet conection
-def has_internet():
+def has_internet(timeout=CONNECTIVITY_TIMEOUT):
+    cached = _connectivity_cached("internet")
+    if cached:
+        return cached["online"]
+
+    from concurrent.futures import as_completed
+
+    online = False
+    pool = ThreadPoolExecutor(max_workers=len(INTERNET_PROBES))
+    futures = [pool.submit(_tcp_probe, host, port, timeout) for host, port in INTERNET_PROBES]
+    for future in as_completed(futures):
+        if future.exception() is None:
+            online = True
+            break
+    # Don't wait for the slower probes once one has answered
+    pool.shutdown(wait=False, cancel_futures=True)
+    _connectivity_store("internet", online=online)
+    return online
+
+def rank_endpoints(urls, timeout=CONNECTIVITY_TIMEOUT):
+    """Returns [(url, seconds)] for reachable endpoints, fastest first, probed concurrently."""
+    results = {}
+    to_probe = []
+    for url in urls:
+        cached = _connectivity_cached(url)
+        if cached:
+            results[url] = cached["latency"]
+        else:
+            to_probe.append(url)
+
+    if to_probe:
+        def probe(url):
+            try:
+                return _head_probe(url, timeout)
+            except (OSError, http.client.HTTPException):
+                return None
+
+        with ThreadPoolExecutor(max_workers=len(to_probe)) as pool:
+            for url, latency in zip(to_probe, pool.map(probe, to_probe)):
+                _connectivity_store(url, latency=latency)
+                results[url] = latency
+
+    return sorted(((url, latency) for url, latency in results.items() if latency is not None),
+                  key=lambda item: item[1])
+
+def source_endpoints(name):
+    endpoints = list(SOURCE_ENDPOINTS.get(name, []))
+    extra_file = os.environ.get("DEVOPS_ENDPOINTS")
+    if extra_file:
+        try:
+            with open(extra_file) as f:
+                extra = json.load(f).get(name, [])
+            endpoints = extra + [url for url in endpoints if url not in extra]
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Could not read {extra_file}: {e}")
+    return endpoints
+
+def select_source(name):
+    """Fastest reachable base URL for a download source (the first configured one if none answer)."""
+    endpoints = source_endpoints(name)
+    if len(endpoints) <= 1:
+        return endpoints[0] if endpoints else None
+    ranked = rank_endpoints(endpoints)
+    if not ranked:
+        return endpoints[0]
+    if ranked[0][0] != endpoints[0]:
+        _notify(f"🛰️ Using {ranked[0][0]} for {name} ({ranked[0][1] * 1000:.0f} ms)")
+    return ranked[0][0]
+
+def source_mirrors(name, url):
+    """url, built on one of name's endpoints, rebased onto each of the others (for hedging)."""
+    endpoints = source_endpoints(name)
+    base = next((endpoint for endpoint in endpoints if url.startswith(f"{endpoint}/")), None)
+    if base is None:
+        return []
+    return [f"{endpoint}{url[len(base):]}" for endpoint in endpoints if endpoint != base]
+
+# ✅ Detection cache helpers
+def _file_signature(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_ino, st.st_mtime_ns]
+
+def _detect_fingerprint(app):
+    """Everything a cached answer depends on, gathered without spawning processes."""
+    path = shutil.which(app)
+    search_path = os.environ.get("PATH", "")
+    fingerprint = {
+        "path": path,
+        "signature": _file_signature(path) if path else None,
+        "PATH": search_path,
+        # Directory mtimes change when binaries are added to or removed from them
+        "PATH_dirs": [_file_signature(d) for d in search_path.split(os.pathsep) if d],
+    }
+    if app == "node":
+        # Resolving is as cheap as fingerprinting the alias chain it follows
+        fingerprint["nvm"] = resolve_nvm_node()
+    return fingerprint
+
+def _load_detect_cache():
+    global _detect_cache
+    if _detect_cache is None:
+        try:
+            with open(DETECT_CACHE_FILE) as f:
+                _detect_cache = json.load(f)
+        except (OSError, ValueError):
+            _detect_cache = {}
+    return _detect_cache
+
+def _save_detect_cache():
+    os.makedirs(os.path.dirname(DETECT_CACHE_FILE), exist_ok=True)
+    tmp_file = f"{DETECT_CACHE_FILE}.{os.getpid()}.tmp"
+    with open(tmp_file, "w") as f:
+        json.dump(_detect_cache, f, indent=2)
+    os.replace(tmp_file, DETECT_CACHE_FILE)
+
+def invalidate_detect_cache(app):
+    """Drops the cached answer for a tool after it was installed or removed."""
+    with _detect_cache_lock:
+        cache = _load_detect_cache()
+        if cache.pop(app, None) is not None:
+            try:
+                _save_detect_cache()
+            except OSError:
+                pass
+
+# ✅ Check if a command exists on the system
+def is_installed(app):
+    if not USE_DETECT_CACHE:
+        return _probe_installed(app)
+
+    fingerprint = _detect_fingerprint(app)
+    with _detect_cache_lock:
+        entry = _load_detect_cache().get(app)
+    if entry and entry.get("fingerprint") == fingerprint:
+        return entry["installed"]
+
+    installed = _probe_installed(app)
+    with _detect_cache_lock:
+        _load_detect_cache()[app] = {"fingerprint": fingerprint, "installed": installed}
+        try:
+            _save_detect_cache()
+        except OSError:
+            pass  # A read-only home just means no caching
+    return installed
+
+def nvm_dirs():
+    """$NVM_DIR first when it is set, then the usual install locations."""
+    env_dir = os.environ.get("NVM_DIR")
+    return list(dict.fromkeys(([env_dir] if env_dir else []) + NVM_PATHS))
+
+def _version_key(version):
+    return tuple(int(part) if part.isdigit() else 0 for part in version.lstrip("v").split("."))
+
+def _nvm_installed_versions(nvm_dir):
+    """Installed node versions, newest first, as {version: binary path}."""
+    versions_dir = os.path.join(nvm_dir, "versions", "node")
+    try:
+        names = os.listdir(versions_dir)
+    except OSError:
+        return {}
+    found = {name: os.path.join(versions_dir, name, "bin", "node") for name in names if name.startswith("v")}
+    return {name: found[name] for name in sorted(found, key=_version_key, reverse=True)
+            if os.access(found[name], os.X_OK)}
+
+def resolve_nvm_node(spec="default", nvm_dir=None):
+    """Resolves an nvm alias or version spec to {"nvm_dir", "version", "path"}, or None.
+
+    Follows alias files the way nvm does (default -> lts/* -> lts/jod -> v22.3.0),
+    understands node/stable and partial versions like 22 or v22.3, and reads
+    nothing but the filesystem, so it costs a few stat() calls instead of
+    sourcing nvm.sh."""
+    for candidate in [nvm_dir] if nvm_dir else nvm_dirs():
+        installed = _nvm_installed_versions(candidate)
+        if not installed:
+            continue
+        name, seen = spec, set()
+        while name not in seen and len(seen) < 16:
+            seen.add(name)
+            try:
+                with open(os.path.join(candidate, "alias", name)) as f:
+                    name = f.read().strip()
+            except OSError:
+                break
+        if name in ("node", "stable"):
+            name = next(iter(installed))
+        wanted = "v" + name.lstrip("v")
+        for version, path in installed.items():
+            if version == wanted or version.startswith(wanted + "."):
+                return {"nvm_dir": candidate, "version": version, "path": path}
+    return None
+
+def _probe_installed(app):
+    if app == "node":
+        # Try regular node detection first
+        if shutil.which("node"):
+            return True
+
+        # Try detecting node via nvm
+        return resolve_nvm_node() is not None
+
+    return shutil.which(app) is not None
+
+# ✅ Detect every tool concurrently, keeping APP_CATEGORIES order
+def detect_inventory(refresh=False):
+    """Returns {category: [(app, installed), ...]} ordered like APP_CATEGORIES."""
+    global _inventory
+    with _inventory_lock:
+        if _inventory is not None and not refresh:
+            return _inventory
+
+    # Probe outside the lock: install workers only need it for their quick single-entry updates
+    apps = [app for category_apps in APP_CATEGORIES.values() for app in category_apps]
+    with span("detect"), ThreadPoolExecutor(max_workers=min(DETECT_WORKERS, len(apps))) as pool:
+        results = dict(zip(apps, pool.map(_propagate(is_installed), apps)))
+
+    inventory = {
+        category: [(app, results[app]) for app in category_apps]
+        for category, category_apps in APP_CATEGORIES.items()
+    }
+    with _inventory_lock:
+        _inventory = inventory
+    return inventory
+
+def refresh_inventory_entry(app):
+    """Re-probes a single tool after it was installed or removed."""
+    if _inventory is None:
+        return
+    installed_now = is_installed(app)
+    with _inventory_lock:
+        for category, entries in _inventory.items():
+            _inventory[category] = [(name, installed_now if name == app else installed)
+                                    for name, installed in entries]
+
+# ✅ Display which tools are currently installed
+def check_installed_apps():
+    print("\n🔍 Checking installed applications:")
+    for category, entries in detect_inventory().items():
+        print(f"\n📦 {category}")
+        for app, installed in entries:
+            status = "✅" if installed else "❌"
+            print(f"   {status} {app}")
+
+# ✅ Watch mode: keep the inventory current from inotify events instead of re-probing
+WATCH_STATE_FILE = os.path.join(CACHE_DIR, "inventory-state.json")
+WATCH_SOCKET = os.path.join(CACHE_DIR, "watch.sock")
+# Events arriving this close together are applied as one batch
+WATCH_DEBOUNCE = 0.2
+# Watched directories are re-listed this often, to pick up PATH entries created later
+WATCH_RESCAN_INTERVAL = 60
+# Where inotify is unavailable the fingerprints are re-checked this often instead
+WATCH_POLL_INTERVAL = 5
+
+# <sys/inotify.h>
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_CLOEXEC = 0o2000000
+IN_NONBLOCK = 0o4000
+WATCH_MASK = (IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE
+              | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF)
+
+class Inotify:
+    """Minimal ctypes binding to the Linux inotify API."""
+
+    def __init__(self):
+        import ctypes
+        import ctypes.util
+
+        self._ctypes = ctypes
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            self._raise()
+        self.paths = {}
+
+    def _raise(self):
+        errno = self._ctypes.get_errno()
+        raise OSError(errno, os.strerror(errno))
+
+    def watch(self, path):
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            self._raise()
+        self.paths[wd] = path
+
+    def read(self):
+        """Returns the pending [(directory, file name, mask)] without blocking."""
+        import struct
+
+        events = []
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return events
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = struct.unpack_from("iIII", data, offset)
+                name = os.fsdecode(data[offset + 16:offset + 16 + length].rstrip(b"\0"))
+                offset += 16 + length
+                directory = self.paths.pop(wd, None) if mask & IN_IGNORED else self.paths.get(wd)
+                events.append((directory, name, mask))
+
+    def close(self):
+        os.close(self.fd)
+
+def _watch_targets():
+    """{directory: (tool, only_name)} for every directory whose changes can flip a tool.
+
+    tool None means the changed file's name is the tool (PATH directories);
+    only_name restricts which entries matter, for parents of an nvm dir that is not there yet."""
+    targets = {}
+    for nvm_dir in nvm_dirs():
+        if os.path.isdir(nvm_dir):
+            for sub in ("", "alias", os.path.join("alias", "lts"), "versions", os.path.join("versions", "node")):
+                if os.path.isdir(os.path.join(nvm_dir, sub)):
+                    targets[os.path.join(nvm_dir, sub).rstrip(os.sep)] = ("node", None)
+        elif os.path.isdir(os.path.dirname(nvm_dir)):
+            targets[os.path.dirname(nvm_dir)] = ("node", os.path.basename(nvm_dir))
+    for directory in os.environ.get("PATH", "").split(os.pathsep):
+        if directory and os.path.isdir(directory):
+            targets[directory] = (None, None)
+    return targets
+
+def _watch_state():
+    return {
+        "pid": os.getpid(),
+        "updated": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "inventory": {category: dict(entries) for category, entries in detect_inventory().items()},
+    }
+
+def _publish_watch_state(state_file):
+    """Writes the state file atomically and returns the encoded document for socket readers."""
+    payload = json.dumps(_watch_state(), indent=2).encode()
+    os.makedirs(os.path.dirname(state_file) or ".", exist_ok=True)
+    tmp_file = f"{state_file}.{os.getpid()}.tmp"
+    with open(tmp_file, "wb") as f:
+        f.write(payload)
+    os.replace(tmp_file, state_file)
+    return payload
+
+def _apply_changes(apps):
+    """Re-probes only the given tools; prints and returns whether anything flipped."""
+    before = {app: installed for entries in detect_inventory().values() for app, installed in entries}
+    for app in apps:
+        invalidate_detect_cache(app)
+        refresh_inventory_entry(app)
+    after = {app: installed for entries in detect_inventory().values() for app, installed in entries}
+    changed = [app for app in apps if before[app] != after[app]]
+    for app in changed:
+        print(f"🔔 {app}: {'✅ installed' if after[app] else '❌ removed'}")
+    return bool(changed)
+
+def _open_watch_socket(path):
+    """Listens on a Unix socket, refusing to steal it from a watcher that is still alive."""
+    if os.path.exists(path):
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(path)
+            raise OSError("another watcher is already running")
+        except (ConnectionRefusedError, FileNotFoundError):
+            os.remove(path)
+        finally:
+            probe.close()
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    server.listen(16)
+    server.setblocking(False)
+    return server
+
+def watch_inventory(socket_path=WATCH_SOCKET, state_file=WATCH_STATE_FILE):
+    """Probes once, then re-probes a tool only when a watched directory reports a change to it.
+
+    Readers get the current inventory from state_file or by connecting to socket_path."""
+    import select
+    import signal
+
+    apps = {app for category_apps in APP_CATEGORIES.values() for app in category_apps}
+    detect_inventory()
+    try:
+        server = _open_watch_socket(socket_path)
+    except OSError as e:
+        print(f"❌ Cannot serve {socket_path}: {e}")
+        return
+    payload = _publish_watch_state(state_file)
+
+    def stop(*_):
+        raise SystemExit(0)
+    signal.signal(signal.SIGTERM, stop)
+
+    try:
+        notifier = Inotify()
+    except (OSError, AttributeError) as e:
+        notifier = None
+        print(f"⚠️ inotify unavailable ({e}); checking fingerprints every {WATCH_POLL_INTERVAL}s instead")
+
+    targets = {}
+    def rescan():
+        nonlocal targets
+        targets = _watch_targets()
+        watched = set(notifier.paths.values())
+        for directory in targets:
+            if directory not in watched:
+                with contextlib.suppress(OSError):
+                    notifier.watch(directory)
+
+    if notifier:
+        rescan()
+        print(f"👀 Watching {len(notifier.paths)} directories; serving {socket_path} and {state_file}")
+    last_scan = time.monotonic()
+
+    try:
+        while True:
+            readers = [server] + ([notifier.fd] if notifier else [])
+            timeout = WATCH_RESCAN_INTERVAL if notifier else WATCH_POLL_INTERVAL
+            ready, _, _ = select.select(readers, [], [], timeout)
+
+            if server in ready:
+                with contextlib.suppress(OSError):
+                    conn, _ = server.accept()
+                    with conn:
+                        conn.setblocking(True)
+                        conn.sendall(payload)
+
+            if notifier is None:
+                if time.monotonic() - last_scan >= WATCH_POLL_INTERVAL:
+                    last_scan = time.monotonic()
+                    # The fingerprint cache turns this into stat() calls unless something moved
+                    before = detect_inventory()
+                    if detect_inventory(refresh=True) != before:
+                        payload = _publish_watch_state(state_file)
+                continue
+
+            if notifier.fd in ready:
+                time.sleep(WATCH_DEBOUNCE)
+                affected = set()
+                structure_changed = False
+                for directory, name, mask in notifier.read():
+                    if mask & IN_Q_OVERFLOW:
+                        affected |= apps
+                        continue
+                    if mask & (IN_IGNORED | IN_DELETE_SELF | IN_MOVE_SELF) or directory is None:
+                        # A watched directory went away, taking whatever it held with it
+                        affected |= apps
+                        structure_changed = True
+                        continue
+                    tool, only_name = targets.get(directory, (None, None))
+                    if only_name and name != only_name:
+                        continue
+                    if tool or only_name:
+                        structure_changed = True  # nvm grew or lost a directory we may need to watch
+                    if tool:
+                        affected.add(tool)
+                    elif name in apps:
+                        affected.add(name)
+                if structure_changed:
+                    rescan()
+                if affected and _apply_changes(sorted(affected)):
+                    payload = _publish_watch_state(state_file)
+            elif time.monotonic() - last_scan >= WATCH_RESCAN_INTERVAL:
+                last_scan = time.monotonic()
+                rescan()
+    except (KeyboardInterrupt, SystemExit):
+        print("\n👋 Watcher stopped.")
+    finally:
+        server.close()
+        with contextlib.suppress(OSError):
+            os.remove(socket_path)
+        if notifier:
+            notifier.close()
+
+def read_watch_state(socket_path=WATCH_SOCKET, timeout=1.0):
+    """The inventory a running watcher holds, or None when no watcher answers."""
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.settimeout(timeout)
+    try:
+        client.connect(socket_path)
+        chunks = []
+        for chunk in iter(lambda: client.recv(64 * 1024), b""):
+            chunks.append(chunk)
+        return json.loads(b"".join(chunks))
+    except (OSError, ValueError):
+        return None
+    finally:
+        client.close()
+
+# ✅ Version inventory: concurrent probes, cached by binary path + mtime
+VERSION_TIMEOUT = 10
+VERSION_CACHE_FILE = os.path.join(CACHE_DIR, "versions.json")
+INVENTORY_FIELDS = ["host", "category", "tool", "installed", "path",
+                    "version", "major", "minor", "patch", "prerelease", "raw"]
+
+def parse_version(raw):
+    """Pulls semver-ish fields out of free-form `--version` output."""
+    import re
+
+    match = re.search(r"(\d+)\.(\d+)(?:\.(\d+))?([-+][0-9A-Za-z.+-]+)?", raw or "")
+    if not match:
+        return {"version": None, "major": None, "minor": None, "patch": None, "prerelease": None}
+    major, minor, patch, suffix = match.groups()
+    return {
+        "version": match.group(0),
+        "major": int(major),
+        "minor": int(minor),
+        "patch": int(patch) if patch is not None else None,
+        "prerelease": suffix.lstrip("-+") if suffix else None,
+    }
+
+def _probe_version(app, path, timeout=VERSION_TIMEOUT):
+    """Returns the first line of the tool's version output, or None."""
+    if path is None:
+        # node only reachable through nvm
+        resolved = resolve_nvm_node() if app == "node" else None
+        return resolved and resolved["version"]
+    try:
+        result = run_command([path] + VERSION_ARGS.get(app, ["--version"]),
+                             capture_output=True, text=True, timeout=timeout)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    output = (result.stdout.strip() or result.stderr.strip()).splitlines()
+    return output[0].strip() if output else None
+
+@traced("versions")
+def collect_versions(workers=DETECT_WORKERS, use_cache=None):
+    """Returns one row per tool (see INVENTORY_FIELDS), ordered like APP_CATEGORIES."""
+    if use_cache is None:
+        use_cache = USE_DETECT_CACHE
+    try:
+        with open(VERSION_CACHE_FILE) as f:
+            cache = json.load(f) if use_cache else {}
+    except (OSError, ValueError):
+        cache = {}
+
+    rows = []
+    for category, entries in detect_inventory().items():
+        for app, installed in entries:
+            path = shutil.which(app)
+            rows.append({"host": socket.gethostname(), "category": category, "tool": app,
+                         "installed": installed, "path": path,
+                         "signature": _file_signature(path) if path else None})
+
+    def probe(row):
+        if not row["installed"]:
+            return None
+        cached = cache.get(row["tool"])
+        if row["path"] and cached and cached["path"] == row["path"] and cached["signature"] == row["signature"]:
+            return cached["raw"]
+        return _probe_version(row["tool"], row["path"])
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        raws = list(pool.map(_propagate(probe), rows))
+
+    for row, raw in zip(rows, raws):
+        if row["path"] and raw is not None:
+            cache[row["tool"]] = {"path": row["path"], "signature": row["signature"], "raw": raw}
+        row.pop("signature")
+        row["raw"] = raw
+        row.update(parse_version(raw))
+    rows = [{field: row[field] for field in INVENTORY_FIELDS} for row in rows]
+
+    try:
+        os.makedirs(os.path.dirname(VERSION_CACHE_FILE), exist_ok=True)
+        with open(VERSION_CACHE_FILE, "w") as f:
+            json.dump(cache, f, indent=2)
+    except OSError:
+        pass
+    return rows
+
+def write_inventory(rows, fmt="json", out=None):
+    import sys
+
+    out = out or sys.stdout
+    if fmt == "csv":
+        import csv
+
+        writer = csv.DictWriter(out, fieldnames=INVENTORY_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+    else:
+        json.dump(rows, out, indent=2)
+        out.write("\n")
+
+# developing...
+
+def prompt_install_apps():
+    inventory = detect_inventory()
+    missing = [app for entries in inventory.values() for app, installed in entries if not installed]
+    # Downloads start now and overlap the questions; node waits for its version
+    with Prefetcher([app for app in missing if app != "node"]) as prefetch:
+        bulk_choice = input("\n🚀 Install all missing apps without confirmation? [y/n]: ").strip().lower()
+        selected, node_version = [], None
+        for category, entries in inventory.items():
+            print(f"\n🔧 {category}")
+            for app, installed in entries:
+                if not installed:
+                    if bulk_choice == "y":
+                        selected.append(app)
+                    else:
+                        choice = input(f"   → Install {app}? [y/n]: ").strip().lower()
+                        if choice == "y":
+                            selected.append(app)
+                        else:
+                            prefetch.cancel(app)
+                    if app == "node" and app in selected:
+                        node_version = ask_node_version()
+                        prefetch.start("node", node_version=node_version)
+        prefetch.release()
+        install_apps(selected, node_version=node_version)
+
+def install_apps(apps, workers=None, node_version=None, force=False, dry_run=False, upgrade=False):
+    """Installs the selected tools through the parallel scheduler.
+
+    Every apt-backed tool goes into a single APT transaction; binary downloads
+    run alongside it and alongside each other. Tools whose fingerprint shows
+    they are already converged are skipped unless force is set; dry_run only
+    prints the plan. upgrade ignores the lockfile's pins and installs (and pins)
+    the latest releases. Returns {step name: status} for the steps that ran."""
+    if not apps:
+        return {}
+    options = {"upgrade": True} if upgrade else {}
+    if "node" in apps:
+        # Ask up front so no worker blocks on a prompt mid-install
+        options["node_version"] = node_version or ask_node_version()
+
+    rows = converge_plan(apps, options, force)
+    if dry_run:
+        print_converge_plan(rows)
+        return {}
+    todo = [row["app"] for row in rows if row["run"]]
+    for row in rows:
+        if not row["run"]:
+            print(f"⏭️ {row['app']}: {row['reason']}")
+    if not todo:
+        record_converged(apps, options)
+        print("✅ Everything selected is already converged.")
+        return {}
+
+    if not has_internet():
+        print("⚠️ No internet connection detected. Downloads are likely to fail.")
+    status, durations = {}, {}
+    try:
+        with span("install", apps=list(todo)):
+            status, durations = run_install_plan(plan_install_steps(todo, options), workers)
+    finally:
+        record_converged([app for app in apps if app not in todo], options)
+        record_converged(todo, options, status, durations)
+        for app in todo:
+            if not is_apt_backed(app):
+                invalidate_detect_cache(app)
+                refresh_inventory_entry(app)
+    return status
+
+# APT-backed tools and the packages each one pulls in (anything not listed
+# in NON_APT_APPS installs the package named after the tool)
+APT_PACKAGES = {
+    "terraform": ["terraform"],
+    "gh": ["gh"],
+    "jenkins": ["jenkins"],
+    "docker": ["docker-ce", "docker-ce-cli", "containerd.io",
+               "docker-buildx-plugin", "docker-compose-plugin"],
+    "code": ["code"],
+}
+
+# Packages needed before a tool's keyring and repository can be set up
+APT_PREREQUISITES = {
+    "terraform": ["gpg"],
+    "docker": ["ca-certificates"],
+    "code": ["gpg", "apt-transport-https"],
+}
+
+# Tools installed from binaries, scripts or other package managers
+NON_APT_APPS = ["glab", "kubectl", "minikube", "helm", "node"]
+
+# How each tool reports its version
+VERSION_ARGS = {
+    "terraform": ["version"],
+    "kubectl": ["version", "--client"],
+    "minikube": ["version"],
+    "helm": ["version"],
+}
+
+def is_apt_backed(app):
+    return app not in NON_APT_APPS
+
+def print_app_version(app):
+    command = app
+    if not shutil.which(app):
+        # A fresh install under a prefix (or nvm) is not on this process's PATH yet
+        placed = os.path.join(RELEASE_PREFIX, "bin", app)
+        resolved = resolve_nvm_node() if app == "node" else None
+        if os.path.exists(placed):
+            command = placed
+        elif resolved:
+            command = resolved["path"]
+    try:
+        result = run_command([command] + VERSION_ARGS.get(app, ["--version"]),
+                             check=True, capture_output=True, text=True)
+        print(f"Current {app} version: {result.stdout.strip()}")
+    except (OSError, subprocess.CalledProcessError):
+        print(f"⚠️ Could not read the {app} version.")
+
+# Successful installs are appended here, relative to the working directory
+INSTALL_LOG_FILE = "install_log.txt"
+
+def log_install(app):
+    from datetime import datetime
+
+    with open(INSTALL_LOG_FILE, "a") as log_file:
+        log_file.write(f"[{datetime.now()}] {app} installed successfully\n")
+
+# ✅ Network policy: deadlines, bounded backoff and hedged requests per step and per host
+# Settings merge in order: "default", then the host being contacted, then the step.
+# A JSON file of the same shape named by DEVOPS_NETWORK_POLICY overrides any of them.
+#   connect_timeout  seconds to open a connection
+#   read_timeout     seconds without a byte before a transfer counts as stalled
+#   attempt_timeout  wall clock for one attempt of a network command
+#   deadline         no retry starts once this many seconds have passed since the first attempt
+#   retries          retries after the first attempt
+#   backoff          delay before the first retry; doubles per retry up to backoff_max, with jitter
+#   hedge_percentile race a mirror once a request is slower than this percentile of the host's history
+#   hedge_after      hedge delay while the host has too little history (None: only fail over)
+NETWORK_POLICY = {
+    "default": {
+        "connect_timeout": 10,
+        "read_timeout": 60,
+        "attempt_timeout": 900,
+        "deadline": 1800,
+        "retries": 4,
+        "backoff": 0.5,
+        "backoff_max": 30,
+        "hedge_percentile": 95,
+        "hedge_after": 3.0,
+    },
+    "hosts": {},
+    "steps": {
+        "apt-update": {"attempt_timeout": 300, "retries": 3},
+        "apt-install": {"attempt_timeout": 1800, "deadline": 3600, "retries": 1},
+    },
+}
+
+NETWORK_LATENCY_FILE = os.path.join(CACHE_DIR, "latency.json")
+# Response times remembered per host for the hedge percentile
+NETWORK_LATENCY_SAMPLES = 50
+# With fewer samples than this, hedge_after is used instead of the percentile
+HEDGE_MIN_SAMPLES = 5
+
+_latency_history = None
+_latency_lock = threading.Lock()
+
+@functools.lru_cache(maxsize=None)
+def _network_policy_overrides(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Could not read {path}: {e}")
+        return {}
+
+def network_policy(step=None, host=None):
+    """Effective settings for a network step or host; see NETWORK_POLICY."""
+    layers = [NETWORK_POLICY]
+    if os.environ.get("DEVOPS_NETWORK_POLICY"):
+        layers.append(_network_policy_overrides(os.environ["DEVOPS_NETWORK_POLICY"]))
+    policy = {}
+    for layer in layers:
+        policy.update(layer.get("default", {}))
+    for section, key in (("hosts", host), ("steps", step)):
+        for layer in layers:
+            policy.update(layer.get(section, {}).get(key, {}))
+    return policy
+
+def backoff_delay(policy, attempt):
+    """Seconds to wait before retry number `attempt` (1-based): bounded exponential, jittered."""
+    import random
+
+    delay = min(policy["backoff"] * 2 ** (attempt - 1), policy["backoff_max"])
+    return delay * random.uniform(0.5, 1.0)
+
+def _loaded_latency_history():
+    """The per-host samples, read from disk on first use; call with _latency_lock held."""
+    global _latency_history
+    if _latency_history is None:
+        try:
+            with open(NETWORK_LATENCY_FILE) as f:
+                _latency_history = json.load(f)
+        except (OSError, ValueError):
+            _latency_history = {}
+    return _latency_history
+
+def record_latency(netloc, seconds):
+    """Remembers how long netloc took to answer a request."""
+    with _latency_lock:
+        samples = _loaded_latency_history().setdefault(netloc, [])
+        samples.append(round(seconds, 4))
+        del samples[:-NETWORK_LATENCY_SAMPLES]
+
+def _save_latency_history():
+    with _latency_lock:
+        if _latency_history is None:
+            return
+        try:
+            os.makedirs(os.path.dirname(NETWORK_LATENCY_FILE), exist_ok=True)
+            with open(NETWORK_LATENCY_FILE, "w") as f:
+                json.dump(_latency_history, f)
+        except OSError:
+            pass
+
+def hedge_delay(url):
+    """Seconds to give url before racing a mirror against it; None never hedges."""
+    parts = urllib.parse.urlsplit(url)
+    policy = network_policy(host=parts.hostname)
+    with _latency_lock:
+        samples = sorted(_loaded_latency_history().get(parts.netloc, []))
+    if policy["hedge_percentile"] is not None and len(samples) >= HEDGE_MIN_SAMPLES:
+        return samples[min(len(samples) - 1, len(samples) * policy["hedge_percentile"] // 100)]
+    return policy["hedge_after"]
+
+def _process_tree(pid):
+    """pid and all of its descendants, parents first, read from /proc."""
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The command name is parenthesised and may itself contain spaces
+                ppid = int(f.read().rpartition(")")[2].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    tree = [pid]
+    for parent in tree:
+        tree.extend(children.get(parent, []))
+    return tree
+
+def _stop_process_tree(proc, grace=5):
+    """SIGTERM the command and everything it started, then SIGKILL what is still running.
+
+    sudo relays the SIGTERM to the root-owned command it runs, which this
+    process may not be allowed to signal directly."""
+    import signal
+
+    tree = _process_tree(proc.pid)
+    for sig in (signal.SIGTERM, signal.SIGKILL):
+        for pid in tree:
+            with contextlib.suppress(ProcessLookupError, PermissionError):
+                os.kill(pid, sig)
+        try:
+            proc.wait(grace)
+            return
+        except subprocess.TimeoutExpired:
+            continue
+
+def run_network_command(args, step, **kwargs):
+    """Runs a command that downloads something, under the step's network policy.
+
+    Each attempt is stopped, with its whole process tree, after attempt_timeout;
+    failed or stalled attempts are retried with backoff until the retries or the
+    deadline run out. Raises CalledProcessError or TimeoutExpired, like check=True."""
+    policy = network_policy(step=step)
+    deadline = time.monotonic() + policy["deadline"]
+    attempt = 0
+    while True:
+        timeout = max(min(policy["attempt_timeout"], deadline - time.monotonic()), 1)
+        try:
+            with popen_command(args, **kwargs) as proc:
+                try:
+                    proc.wait(timeout)
+                except subprocess.TimeoutExpired:
+                    _stop_process_tree(proc)
+                    raise subprocess.TimeoutExpired(args, timeout) from None
+            if proc.returncode:
+                raise subprocess.CalledProcessError(proc.returncode, args)
+            return subprocess.CompletedProcess(args, proc.returncode)
+        except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+            attempt += 1
+            delay = backoff_delay(policy, attempt)
+            if attempt > policy["retries"] or time.monotonic() + delay > deadline:
+                raise
+            print(f"⚠️ {step}: {str(e).rstrip('.')}; retrying in {delay:.1f}s ({attempt}/{policy['retries']})...")
+            time.sleep(delay)
+
+def apt_network_options(step):
+    """apt-get options that apply the step's stall timeout to apt's own downloads."""
+    read_timeout = network_policy(step=step)["read_timeout"]
+    return ["-o", f"Acquire::http::Timeout={read_timeout}", "-o", f"Acquire::https::Timeout={read_timeout}"]
+
+# ✅ Native HTTP downloader: keep-alive, Range resume, parallel chunks, streaming sha256
+DOWNLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+# Files with at least this much left to fetch are split across DOWNLOAD_WORKERS connections
+DOWNLOAD_PARALLEL_THRESHOLD = 32 * 1024 * 1024
+DOWNLOAD_WORKERS = 4
+
+_connection_pool = {}
+_connection_pool_lock = threading.Lock()
+
+class _ContentChanged(Exception):
+    """The server no longer serves the bytes a partial download started from."""
+
+class _Refused(OSError):
+    """A client error (404, 403...) that asking again will not change."""
+
+class _Cancelled(Exception):
+    """Another source finished the download first, or its prefetch was called off."""
+
+def _open_connection(parts):
+    """Returns (connection, send_absolute_uri), honouring http_proxy/https_proxy."""
+    port = parts.port or (443 if parts.scheme == "https" else 80)
+    timeout = network_policy(host=parts.hostname)["connect_timeout"]
+    proxy = None
+    if not urllib.request.proxy_bypass(parts.hostname):
+        proxy = urllib.request.getproxies().get(parts.scheme)
+    if proxy:
+        proxy_parts = urllib.parse.urlsplit(proxy if "://" in proxy else f"http://{proxy}")
+        if parts.scheme == "https":
+            conn = http.client.HTTPSConnection(proxy_parts.hostname, proxy_parts.port or 80,
+                                               timeout=timeout)
+            conn.set_tunnel(parts.hostname, port)
+            return conn, False
+        return http.client.HTTPConnection(proxy_parts.hostname, proxy_parts.port or 80,
+                                          timeout=timeout), True
+    if parts.scheme == "https":
+        return http.client.HTTPSConnection(parts.hostname, port, timeout=timeout), False
+    return http.client.HTTPConnection(parts.hostname, port, timeout=timeout), False
+
+def _release_connection(pool_key, handle, response):
+    """Returns a fully read connection to the keep-alive pool."""
+    if response.will_close:
+        handle[0].close()
+        return
+    with _connection_pool_lock:
+        _connection_pool.setdefault(pool_key, []).append(handle)
+
+def _send_get(handle, url, parts, headers):
+    conn, absolute = handle
+    if conn.sock is None:
+        # Connecting is bounded by connect_timeout; from then on reads may idle for read_timeout
+        conn.connect()
+        conn.sock.settimeout(network_policy(host=parts.hostname)["read_timeout"])
+    target = url if absolute else urllib.parse.urlunsplit(("", "", parts.path or "/", parts.query, ""))
+    started = time.monotonic()
+    conn.request("GET", target, headers={"Accept-Encoding": "identity", **headers})
+    response = conn.getresponse()
+    if response.status < 500:
+        record_latency(parts.netloc, time.monotonic() - started)
+    return response
+
+def _http_get(url, headers, max_redirects=10):
+    """GET over a pooled keep-alive connection, following redirects.
+
+    Returns (pool_key, handle, response, final_url); the caller must read the
+    body and hand the connection back with _release_connection()."""
+    for _ in range(max_redirects + 1):
+        parts = urllib.parse.urlsplit(url)
+        pool_key = (parts.scheme, parts.netloc)
+        with _connection_pool_lock:
+            idle = _connection_pool.get(pool_key)
+            handle = idle.pop() if idle else None
+        if handle:
+            try:
+                response = _send_get(handle, url, parts, headers)
+            except (OSError, http.client.HTTPException):
+                # The server dropped the idle keep-alive connection; use a fresh one
+                handle[0].close()
+                handle = None
+        if not handle:
+            handle = _open_connection(parts)
+            try:
+                response = _send_get(handle, url, parts, headers)
+            except (OSError, http.client.HTTPException):
+                handle[0].close()
+                raise
+
+        if response.status in (301, 302, 303, 307, 308):
+            location = response.getheader("Location")
+            response.read()
+            _release_connection(pool_key, handle, response)
+            url = urllib.parse.urljoin(url, location)
+            continue
+        return pool_key, handle, response, url
+    raise OSError(f"Too many redirects for {url}")
+
+def _cancelled(cancel=None):
+    control = _prefetch_control.get()
+    return bool(cancel and cancel.is_set() or control and control["cancel"].is_set())
+
+def _read_blocks(response, cancel=None):
+    control = _prefetch_control.get()
+    for block in iter(lambda: response.read(256 * 1024), b""):
+        if _cancelled(cancel):
+            raise _Cancelled()
+        if control:
+            control["limiter"].consume(len(block), control["cancel"])
+        yield block
+
+def _retry_wait(policy, attempt, cancel=None):
+    control = _prefetch_control.get()
+    cancel = cancel or (control and control["cancel"])
+    delay = backoff_delay(policy, attempt)
+    if cancel and cancel.wait(delay):
+        raise _Cancelled()
+    if not cancel:
+        time.sleep(delay)
+
+def _range_total(response):
+    # Content-Range: bytes 0-8388607/104857600
+    content_range = response.getheader("Content-Range", "")
+    total = content_range.rpartition("/")[2]
+    return int(total) if total.isdigit() else None
+
+def _fetch_range(url, start, end, validator, cancel=None):
+    """Fetches bytes start..end into memory, resuming within the range on errors."""
+    policy = network_policy(host=urllib.parse.urlsplit(url).hostname)
+    data = bytearray()
+    attempt = 0
+    while len(data) < end - start + 1:
+        headers = {"Range": f"bytes={start + len(data)}-{end}"}
+        if validator:
+            headers["If-Range"] = validator
+        try:
+            pool_key, handle, response, _ = _http_get(url, headers)
+            if response.status != 206:
+                response.read()
+                _release_connection(pool_key, handle, response)
+                raise _ContentChanged(f"HTTP {response.status} for a ranged request to {url}")
+            for block in _read_blocks(response, cancel):
+                data += block
+            _release_connection(pool_key, handle, response)
+        except (OSError, http.client.HTTPException):
+            attempt += 1
+            if attempt > policy["retries"]:
+                raise
+            _retry_wait(policy, attempt, cancel)
+    return bytes(data)
+
+def _fetch_chunks(url, out, digest, total, validator, cancel=None):
+    """Fetches the rest of the file over parallel connections, hashing in file order."""
+    from collections import deque
+
+    starts = iter(range(out.tell(), total, DOWNLOAD_CHUNK_SIZE))
+    in_flight = deque()
+    with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as pool:
+        def submit_next():
+            start = next(starts, None)
+            if start is not None:
+                end = min(start + DOWNLOAD_CHUNK_SIZE, total) - 1
+                in_flight.append(pool.submit(_propagate(_fetch_range), url, start, end, validator, cancel))
+
+        # Keep a bounded number of chunks ahead of the write cursor
+        for _ in range(DOWNLOAD_WORKERS * 2):
+            submit_next()
+        try:
+            while in_flight:
+                data = in_flight.popleft().result()
+                digest.update(data)
+                out.write(data)
+                submit_next()
+        finally:
+            for future in in_flight:
+                future.cancel()
+
+def download(url, dest, sha256=None, parallel=True, cancel=None, on_response=None):
+    """Downloads url into dest and returns (sha256, size).
+
+    A partial dest left by an interrupted run is resumed with Range/If-Range.
+    The sha256 is computed while the bytes stream in, never in a second pass.
+    Stalls and errors are retried under the host's network policy. Setting the
+    cancel event abandons the transfer; on_response() is called once the server
+    starts sending the file."""
+    policy = network_policy(host=urllib.parse.urlsplit(url).hostname)
+    deadline = time.monotonic() + policy["deadline"]
+    meta_file = f"{dest}.json"
+    digest = hashlib.sha256()
+    validator = None
     try:
-        subprocess.check_call(["ping", "-c", "1", "8.8.8.8"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        with open(meta_file) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        meta = {}
+    resumable = os.path.exists(dest) and meta.get("url") == url and meta.get("validator")
+
+    with open(dest, "ab" if resumable else "wb") as out:
+        if resumable:
+            validator = meta["validator"]
+            # Seed the hash with the bytes already on disk
+            with open(dest, "rb") as f:
+                for block in iter(lambda: f.read(1024 * 1024), b""):
+                    digest.update(block)
+            _notify(f"⏯️ Resuming {os.path.basename(url)} at {out.tell()} bytes")
+
+        current_url = url
+        attempt = 0
+        while True:
+            try:
+                offset = out.tell()
+                headers = {"Range": f"bytes={offset}-{offset + DOWNLOAD_CHUNK_SIZE - 1}"}
+                if validator:
+                    headers["If-Range"] = validator
+                pool_key, handle, response, current_url = _http_get(current_url, headers)
+
+                if response.status == 416 and not offset:
+                    # Zero-length file
+                    response.read()
+                    _release_connection(pool_key, handle, response)
+                    break
+                if response.status == 200 or response.status == 416:
+                    # Ranges unsupported or the file changed: start over from byte zero
+                    if offset:
+                        _notify(f"🔁 {os.path.basename(url)} changed on the server, restarting download")
+                        out.seek(0)
+                        out.truncate()
+                        digest = hashlib.sha256()
+                    if response.status == 416:
+                        response.read()
+                        _release_connection(pool_key, handle, response)
+                        validator = None
+                        continue
+                    if on_response:
+                        on_response()
+                    expected = response.length
+                    for block in _read_blocks(response, cancel):
+                        digest.update(block)
+                        out.write(block)
+                    if expected is not None and out.tell() < expected:
+                        # http.client ends a body cut short quietly; this is not the whole file
+                        handle[0].close()
+                        raise http.client.IncompleteRead(b"", expected - out.tell())
+                    _release_connection(pool_key, handle, response)
+                    break
+
+                if response.status != 206:
+                    response.read()
+                    _release_connection(pool_key, handle, response)
+                    error = f"HTTP {response.status} {response.reason} for {url}"
+                    # Timeouts and rate limits are worth another try; other 4xx answers are final
+                    if 400 <= response.status < 500 and response.status not in (408, 429):
+                        raise _Refused(error)
+                    raise OSError(error)
+
+                total = _range_total(response)
+                etag = response.getheader("ETag")
+                validator = etag if etag and not etag.startswith("W/") else response.getheader("Last-Modified")
+                with open(meta_file, "w") as f:
+                    json.dump({"url": url, "validator": validator, "total": total}, f)
+
+                if on_response:
+                    on_response()
+                for block in _read_blocks(response, cancel):
+                    digest.update(block)
+                    out.write(block)
+                _release_connection(pool_key, handle, response)
+
+                if total is None or out.tell() >= total:
+                    break
+                if parallel and total - out.tell() >= DOWNLOAD_PARALLEL_THRESHOLD:
+                    _fetch_chunks(current_url, out, digest, total, validator, cancel)
+                # Otherwise the next loop iteration requests the following range on the same connection
+                if out.tell() >= total:
+                    break
+                attempt = 0
+            except _ContentChanged:
+                attempt += 1
+                if attempt > policy["retries"]:
+                    raise OSError(f"{url} kept changing while it was downloaded")
+                out.seek(0)
+                out.truncate()
+                digest = hashlib.sha256()
+                validator = None
+                current_url = url
+            except _Refused:
+                raise
+            except (OSError, http.client.HTTPException) as e:
+                if _cancelled(cancel):
+                    raise _Cancelled() from e
+                attempt += 1
+                if attempt > policy["retries"] or time.monotonic() > deadline:
+                    raise OSError(f"Download of {url} failed after {attempt - 1} retries: {e}") from e
+                _notify(f"⚠️ {os.path.basename(url)}: {e}; resuming at {out.tell()} bytes...")
+                current_url = url
+                _retry_wait(policy, attempt, cancel)
+        size = out.tell()
+
+    actual = digest.hexdigest()
+    if sha256 and actual != sha256.lower():
+        for path in (dest, meta_file):
+            with contextlib.suppress(OSError):
+                os.remove(path)
+        raise OSError(f"sha256 mismatch for {url}: expected {sha256}, got {actual}")
+    with contextlib.suppress(OSError):
+        os.remove(meta_file)
+    return actual, size
+
+# ✅ Content-addressed artifact cache for downloaded binaries, scripts and keys
+# Point DEVOPS_ARTIFACT_CACHE at a shared volume to reuse downloads across machines
+ARTIFACT_DIR = os.environ.get("DEVOPS_ARTIFACT_CACHE") or os.path.join(CACHE_DIR, "artifacts")
+ARTIFACT_CACHE_MAX_BYTES = int(os.environ.get("DEVOPS_ARTIFACT_CACHE_MB", "4096")) * 1024 * 1024
+
+# Unpinned URLs (keys, "latest" links, stable.txt) are refetched after this many seconds
+ARTIFACT_TTL = 24 * 3600
+
+_artifact_lock = threading.Lock()
+
+@contextlib.contextmanager
+def _artifact_index():
+    """Locked read-modify-write access to the index, safe for hosts sharing the volume."""
+    os.makedirs(os.path.join(ARTIFACT_DIR, "objects"), exist_ok=True)
+    index_file = os.path.join(ARTIFACT_DIR, "index.json")
+    with _artifact_lock, open(os.path.join(ARTIFACT_DIR, "index.lock"), "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            with open(index_file) as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = {}
+        yield index
+        tmp_file = f"{index_file}.{os.getpid()}.tmp"
+        with open(tmp_file, "w") as f:
+            json.dump(index, f, indent=2)
+        os.replace(tmp_file, index_file)
+
+def _blob_path(sha256):
+    return os.path.join(ARTIFACT_DIR, "objects", sha256)
+
+def _sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _evict_artifacts(index, keep):
+    """Drops least recently used blobs until the cache fits ARTIFACT_CACHE_MAX_BYTES."""
+    blobs = {}
+    for key, entry in index.items():
+        blob = blobs.setdefault(entry["sha256"], {"size": entry["size"], "last_used": 0, "keys": []})
+        blob["last_used"] = max(blob["last_used"], entry["last_used"])
+        blob["keys"].append(key)
+
+    total = sum(blob["size"] for blob in blobs.values())
+    for sha256, blob in sorted(blobs.items(), key=lambda item: item[1]["last_used"]):
+        if total <= ARTIFACT_CACHE_MAX_BYTES:
+            break
+        if sha256 == keep:
+            continue
+        with contextlib.suppress(OSError):
+            os.remove(_blob_path(sha256))
+        for key in blob["keys"]:
+            del index[key]
+        total -= blob["size"]
+
+def _hedged_download(urls, part_file, sha256=None):
+    """Downloads urls[0] into part_file, racing the next mirror against it whenever the
+    newest request has not started answering within its host's hedge_delay(), or failed.
+
+    The first complete, verified copy wins and the others are cancelled.
+    Returns (sha256, size, winning url, file holding the bytes)."""
+    from concurrent.futures import Future
+
+    wake = threading.Event()
+    racers = []
+
+    def start(url):
+        racer = {"url": url, "dest": f"{part_file}.hedge{len(racers)}" if racers else part_file,
+                 "cancel": threading.Event(), "responded": threading.Event(), "future": Future()}
+
+        def responded():
+            racer["responded"].set()
+            wake.set()
+
+        def run():
+            try:
+                racer["future"].set_result(download(url, racer["dest"], sha256, cancel=racer["cancel"],
+                                                    on_response=responded))
+            except BaseException as e:
+                racer["future"].set_exception(e)
+            finally:
+                wake.set()
+
+        racers.append(racer)
+        delay = hedge_delay(url)
+        racer["hedge_at"] = None if delay is None else time.monotonic() + delay
+        # Daemon threads: a loser stuck in a stalled read must not hold up exit
+        threading.Thread(target=_propagate(run), daemon=True).start()
+
+    winner = None
+    pending = list(urls)
+    start(pending.pop(0))
+    try:
+        while True:
+            winner = next((r for r in racers if r["future"].done() and not r["future"].exception()), None)
+            if winner:
+                return (*winner["future"].result(), winner["url"], winner["dest"])
+            newest = racers[-1]
+            waiting = not newest["responded"].is_set() and newest["hedge_at"] is not None
+            if pending and (newest["future"].done() or waiting and time.monotonic() >= newest["hedge_at"]):
+                url = pending.pop(0)
+                _notify(f"🏁 {urllib.parse.urlsplit(newest['url']).netloc} is slow to answer, "
+                        f"also trying {urllib.parse.urlsplit(url).netloc}")
+                start(url)
+                continue
+            if all(r["future"].done() for r in racers):
+                raise racers[0]["future"].exception()
+            timeout = max(newest["hedge_at"] - time.monotonic(), 0) if pending and waiting else None
+            wake.wait(timeout)
+            wake.clear()
+    finally:
+        for racer in racers:
+            if racer is winner:
+                continue
+            racer["cancel"].set()
+            # A loser still running leaves its file behind until its next read notices the cancel
+            for path in (racer["dest"], f"{racer['dest']}.json"):
+                with contextlib.suppress(OSError):
+                    os.remove(path)
+
+def _download_artifact(url, sha256=None, mirrors=()):
+    """Downloads url into the object store. Returns (sha256, size).
+
+    Partial files live under partial/ so an interrupted transfer resumes next time.
+    With mirrors, a slow or failing source is hedged with the next one."""
+    partial_dir = os.path.join(ARTIFACT_DIR, "partial")
+    os.makedirs(partial_dir, exist_ok=True)
+    part_file = os.path.join(partial_dir, hashlib.sha256(url.encode()).hexdigest())
+    with open(f"{part_file}.lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        with span(os.path.basename(urllib.parse.urlsplit(url).path) or url, kind="download", url=url) as record:
+            try:
+                if mirrors:
+                    actual, size, record["source"], done_file = _hedged_download([url, *mirrors], part_file, sha256)
+                else:
+                    actual, size = download(url, part_file, sha256)
+                    done_file = part_file
+            finally:
+                _save_latency_history()
+            record["bytes"] = size
+        os.replace(done_file, _blob_path(actual))
+    return actual, size
+
+# Downloads a Prefetcher has staged or is staging, by fetch_artifact() key
+_staged = {}
+_staged_lock = threading.Lock()
+
+def _stage_artifact(control, key, url, sha256, mirrors):
+    """fetch_artifact() on behalf of a prefetch: downloads into its staging directory
+    and publishes (file, sha256, size) for _claim_staged(). Returns the staged file."""
+    from concurrent.futures import Future
+
+    prefetcher = control["prefetcher"]
+    with _staged_lock:
+        entry = _staged.get(key)
+    if entry:
+        # Another job of this prefetch already has it (or is getting it)
+        return entry["future"].result()[0]
+
+    with prefetcher.slots:
+        with _staged_lock:
+            if _cancelled():
+                raise _Cancelled()
+            joined = _staged.get(key)
+            if joined is None:
+                entry = _staged[key] = {"future": Future(), "app": control["app"], "prefetcher": prefetcher}
+        if joined is None:
+            return _stage_download(prefetcher, control, entry, key, url, sha256, mirrors)
+    # Another job started on it while this one waited for a slot
+    return joined["future"].result()[0]
+
+def _stage_download(prefetcher, control, entry, key, url, sha256, mirrors):
+    """Downloads a claimed _staged entry and resolves its future either way."""
+    part_file = os.path.join(prefetcher.staging, hashlib.sha256(key.encode()).hexdigest())
+    try:
+        with span(os.path.basename(urllib.parse.urlsplit(url).path) or url, kind="download",
+                  url=url, prefetch=control["app"]) as record:
+            try:
+                if mirrors:
+                    actual, size, record["source"], done_file = _hedged_download([url, *mirrors], part_file, sha256)
+                else:
+                    actual, size = download(url, part_file, sha256)
+                    done_file = part_file
+            finally:
+                _save_latency_history()
+            record["bytes"] = size
+    except BaseException as e:
+        entry["future"].set_exception(e)
+        prefetcher.discard(part_file)
+        raise
+    entry["future"].set_result((done_file, actual, size))
+    return done_file
+
+def _claim_staged(key):
+    """Moves a prefetched file into the object store, waiting for it if it is still
+    downloading. Returns (sha256, size), or None if nothing usable was staged."""
+    with _staged_lock:
+        entry = _staged.pop(key, None)
+    if entry is None:
+        return None
+    try:
+        done_file, actual, size = entry["future"].result()
+        os.replace(done_file, _blob_path(actual))
+    except Exception:
+        return None
+    return actual, size
+
+def fetch_artifact(url, sha256=None, max_age=None, mirrors=(), validate=None):
+    """Returns a local path holding the contents of url, downloading only on a cache miss.
+
+    Entries are keyed by URL plus the expected sha256. Pinned entries never expire;
+    unpinned ones are refetched after max_age (default ARTIFACT_TTL) seconds.
+    Every reuse re-verifies the blob against its recorded hash. mirrors are the
+    same file elsewhere, raced against url when it is slow (see _hedged_download()).
+
+    Called from a background prefetch, a miss is downloaded into the prefetch's
+    staging area instead; a later call for the same artifact claims that file,
+    waiting for it if it is still on its way.
+
+    validate(path), for content no checksum covers, raises OSError for a body that
+    must not be cached (an error page, say); the download is then discarded."""
+    key = f"{url}#{sha256.lower()}" if sha256 else url
+    if max_age is None and not sha256:
+        max_age = ARTIFACT_TTL
+    os.makedirs(os.path.join(ARTIFACT_DIR, "objects"), exist_ok=True)
+
+    with _artifact_index() as index:
+        entry = index.get(key)
+    if entry and (max_age is None or time.time() - entry["fetched"] < max_age):
+        blob = _blob_path(entry["sha256"])
+        if os.path.exists(blob) and _sha256_file(blob) == entry["sha256"] and _valid_artifact(blob, validate):
+            with _artifact_index() as index:
+                if key in index:
+                    index[key]["last_used"] = time.time()
+            _notify(f"📦 Using cached {os.path.basename(url)}")
+            return blob
+        _notify(f"⚠️ Cached {os.path.basename(url)} failed verification, downloading again...")
+        with contextlib.suppress(OSError):
+            os.remove(blob)
+
+    control = _prefetch_control.get()
+    if control:
+        return _stage_artifact(control, key, url, sha256, mirrors)
+    staged = _claim_staged(key)
+    if staged:
+        actual, size = staged
+        print(f"📦 Using prefetched {os.path.basename(url)}")
+    else:
+        actual, size = _download_artifact(url, sha256, mirrors)
+    if validate:
+        try:
+            validate(_blob_path(actual))
+        except OSError:
+            with _artifact_index() as index:
+                index.pop(key, None)
+                shared = any(other["sha256"] == actual for other in index.values())
+            if not shared:
+                with contextlib.suppress(OSError):
+                    os.remove(_blob_path(actual))
+            raise
+    now = time.time()
+    with _artifact_index() as index:
+        index[key] = {"url": url, "sha256": actual, "size": size, "fetched": now, "last_used": now}
+        _evict_artifacts(index, keep=actual)
+    return _blob_path(actual)
+
+def cached_artifact(url):
+    """Path of the cached copy of url whatever its age, or None. Never downloads."""
+    with _artifact_index() as index:
+        entry = index.get(url)
+    blob = entry and _blob_path(entry["sha256"])
+    return blob if blob and os.path.exists(blob) else None
+
+def _valid_artifact(path, validate):
+    if validate is None:
         return True
-    except subprocess.CalledProcessError:
+    try:
+        validate(path)
+    except OSError:
+        return False
+    return True
+
+def read_artifact_text(url, max_age=None, mirrors=(), parse=None):
+    """The text at url, through the artifact cache. parse(text), if given, is applied
+    and its result returned; a body it rejects is not cached and raises OSError."""
+    def read(path):
+        try:
+            with open(path) as f:
+                text = f.read().strip()
+            return parse(text) if parse else text
+        except (ValueError, KeyError, TypeError, IndexError) as e:
+            raise OSError(f"Unexpected response from {url}: {type(e).__name__}: {e}") from e
+
+    return read(fetch_artifact(url, max_age=max_age, mirrors=mirrors, validate=parse and read))
+
+# ✅ Keyring and sources.list.d entry for each third-party APT repository
+APT_REPO_KEYS = {
+    "terraform": "https://apt.releases.hashicorp.com/gpg",
+    "gh": "https://cli.github.com/packages/githubcli-archive-keyring.gpg",
+    "jenkins": "https://pkg.jenkins.io/debian-stable/jenkins.io-2023.key",
+    "docker": "https://download.docker.com/linux/ubuntu/gpg",
+    "code": "https://packages.microsoft.com/keys/microsoft.asc",
+}
+
+# Keyring location, whether the published key must be dearmored first, and the sources entry
+APT_REPOS = {
+    "terraform": {
+        "keyring": "/usr/share/keyrings/hashicorp-archive-keyring.gpg", "dearmor": True,
+        "sources": "/etc/apt/sources.list.d/hashicorp.list",
+        "entry": "deb [arch={arch} signed-by={keyring}] https://apt.releases.hashicorp.com {codename} main\n",
+    },
+    "gh": {
+        "keyring": "/usr/share/keyrings/githubcli-archive-keyring.gpg", "dearmor": False,
+        "sources": "/etc/apt/sources.list.d/github-cli.list",
+        "entry": "deb [arch={arch} signed-by={keyring}] https://cli.github.com/packages stable main\n",
+    },
+    "jenkins": {
+        "keyring": "/etc/apt/keyrings/jenkins-keyring.asc", "dearmor": False,
+        "sources": "/etc/apt/sources.list.d/jenkins.list",
+        "entry": "deb [signed-by={keyring}] https://pkg.jenkins.io/debian-stable binary/\n",
+    },
+    "docker": {
+        "keyring": "/etc/apt/keyrings/docker.asc", "dearmor": False,
+        "sources": "/etc/apt/sources.list.d/docker.list",
+        "entry": "deb [arch={arch} signed-by={keyring}] https://download.docker.com/linux/ubuntu {codename} stable\n",
+    },
+    "code": {
+        "keyring": "/usr/share/keyrings/microsoft.gpg", "dearmor": True,
+        "sources": "/etc/apt/sources.list.d/vscode.sources",
+        "entry": ("Types: deb\n"
+                  "URIs: https://packages.microsoft.com/repos/code\n"
+                  "Suites: stable\n"
+                  "Components: main\n"
+                  "Architectures: amd64,arm64,armhf\n"
+                  "Signed-By: {keyring}\n"),
+    },
+}
+
+@functools.lru_cache(maxsize=None)
+def _dpkg_arch():
+    result = run_command(["dpkg", "--print-architecture"], capture_output=True, text=True)
+    return result.stdout.strip() or "amd64"
+
+@functools.lru_cache(maxsize=None)
+def _os_codename():
+    """UBUNTU_CODENAME (set on Ubuntu derivatives too), else VERSION_CODENAME."""
+    fields = {}
+    with contextlib.suppress(OSError), open("/etc/os-release") as f:
+        for line in f:
+            key, _, value = line.strip().partition("=")
+            fields[key] = value.strip('"')
+    return fields.get("UBUNTU_CODENAME") or fields.get("VERSION_CODENAME", "")
+
+def _dearmor(data):
+    """Pure-Python `gpg --dearmor`: the base64 bodies of every armored block, decoded.
+
+    Keys that are already binary are returned unchanged."""
+    import base64
+
+    if b"-----BEGIN PGP" not in data:
+        return data
+    packets = b""
+    body, state = [], None
+    for line in data.decode("ascii", errors="replace").splitlines():
+        line = line.strip()
+        if line.startswith("-----BEGIN PGP"):
+            body, state = [], "headers"
+        elif line.startswith("-----END PGP"):
+            packets += base64.b64decode("".join(body))
+            state = None
+        elif state == "headers":
+            # Armor headers ("Version: ...") end at the first blank line
+            if not line:
+                state = "body"
+            elif ":" not in line:
+                body.append(line)
+                state = "body"
+        elif state == "body" and line and not line.startswith("="):  # "=XXXX" is the CRC24
+            body.append(line)
+    return packets
+
+def apt_repo_files(app, offline=False):
+    """{path: bytes} the keyring and sources entry for app should contain.
+
+    offline uses whatever copy of the key is cached, however old, and never
+    downloads; the keyring's content is None when there is no copy at all."""
+    repo = APT_REPOS[app]
+    source = cached_artifact(APT_REPO_KEYS[app]) if offline else fetch_artifact(APT_REPO_KEYS[app])
+    key = None
+    if source is not None:
+        with open(source, "rb") as f:
+            key = f.read()
+    entry = repo["entry"].format(arch=_dpkg_arch(), codename=_os_codename(), keyring=repo["keyring"])
+    return {repo["keyring"]: _dearmor(key) if key is not None and repo["dearmor"] else key,
+            repo["sources"]: entry.encode()}
+
+def _file_matches(path, content):
+    try:
+        with open(path, "rb") as f:
+            return f.read() == content
+    except OSError:
         return False
 
-# ✅ Check if a command exists on the system
-def is_installed(app):
-    if app == "node":
-        # Try regular node detection first
-        if shutil.which("node"):
-            return True
+def _install_file(path, content, mode="644"):
+    """Writes content to a root-owned path through one `sudo install`."""
+    import tempfile
+
+    with tempfile.NamedTemporaryFile(prefix="devops-setup-") as tmp:
+        tmp.write(content)
+        tmp.flush()
+        run_command(["sudo", "install", "-D", "-o", "root", "-g", "root", "-m", mode, tmp.name, path], check=True)
+
+def setup_apt_repo(app):
+    """Brings the keyring and sources entry for app in line. Returns the paths it had to write."""
+    if app not in APT_REPOS:
+        return []
+    if app == "code":
+        print("📥 Setting up Microsoft APT repo for VS Code...")
+    written = []
+    for path, content in apt_repo_files(app).items():
+        if not _file_matches(path, content):
+            _install_file(path, content)
+            written.append(path)
+    return written
+
+def _missing_apt_packages(packages):
+    """Returns the packages dpkg does not report as installed, in one query."""
+    if not packages:
+        return []
+    result = run_command(["dpkg-query", "-W", "-f=${Package} ${Status}\n"] + packages,
+                         capture_output=True, text=True)
+    present = {line.split()[0] for line in result.stdout.splitlines() if line.endswith(" installed")}
+    return [pkg for pkg in packages if pkg not in present]
+
+def _unique(items):
+    return list(dict.fromkeys(items))
+
+def plan_apt(apps):
+    """What install_apt_apps(apps) still has to do on this host, without changing anything.
+
+    Never downloads: repository files are compared against cached keys, and a
+    keyring whose key was never fetched counts as one to write.
+    Returns {"prerequisites": [...], "files": {app: [paths]}, "packages": [...], "update": bool}."""
+    prerequisites = _missing_apt_packages(_unique(
+        pkg for app in apps for pkg in APT_PREREQUISITES.get(app, [])))
+    files = {}
+    for app in apps:
+        if app in APT_REPOS:
+            changed = [path for path, content in apt_repo_files(app, offline=True).items()
+                       if content is None or not _file_matches(path, content)]
+            if changed:
+                files[app] = changed
+    packages = _missing_apt_packages(_unique(pkg for app in apps for pkg in APT_PACKAGES.get(app, [app])))
+    return {"prerequisites": prerequisites, "files": files, "packages": packages,
+            "update": bool(files or packages)}
+
+# ✅ Install apt-backed tools with one index refresh and one apt-get transaction
+def install_apt_apps(apps):
+    """Returns {app: True/False} so every tool still gets its own outcome.
+
+    Only the parts that are not already in place run: identical keyrings and
+    sources entries are left alone, and with nothing to install there is no
+    apt-get update either."""
+    results = {}
+    print(f"\n📥 Installing via APT: {', '.join(apps)}")
+
+    try:
+        # Keyring downloads need curl/wget/gpg; try the existing indexes before refreshing
+        prerequisites = _missing_apt_packages(_unique(
+            pkg for app in apps for pkg in APT_PREREQUISITES.get(app, [])))
+        if prerequisites:
+            print(f"📦 Installing prerequisites: {' '.join(prerequisites)}")
+            install_cmd = ["sudo", "apt-get", *apt_network_options("apt-install"), "install", "-y"] + prerequisites
+            if run_command(install_cmd).returncode != 0:
+                run_network_command(["sudo", "apt-get", *apt_network_options("apt-update"), "update"], "apt-update")
+                run_network_command(install_cmd, "apt-install")
+    except subprocess.SubprocessError as e:
+        print("❌ Failed to install APT prerequisites")
+        print(f"   Error: {e}")
+
+    # Phase 1: every keyring and sources.list.d entry that differs from what it should be
+    ready = []
+    for app in apps:
+        try:
+            setup_apt_repo(app)
+            ready.append(app)
+        except (subprocess.SubprocessError, OSError) as e:
+            print(f"❌ Failed to set up the APT repository for {app}")
+            print(f"   Error: {e}")
+            results[app] = False
+
+    # Phase 2: a single index refresh and a single install transaction, when needed at all
+    packages = _missing_apt_packages(_unique(pkg for app in ready for pkg in APT_PACKAGES.get(app, [app])))
+    present = [app for app in ready if not set(APT_PACKAGES.get(app, [app])) & set(packages)]
+    results.update((app, True) for app in present)
+    ready = [app for app in ready if app not in present]
+    if ready:
+        try:
+            print("🔄 Refreshing package indexes...")
+            run_network_command(["sudo", "apt-get", *apt_network_options("apt-update"), "update"], "apt-update")
+            print(f"📦 Installing packages: {' '.join(packages)}")
+            run_network_command(["sudo", "apt-get", *apt_network_options("apt-install"), "install", "-y"] + packages,
+                                "apt-install")
+            results.update((app, True) for app in ready)
+        except subprocess.SubprocessError as e:
+            print(f"⚠️ Batched APT transaction failed ({e}). Retrying tool by tool...")
+            # Indexes are already fresh, so each retry is just an install
+            for app in ready:
+                try:
+                    run_network_command(["sudo", "apt-get", *apt_network_options("apt-install"), "install", "-y"]
+                                        + APT_PACKAGES.get(app, [app]), "apt-install")
+                    results[app] = True
+                except subprocess.SubprocessError as app_error:
+                    print(f"   Error: {app_error}")
+                    results[app] = False
+
+    for app in apps:
+        if app in present:
+            print(f"✅ {app} is already installed.")
+        elif results.get(app):
+            print(f"✅ {app} has been installed successfully.")
+            print_app_version(app)
+            log_install(app)
+        else:
+            print(f"❌ Failed to install {app}")
+        invalidate_detect_cache(app)
+        refresh_inventory_entry(app)
+    return results
+
+# ✅ Install steps for tools that do not come from APT
+# Each step is (name, function, resources); a step receives the shared options dict.
+# Every one of these tools installs from an upstream release asset: no Homebrew
+# bootstrap, no piped install scripts, just a verified download placed atomically.
+
+# Where release assets are installed: binaries go to <prefix>/bin, trees under <prefix>/lib.
+# Use a user prefix such as ~/.local to install without sudo.
+RELEASE_PREFIX = os.environ.get("DEVOPS_PREFIX") or "/usr/local"
+
+# Exact version and asset checksum installed for each tool, per architecture
+RELEASE_LOCK_FILE = os.environ.get("DEVOPS_LOCKFILE") or os.path.join(
+    os.environ.get("XDG_CONFIG_HOME") or os.path.expanduser("~/.config"), "devops-setup", "tools.lock.json")
+RELEASE_LOCK_FORMAT = 1
+
+# uname -m to the architecture names release assets use
+RELEASE_ARCHES = {"x86_64": "amd64", "aarch64": "arm64", "armv7l": "arm"}
+
+def _release_version(text):
+    """A "latest" pointer must hold one version string, not an error page or rate-limit notice."""
+    import re
+
+    if not re.fullmatch(r"v?\d+(\.\d+)*([-+.][0-9A-Za-z.-]+)?", text):
+        raise ValueError(f"not a version: {text[:80]!r}")
+    return text
+
+# An upgrade always asks upstream; otherwise a "latest" pointer is reused for ARTIFACT_TTL
+def _latest_text(source, path, options):
+    url = f"{select_source(source)}/{path}"
+    return read_artifact_text(url, max_age=0 if options.get("upgrade") else None,
+                              mirrors=source_mirrors(source, url), parse=_release_version)
+
+def _latest_tag(source, path, options):
+    url = f"{select_source(source)}/{path}"
+    return read_artifact_text(url, max_age=0 if options.get("upgrade") else None,
+                              mirrors=source_mirrors(source, url),
+                              parse=lambda text: _release_version(json.loads(text)["tag_name"]))
+
+# How to find, verify and unpack each tool's release. Paths are relative to the
+# tool's download source and may use {version}, {bare} (version without "v") and
+# {arch}. "member" is the binary inside an archive (None: the asset is the binary);
+# "tree" assets are unpacked whole under <prefix>/<tree> and their "links" exposed
+# in <prefix>/bin.
+RELEASE_ASSETS = {
+    "kubectl": {
+        "source": "kubernetes",
+        "latest": lambda options: _latest_text("kubernetes", "release/stable.txt", options),
+        "asset": "release/{version}/bin/linux/{arch}/kubectl",
+        "checksum": "release/{version}/bin/linux/{arch}/kubectl.sha256",
+        "member": None,
+    },
+    "minikube": {
+        "source": "minikube",
+        "latest": lambda options: _latest_tag("github-api", "repos/kubernetes/minikube/releases/latest", options),
+        "asset": "{version}/minikube-linux-{arch}",
+        "checksum": "{version}/minikube-linux-{arch}.sha256",
+        "member": None,
+    },
+    "helm": {
+        "source": "helm",
+        "latest": lambda options: _latest_text("helm", "helm-latest-version", options),
+        "asset": "helm-{version}-linux-{arch}.tar.gz",
+        "checksum": "helm-{version}-linux-{arch}.tar.gz.sha256sum",
+        "member": "linux-{arch}/helm",
+    },
+    "glab": {
+        "source": "glab",
+        "latest": lambda options: _latest_tag("gitlab-api", "projects/gitlab-org%2Fcli/releases/permalink/latest",
+                                               options),
+        "asset": "v{bare}/downloads/glab_{bare}_linux_{arch}.tar.gz",
+        "checksum": "v{bare}/downloads/checksums.txt",
+        "member": "bin/glab",
+    },
+    "node": {
+        "source": "node",
+        "channel": lambda options: options.get("node_version") or "22",
+        "latest": lambda options: _node_release(options.get("node_version") or "22",
+                                                max_age=0 if options.get("upgrade") else None),
+        "asset": "{version}/node-{version}-linux-{arch}.tar.xz",
+        "checksum": "{version}/SHASUMS256.txt",
+        "arches": {"x86_64": "x64", "aarch64": "arm64", "armv7l": "armv7l"},
+        "tree": "lib/nodejs/{version}",
+        "links": ["node", "npm", "npx", "corepack"],
+    },
+}
+
+_release_lock_mutex = threading.Lock()
+
+def _load_release_lock():
+    try:
+        with open(RELEASE_LOCK_FILE) as f:
+            lock = json.load(f)
+    except (OSError, ValueError):
+        lock = {}
+    if lock.get("format") != RELEASE_LOCK_FORMAT:
+        lock = {"format": RELEASE_LOCK_FORMAT, "tools": {}}
+    return lock
+
+def release_arch(app):
+    machine = os.uname().machine
+    arch = RELEASE_ASSETS[app].get("arches", RELEASE_ARCHES).get(machine)
+    if arch is None:
+        raise OSError(f"{app} publishes no release for {machine}")
+    return arch
+
+def release_asset(app, options=None):
+    """Which release asset of app to install here: the lockfile's pin when it covers the
+    requested channel, the latest release otherwise (or with options["upgrade"]).
+
+    Returns {"app", "channel", "version", "arch", "name", "url", "sha256", "mirrors"}."""
+    spec = RELEASE_ASSETS[app]
+    options = options or {}
+    channel = spec["channel"](options) if "channel" in spec else "latest"
+    arch = release_arch(app)
+    pin = None if options.get("upgrade") else _load_release_lock()["tools"].get(app)
+    if pin and pin.get("channel") == channel:
+        version, locked = pin["version"], pin["assets"].get(arch)
+    else:
+        version, locked = spec["latest"](options).strip(), None
+
+    source = select_source(spec["source"])
+    fields = {"version": version, "bare": version.lstrip("v"), "arch": arch}
+    url = f"{source}/{spec['asset'].format(**fields)}"
+    name = os.path.basename(urllib.parse.urlsplit(url).path)
+    # A pinned checksum never changes; otherwise trust the one published with the release
+    checksum_url = f"{source}/{spec['checksum'].format(**fields)}"
+    sha256 = locked["sha256"] if locked else _checksum_from_list(
+        checksum_url, name, source_mirrors(spec["source"], checksum_url))
+    return {"app": app, "channel": channel, "version": version, "arch": arch, "name": name,
+            "url": url, "sha256": sha256, "mirrors": source_mirrors(spec["source"], url)}
+
+def pin_release(asset):
+    """Records asset in the lockfile, keeping other architectures' pins of the same version."""
+    with _release_lock_mutex:
+        lock = _load_release_lock()
+        previous = lock["tools"].get(asset["app"], {})
+        assets = previous.get("assets", {}) if previous.get("version") == asset["version"] else {}
+        assets[asset["arch"]] = {"name": asset["name"], "sha256": asset["sha256"]}
+        lock["tools"][asset["app"]] = {"version": asset["version"], "channel": asset["channel"],
+                                       "assets": dict(sorted(assets.items()))}
+        os.makedirs(os.path.dirname(RELEASE_LOCK_FILE) or ".", exist_ok=True)
+        tmp_file = f"{RELEASE_LOCK_FILE}.{os.getpid()}.tmp"
+        with open(tmp_file, "w") as f:
+            json.dump(lock, f, indent=2, sort_keys=True)
+            f.write("\n")
+        os.replace(tmp_file, RELEASE_LOCK_FILE)
+
+def _prefix_command(args):
+    """Runs args as the current user when RELEASE_PREFIX is writable, through sudo otherwise."""
+    existing = os.path.abspath(RELEASE_PREFIX)
+    while not os.path.exists(existing):
+        existing = os.path.dirname(existing)
+    sudo = [] if os.access(existing, os.W_OK) else ["sudo"]
+    run_command(sudo + args, check=True)
+
+def _place_atomically(src, dest, directory=False):
+    """Copies src next to dest, then renames it over dest, so dest is never half-written."""
+    tmp = os.path.join(os.path.dirname(dest), f".{os.path.basename(dest)}.{os.getpid()}.tmp")
+    if directory:
+        _prefix_command(["mkdir", "-p", os.path.dirname(dest)])
+        _prefix_command(["cp", "-a", "--no-preserve=ownership", src, tmp])
+        old = f"{tmp}.old"
+        if os.path.exists(dest):
+            _prefix_command(["mv", "-T", dest, old])
+        _prefix_command(["mv", "-T", tmp, dest])
+        _prefix_command(["rm", "-rf", old])
+    else:
+        _prefix_command(["install", "-D", "-m", "0755", src, tmp])
+        _prefix_command(["mv", "-f", tmp, dest])
+
+def _link_atomically(target, link):
+    tmp = os.path.join(os.path.dirname(link), f".{os.path.basename(link)}.{os.getpid()}.tmp")
+    _prefix_command(["mkdir", "-p", os.path.dirname(link)])
+    _prefix_command(["ln", "-sfn", target, tmp])
+    _prefix_command(["mv", "-Tf", tmp, link])
+
+def place_release(app, path, version):
+    """Installs the downloaded asset at path into RELEASE_PREFIX."""
+    import tempfile
+
+    spec = RELEASE_ASSETS[app]
+    bin_dir = os.path.join(RELEASE_PREFIX, "bin")
+    arch = release_arch(app)
+    with tempfile.TemporaryDirectory(prefix=f"devops-{app}-") as tmp:
+        if spec.get("tree"):
+            _extract_tar(path, tmp, strip_components=1)
+            os.chmod(tmp, 0o755)
+            home = os.path.join(RELEASE_PREFIX, spec["tree"].format(version=version))
+            _place_atomically(tmp, home, directory=True)
+            for name in spec["links"]:
+                if os.path.exists(os.path.join(tmp, "bin", name)):
+                    _link_atomically(os.path.relpath(os.path.join(home, "bin", name), bin_dir),
+                                     os.path.join(bin_dir, name))
+        elif spec["member"]:
+            member = spec["member"].format(arch=arch)
+            _extract_tar(path, tmp, members=[member])
+            _place_atomically(os.path.join(tmp, member), os.path.join(bin_dir, app))
+        else:
+            _place_atomically(path, os.path.join(bin_dir, app))
+    if bin_dir not in os.environ.get("PATH", "").split(os.pathsep):
+        print(f"⚠️ {bin_dir} is not on PATH; add it to use {app}.")
+
+def _release_fetch(app):
+    def fetch(options):
+        print(f"🔍 Resolving the {app} release...")
+        asset = release_asset(app, options)
+        print(f"📥 Downloading {asset['name']} ({asset['version']}, {asset['arch']})...")
+        # The download is hashed while it streams and rejected on mismatch
+        options[f"{app}_asset"] = asset
+        options[f"{app}_artifact"] = fetch_artifact(asset["url"], sha256=asset["sha256"], mirrors=asset["mirrors"])
+    return fetch
+
+def _release_place(app):
+    def place(options):
+        asset = options[f"{app}_asset"]
+        print(f"📦 Installing {app} {asset['version']} into {RELEASE_PREFIX}...")
+        place_release(app, options[f"{app}_artifact"], asset["version"])
+        pin_release(asset)
+    return place
+
+BINARY_INSTALL_STEPS = {
+    app: [("fetch", _release_fetch(app), {"network"}),
+          ("place", _release_place(app), {"prefix"})]
+    for app in RELEASE_ASSETS
+}
+
+def ask_node_version():
+    return input("⬇️ Enter Node.js version to install (default: 22): ").strip() or "22"
+
+def finish_install(app):
+    print(f"✅ {app} has been installed successfully.")
+    print_app_version(app)
+    log_install(app)
+
+# ✅ Speculative prefetch: download what missing tools need while the user answers prompts
+# Concurrent prefetch downloads, and their combined bandwidth in KiB/s (0 = unlimited)
+# until the install itself starts
+PREFETCH_WORKERS = 2
+PREFETCH_RATE_LIMIT = int(os.environ.get("DEVOPS_PREFETCH_KBPS", "4096")) * 1024
+
+def prefetch_resolvers(app, options):
+    """Resolvers returning (url, sha256, mirrors) for what app's install will fetch_artifact():
+    its release asset, or an APT-backed tool's repository key."""
+    if app in RELEASE_ASSETS:
+        def resolve():
+            asset = release_asset(app, options)
+            return asset["url"], asset["sha256"], asset["mirrors"]
+        return [resolve]
+    if app in APT_REPO_KEYS:
+        return [lambda: (APT_REPO_KEYS[app], None, ())]
+    return []
+
+class _RateLimiter:
+    """Token bucket shared by every download of a prefetch; rate None lifts the cap."""
+
+    def __init__(self, rate):
+        self.rate = rate or None
+        self.allowance = self.rate or 0
+        self.stamp = time.monotonic()
+        self.lock = threading.Lock()
+
+    def consume(self, size, cancel):
+        while True:
+            with self.lock:
+                if not self.rate:
+                    return
+                now = time.monotonic()
+                # At most a second's worth of burst; a block may overdraw it
+                self.allowance = min(self.rate, self.allowance + (now - self.stamp) * self.rate)
+                self.stamp = now
+                if self.allowance > 0:
+                    self.allowance -= size
+                    return
+                delay = -self.allowance / self.rate
+            # Short waits, so release() and cancel() take effect promptly
+            if cancel.wait(min(delay, 0.25)):
+                raise _Cancelled()
+
+class Prefetcher:
+    """Downloads what tools are about to need into a private staging directory, in the
+    background, so the network time overlaps the install prompts.
+
+    At most PREFETCH_WORKERS downloads run at once, throttled to PREFETCH_RATE_LIMIT
+    until release(). cancel() drops a tool and deletes its files; leaving the block
+    drops everything left. fetch_artifact() claims staged files, so install steps
+    pick them up without knowing a prefetch ran."""
+
+    def __init__(self, apps=()):
+        self.apps = list(apps)
+        self.slots = threading.BoundedSemaphore(PREFETCH_WORKERS)
+        self.limiter = _RateLimiter(PREFETCH_RATE_LIMIT)
+        self.cancels = {}
+        self.staging = None
+
+    def __enter__(self):
+        import tempfile
 
-        # Try detecting node via nvm
-        nvm_paths = [
-            os.path.expanduser("~/.nvm"),
-            "/usr/local/share/nvm",
-            "/opt/nvm"
-        ]
-
-        for nvm_dir in nvm_paths:
-            nvm_sh = os.path.join(nvm_dir, "nvm.sh")
-            if os.path.exists(nvm_sh):
-                cmd = (
-                    f'export NVM_DIR="{nvm_dir}" && '
-                    f'[ -s "$NVM_DIR/nvm.sh" ] && . "$NVM_DIR/nvm.sh" && '
-                    'nvm current'
-                )
-                result = subprocess.run(
-                    cmd,
-                    shell=True,
-                    executable="/bin/bash",
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE
-                )
-                # Check if nvm returned a valid node version
-                if b"none" not in result.stdout and result.returncode == 0:
-                    return True
-        return False
+        os.makedirs(os.path.join(ARTIFACT_DIR, "staging"), exist_ok=True)
+        self.staging = tempfile.mkdtemp(dir=os.path.join(ARTIFACT_DIR, "staging"))
+        for app in self.apps:
+            self.start(app)
+        return self
 
-    return shutil.which(app) is not None
+    def __exit__(self, *exc):
+        for app in list(self.cancels):
+            self.cancel(app)
+        shutil.rmtree(self.staging, ignore_errors=True)
 
-# ✅ Display which tools are currently installed
-def check_installed_apps():
-    print("\n🔍 Checking installed applications:")
-    for category, apps in APP_CATEGORIES.items():
-        print(f"\n📦 {category}")
-        for app in apps:
-            status = "✅" if is_installed(app) else "❌"
-            print(f"   {status} {app}")
+    def start(self, app, **options):
+        """Starts fetching app's artifacts; options are what its install steps will get."""
+        cancel = self.cancels.setdefault(app, threading.Event())
+        control = {"app": app, "cancel": cancel, "limiter": self.limiter, "prefetcher": self}
 
-# developing...
+        def job():
+            _prefetch_control.set(control)
+            try:
+                resolvers = prefetch_resolvers(app, options)
+            except Exception:
+                return
+            for resolve in resolvers:
+                if cancel.is_set():
+                    return
+                # Best effort: whatever fails here the install step fetches for itself
+                with contextlib.suppress(Exception):
+                    url, sha256, mirrors = resolve()
+                    fetch_artifact(url, sha256=sha256, mirrors=mirrors)
 
-def prompt_install_apps():
-    bulk_choice = input("\n🚀 Install all missing apps without confirmation? [y/n]: ").strip().lower()
-    for category, apps in APP_CATEGORIES.items():
-        print(f"\n🔧 {category}")
-        for app in apps:
-            if not is_installed(app):
-                if bulk_choice == "y":
-                    install_app(app)
-                else:
-                    choice = input(f"   → Install {app}? [y/n]: ").strip().lower()
-                    if choice == "y":
-                        install_app(app)
+        # Daemon threads: a download stuck on a dead connection must not hold up exit
+        threading.Thread(target=_propagate(job), daemon=True).start()
+
+    def cancel(self, app):
+        """Stops app's downloads and deletes whatever it staged."""
+        if app in self.cancels:
+            self.cancels[app].set()
+        with _staged_lock:
+            dropped = [key for key, entry in _staged.items()
+                       if entry["app"] == app and entry["prefetcher"] is self]
+            entries = [_staged.pop(key) for key in dropped]
+        for entry in entries:
+            # Running downloads clean up after themselves once they notice the cancel
+            if entry["future"].done() and not entry["future"].exception():
+                self.discard(entry["future"].result()[0])
+
+    def release(self):
+        """Lifts the bandwidth cap: the install is starting and wants everything now."""
+        self.limiter.rate = None
+
+    def discard(self, path):
+        """Removes a staged file along with its resume metadata and hedge copies."""
+        prefix = os.path.basename(path).split(".")[0]
+        with contextlib.suppress(OSError):
+            for name in os.listdir(self.staging):
+                if name.startswith(prefix):
+                    with contextlib.suppress(OSError):
+                        os.remove(os.path.join(self.staging, name))
 
-# ✅ Custom install logic for specific apps
-def install_app(app):
-    print(f"\n📥 Installing {app}...")
+# ✅ Convergence: fingerprint what each tool's steps leave behind and skip what is already applied
+CONVERGE_STATE_FILE = os.path.join(CACHE_DIR, "converge.json")
 
+_converge_state = None
+_converge_lock = threading.Lock()
+
+def _load_converge_state():
+    global _converge_state
+    if _converge_state is None:
+        try:
+            with open(CONVERGE_STATE_FILE) as f:
+                _converge_state = json.load(f)
+        except (OSError, ValueError):
+            _converge_state = {}
+        for section in ("tools", "steps", "files"):
+            _converge_state.setdefault(section, {})
+    return _converge_state
+
+def _save_converge_state():
+    os.makedirs(os.path.dirname(CONVERGE_STATE_FILE), exist_ok=True)
+    tmp_file = f"{CONVERGE_STATE_FILE}.{os.getpid()}.tmp"
+    with open(tmp_file, "w") as f:
+        json.dump(_converge_state, f, indent=2)
+    os.replace(tmp_file, CONVERGE_STATE_FILE)
+
+def _content_sha256(path):
+    """sha256 of a file, rehashed only when its inode, mtime or size moved since the last time."""
     try:
-        if app == "terraform":
-            # Terraform custom install via HashiCorp APT repo
-            subprocess.run("wget -O- https://apt.releases.hashicorp.com/gpg | "
-                           "sudo gpg --dearmor -o /usr/share/keyrings/hashicorp-archive-keyring.gpg",
-                           shell=True, check=True)
+        st = os.stat(path)
+        signature = [st.st_ino, st.st_mtime_ns, st.st_size]
+        with _converge_lock:
+            entry = _load_converge_state()["files"].get(path)
+        if entry and entry["signature"] == signature:
+            return entry["sha256"]
+        digest = _sha256_file(path)
+    except OSError:
+        return None
+    with _converge_lock:
+        _load_converge_state()["files"][path] = {"signature": signature, "sha256": digest}
+    return digest
 
-            subprocess.run('echo "deb [arch=$(dpkg --print-architecture) signed-by=/usr/share/keyrings/hashicorp-archive-keyring.gpg] '
-                           'https://apt.releases.hashicorp.com '
-                           '$(grep -oP \'(?<=UBUNTU_CODENAME=).*\' /etc/os-release || lsb_release -cs) main" | '
-                           'sudo tee /etc/apt/sources.list.d/hashicorp.list',
-                           shell=True, check=True)
+def _release_fingerprint(app):
+    def fingerprint(options):
+        # Through the symlink for tree installs, so a different version is a change
+        path = os.path.realpath(os.path.join(RELEASE_PREFIX, "bin", app))
+        digest = _content_sha256(path)
+        spec = RELEASE_ASSETS[app]
+        return digest and {"path": path, "sha256": digest,
+                           "channel": spec["channel"](options) if "channel" in spec else "latest",
+                           "locked": _load_release_lock()["tools"].get(app, {}).get("version")}
+    return fingerprint
 
-            subprocess.run("sudo apt update", shell=True, check=True)
-            subprocess.run("sudo apt install -y terraform", shell=True, check=True)
+# What a finished install of each non-APT tool looks like on disk; None means not there
+TOOL_FINGERPRINTS = {app: _release_fingerprint(app) for app in RELEASE_ASSETS}
 
-            print(f"✅ {app} has been installed successfully.")
-            result = subprocess.run([app, "version"], check=True, capture_output=True, text=True)
-            print(f"Current {app} version: {result.stdout.strip()}") 
-
-        elif app == "gh":
-            # GitHub CLI install (official method)
-            subprocess.run("type -p curl >/dev/null || sudo apt install curl -y", shell=True, check=True)
-            subprocess.run("curl -fsSL https://cli.github.com/packages/githubcli-archive-keyring.gpg | "
-                           "sudo dd of=/usr/share/keyrings/githubcli-archive-keyring.gpg", shell=True, check=True)
-            subprocess.run("sudo chmod go+r /usr/share/keyrings/githubcli-archive-keyring.gpg", shell=True, check=True)
-            subprocess.run('echo "deb [arch=$(dpkg --print-architecture) signed-by=/usr/share/keyrings/githubcli-archive-keyring.gpg] '
-                           'https://cli.github.com/packages stable main" | '
-                           "sudo tee /etc/apt/sources.list.d/github-cli.list > /dev/null", shell=True, check=True)
-            subprocess.run("sudo apt update", shell=True, check=True)
-            subprocess.run("sudo apt install -y gh", shell=True, check=True)
+# dpkg rewrites its status database whenever any package is installed, upgraded or removed
+DPKG_STATUS_FILE = "/var/lib/dpkg/status"
 
-            print(f"✅ {app} has been installed successfully.")
-            result = subprocess.run([app, "--version"], check=True, capture_output=True, text=True)
-            print(f"Current {app} version: {result.stdout.strip()}")
-
-        elif app == "glab":
-            # Install glab via Homebrew
-            if not shutil.which("brew"):
-                print("🔍 Homebrew not found. Installing Homebrew first...")
-                subprocess.run('/bin/bash -c "$(curl -fsSL https://raw.githubusercontent.com/Homebrew/install/HEAD/install.sh)"',
-                               shell=True, check=True)
-                # Homebrew needs to be added to path (especially for Linux)
-                os.environ["PATH"] += os.pathsep + "/home/linuxbrew/.linuxbrew/bin"
-
-            subprocess.run("brew install glab", shell=True, check=True)
-
-        elif app == "jenkins":
-            # Jenkins custom install from official repository
-            subprocess.run("sudo mkdir -p /etc/apt/keyrings", shell=True, check=True)
-            subprocess.run("sudo wget -O /etc/apt/keyrings/jenkins-keyring.asc "
-                           "https://pkg.jenkins.io/debian-stable/jenkins.io-2023.key",
-                           shell=True, check=True)
-
-            subprocess.run('echo "deb [signed-by=/etc/apt/keyrings/jenkins-keyring.asc] '
-                           'https://pkg.jenkins.io/debian-stable binary/" | '
-                           "sudo tee /etc/apt/sources.list.d/jenkins.list > /dev/null",
-                           shell=True, check=True)
-
-            subprocess.run("sudo apt-get update", shell=True, check=True)
-            subprocess.run("sudo apt-get install -y jenkins", shell=True, check=True)
-        
-            print(f"✅ {app} has been installed successfully.")
-            result = subprocess.run([app, "--version"], check=True, capture_output=True, text=True)
-            print(f"Current {app} version: {result.stdout.strip()}") 
-
-        elif app == "docker":
-            # Docker official install via Docker APT repository
-            subprocess.run("sudo apt-get update", shell=True, check=True)
-            subprocess.run("sudo apt-get install -y ca-certificates curl", shell=True, check=True)
-            subprocess.run("sudo install -m 0755 -d /etc/apt/keyrings", shell=True, check=True)
-            subprocess.run("sudo curl -fsSL https://download.docker.com/linux/ubuntu/gpg "
-                           "-o /etc/apt/keyrings/docker.asc", shell=True, check=True)
-            subprocess.run("sudo chmod a+r /etc/apt/keyrings/docker.asc", shell=True, check=True)
-
-            subprocess.run('echo "deb [arch=$(dpkg --print-architecture) signed-by=/etc/apt/keyrings/docker.asc] '
-                           'https://download.docker.com/linux/ubuntu '
-                           '$(. /etc/os-release && echo ${UBUNTU_CODENAME:-$VERSION_CODENAME}) stable" | '
-                           'sudo tee /etc/apt/sources.list.d/docker.list > /dev/null',
-                           shell=True, check=True)
-
-            subprocess.run("sudo apt-get update", shell=True, check=True)
-            subprocess.run("sudo apt-get install -y docker-ce docker-ce-cli containerd.io "
-                           "docker-buildx-plugin docker-compose-plugin", shell=True, check=True)
-            
-            print(f"✅ {app} has been installed successfully.")
-            result = subprocess.run([app, "--version"], check=True, capture_output=True, text=True)
-            print(f"Current {app} version: {result.stdout.strip()}")
+def _apt_fingerprint(app):
+    """Repository file hashes and the dpkg database's signature for an APT-backed tool.
 
-        elif app == "kubectl":
-            # Install kubectl from official Kubernetes release
-            print("🔍 Downloading latest kubectl release...")
+    Only stat() calls (and a rehash of files that moved): no dpkg-query, no downloads."""
+    repo = APT_REPOS.get(app, {})
+    return {"files": {repo[kind]: _content_sha256(repo[kind]) for kind in ("keyring", "sources") if repo},
+            "dpkg": _file_signature(DPKG_STATUS_FILE)}
 
-            subprocess.run('curl -LO "https://dl.k8s.io/release/$(curl -L -s https://dl.k8s.io/release/stable.txt)/bin/linux/amd64/kubectl"',
-                           shell=True, check=True)
-            subprocess.run('curl -LO "https://dl.k8s.io/release/$(curl -L -s https://dl.k8s.io/release/stable.txt)/bin/linux/amd64/kubectl.sha256"',
-                           shell=True, check=True)
+def _estimate_seconds(step_names):
+    """Sum of each step's last recorded duration, or None if any step never ran here."""
+    steps = _load_converge_state()["steps"]
+    if not all(name in steps for name in step_names):
+        return None
+    return sum(steps[name]["seconds"] for name in step_names)
 
-            print("🔍 Verifying checksum...")
-            result = subprocess.run('echo "$(cat kubectl.sha256)  kubectl" | sha256sum --check',
-                                    shell=True)
+def converge_plan(apps, options=None, force=False):
+    """Decides, without changing or downloading anything, which tools still have steps to run.
 
-            if result.returncode != 0:
-                print("❌ Checksum verification failed! Aborting install.")
-                return
+    Returns [{"app", "run", "reason", "steps", "estimate"}] in the order given."""
+    options = options or {}
+    tools = _load_converge_state()["tools"]
+    rows = []
 
-            print("✅ Checksum OK. Installing kubectl...")
-            subprocess.run("sudo install -o root -g root -m 0755 kubectl /usr/local/bin/kubectl",
-                           shell=True, check=True)
+    apt_apps = [app for app in apps if is_apt_backed(app)]
+    # A recorded fingerprint that still matches settles a tool without asking dpkg
+    settled = [] if force else [app for app in apt_apps
+                                if tools.get(app, {}).get("fingerprint") == _apt_fingerprint(app)]
+    unsettled = [app for app in apt_apps if app not in settled]
+    apt = plan_apt(unsettled) if unsettled else None
+    for app in apps:
+        if app in settled:
+            run, reason, steps = False, "up to date", ["apt"]
+        elif app in apt_apps:
+            actions = [f"write {path}" for path in apt["files"].get(app, [])]
+            missing = [pkg for pkg in APT_PACKAGES.get(app, [app]) if pkg in apt["packages"]]
+            if missing:
+                actions.append(f"install {' '.join(missing)}")
+            run = force or bool(actions)
+            reason = "; ".join(actions) if actions else ("forced" if force else "up to date")
+            steps = ["apt"]
+        else:
+            fingerprint = TOOL_FINGERPRINTS[app](options)
+            recorded = tools.get(app, {}).get("fingerprint")
+            if force:
+                run, reason = True, "forced"
+            elif options.get("upgrade"):
+                run, reason = True, "checking for a newer release"
+            elif fingerprint is None:
+                run, reason = True, "not installed"
+            elif recorded is not None and recorded != fingerprint:
+                run, reason = True, "changed since it was last applied"
+            else:
+                run, reason = False, "up to date" if recorded else "already installed, adopting it"
+            steps = [f"{app}:{name}" for name, _, _ in BINARY_INSTALL_STEPS[app]] + [f"{app}:verify"]
+        rows.append({"app": app, "run": run, "reason": reason, "steps": steps,
+                     "estimate": _estimate_seconds(steps) if run else 0.0})
+    return rows
 
-            print(f"✅ {app} has been installed successfully.")
-            result = subprocess.run([app, "version", "--client"], check=True, capture_output=True, text=True)
-            print(f"Current {app} version: {result.stdout.strip()}")
+def print_converge_plan(rows):
+    print("\n📋 Install plan")
+    width = max(len(row["app"]) for row in rows)
+    for row in rows:
+        estimate = "" if not row["run"] else (f"~{row['estimate']:.1f}s" if row["estimate"] is not None
+                                              else "no timing yet")
+        print(f"   {'▶️' if row['run'] else '⏭️'} {row['app']:<{width}}  {row['reason']}  {estimate}")
+    todo = [row for row in rows if row["run"]]
+    # Every APT-backed tool shares one "apt" step, so count it once
+    estimates = {}
+    for row in todo:
+        estimates[tuple(row["steps"])] = row["estimate"]
+    known = [value for value in estimates.values() if value is not None]
+    print(f"🧮 {len(todo)} of {len(rows)} tool(s) would run"
+          + (f", ~{sum(known):.1f}s from previous runs" if known else ""))
 
-        elif app == "minikube":
-            # Install minikube from latest GitHub release
-            print("🔍 Downloading Minikube binary...")
-            subprocess.run("curl -LO https://github.com/kubernetes/minikube/releases/latest/download/minikube-linux-amd64",
-                           shell=True, check=True)
+def record_converged(apps, options, status=None, durations=None):
+    """Stores step timings and the fingerprint of every tool whose steps all succeeded.
 
-            print("📦 Installing Minikube...")
-            subprocess.run("sudo install minikube-linux-amd64 /usr/local/bin/minikube", shell=True, check=True)
+    Without a status the tools were found converged and are recorded as they are."""
+    from datetime import datetime
 
-            print("🧹 Cleaning up...")
-            subprocess.run("rm minikube-linux-amd64", shell=True, check=True)
+    with _converge_lock:
+        state = _load_converge_state()
+        for name, seconds in (durations or {}).items():
+            if status and status.get(name) == "ok":
+                state["steps"][name] = {"seconds": round(seconds, 3)}
+    for app in apps:
+        last_step = "apt" if is_apt_backed(app) else f"{app}:verify"
+        if status is not None and status.get(last_step) != "ok":
+            continue
+        fingerprint = _apt_fingerprint(app) if is_apt_backed(app) else TOOL_FINGERPRINTS[app](options)
+        if fingerprint is None:
+            continue
+        with _converge_lock:
+            state["tools"][app] = {"fingerprint": fingerprint,
+                                   "applied": datetime.now().isoformat(timespec="seconds")}
+    with _converge_lock:
+        try:
+            _save_converge_state()
+        except OSError:
+            pass  # Without a writable cache every run simply re-checks everything
 
-            print(f"✅ {app} has been installed successfully.")
-            result = subprocess.run([app, "version"], check=True, capture_output=True, text=True)
-            print(f"Current {app} version: {result.stdout.strip()}")
+# ✅ Dependency-aware parallel install scheduler
+INSTALL_WORKERS = 4
 
-        elif app == "helm":
-            # Install Helm using the official install script
-            print("📥 Downloading Helm install script...")
-            subprocess.run("curl -fsSL -o get_helm.sh https://raw.githubusercontent.com/helm/helm/main/scripts/get-helm-3",
-                           shell=True, check=True)
+# How many steps may hold each resource at once
+RESOURCE_LIMITS = {
+    "network": 8,
+    "dpkg": 1,
+    "prefix": 1,
+}
 
-            print("🔐 Making script executable...")
-            subprocess.run("chmod 700 get_helm.sh", shell=True, check=True)
+def plan_install_steps(apps, options=None):
+    """Turns the selected tools into a DAG of {name, run, deps, resources, app} steps."""
+    options = dict(options or {})
+    steps = []
 
-            print("🚀 Running Helm installer...")
-            subprocess.run("./get_helm.sh", shell=True, check=True)
+    apt_apps = [app for app in apps if is_apt_backed(app)]
+    if apt_apps:
+        def run_apt():
+            results = install_apt_apps(apt_apps)
+            failed = [app for app, ok in results.items() if not ok]
+            if failed:
+                raise subprocess.CalledProcessError(1, f"apt install ({', '.join(failed)})")
+        steps.append({"name": "apt", "run": run_apt, "deps": [],
+                      "resources": {"network", "dpkg"}, "app": None})
 
-            print("🧹 Cleaning up installer...")
-            subprocess.run("rm get_helm.sh", shell=True, check=True)
+    for app in apps:
+        if is_apt_backed(app):
+            continue
+        previous = None
+        for step_name, step, resources in BINARY_INSTALL_STEPS[app]:
+            name = f"{app}:{step_name}"
+            steps.append({"name": name, "run": lambda step=step: step(options),
+                          "deps": [previous] if previous else [],
+                          "resources": resources, "app": app})
+            previous = name
+        steps.append({"name": f"{app}:verify", "run": lambda app=app: finish_install(app),
+                      "deps": [previous], "resources": set(), "app": app})
+    return steps
 
-            print(f"✅ {app} has been installed successfully.")
-            result = subprocess.run([app, "version"], check=True, capture_output=True, text=True)
-            print(f"Current {app} version: {result.stdout.strip()}")
+def critical_path(steps, durations):
+    """Longest chain of dependent steps, weighted by how long each one actually took.
 
-        elif app == "code":
-            # Install Visual Studio Code via Microsoft APT repository
-            print("📥 Setting up Microsoft APT repo for VS Code...")
+    Steps may come in any order; those that never ran are left out."""
+    deps = {step["name"]: step["deps"] for step in steps}
+    finish = {}
+    chain = {}
 
-            subprocess.run("sudo apt-get install -y wget gpg apt-transport-https", shell=True, check=True)
+    def visit(name):
+        if name not in finish:
+            longest = max((d for d in deps[name] if d in durations), key=visit, default=None)
+            finish[name] = durations[name] + (finish[longest] if longest else 0)
+            chain[name] = (chain[longest] if longest else []) + [name]
+        return finish[name]
 
-            subprocess.run("wget -qO- https://packages.microsoft.com/keys/microsoft.asc | "
-                           "gpg --dearmor > microsoft.gpg", shell=True, check=True)
+    for name in deps:
+        if name in durations:
+            visit(name)
+    if not finish:
+        return [], 0.0
+    end = max(finish, key=finish.get)
+    return chain[end], finish[end]
 
-            subprocess.run("sudo install -D -o root -g root -m 644 microsoft.gpg "
-                           "/usr/share/keyrings/microsoft.gpg", shell=True, check=True)
+def run_install_plan(steps, workers=None):
+    """Runs independent steps concurrently; steps whose dependencies failed are skipped.
 
-            subprocess.run("rm -f microsoft.gpg", shell=True, check=True)
+    Returns ({step name: "ok" | "failed" | "skipped"}, {step name: seconds})."""
+    from concurrent.futures import wait, FIRST_COMPLETED
 
-            vscode_repo = (
-                "Types: deb\n"
-                "URIs: https://packages.microsoft.com/repos/code\n"
-                "Suites: stable\n"
-                "Components: main\n"
-                "Architectures: amd64,arm64,armhf\n"
-                "Signed-By: /usr/share/keyrings/microsoft.gpg\n"
-            )
+    workers = workers or INSTALL_WORKERS
+    status = {}
+    durations = {}
+    in_use = {resource: 0 for resource in RESOURCE_LIMITS}
+    pending = list(steps)
+    running = {}
 
-            with open("/tmp/vscode.sources", "w") as f:
-                f.write(vscode_repo)
+    def timed(step):
+        started = time.monotonic()
+        try:
+            with span(step["name"], kind="step", tool=step["app"] or step["name"]):
+                step["run"]()
+        finally:
+            durations[step["name"]] = time.monotonic() - started
 
-            subprocess.run("sudo mv /tmp/vscode.sources /etc/apt/sources.list.d/vscode.sources", shell=True, check=True)
+    wall_start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while pending or running:
+            for step in list(pending):
+                if any(status.get(dep) in ("failed", "skipped") for dep in step["deps"]):
+                    status[step["name"]] = "skipped"
+                    pending.remove(step)
+                    print(f"⏭️ Skipping {step['name']} (a dependency failed)")
+                    continue
+                if len(running) >= workers or not all(status.get(dep) == "ok" for dep in step["deps"]):
+                    continue
+                if any(in_use.get(r, 0) >= RESOURCE_LIMITS.get(r, 1) for r in step["resources"]):
+                    continue
+                for r in step["resources"]:
+                    in_use[r] = in_use.get(r, 0) + 1
+                pending.remove(step)
+                running[pool.submit(_propagate(timed), step)] = step
 
-            subprocess.run("sudo apt update", shell=True, check=True)
-            subprocess.run("sudo apt install -y code", shell=True, check=True)
+            if not running:
+                # Nothing can start: the remaining steps wait on steps outside the plan
+                for step in pending:
+                    status[step["name"]] = "skipped"
+                pending.clear()
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                step = running.pop(future)
+                for r in step["resources"]:
+                    in_use[r] -= 1
+                try:
+                    future.result()
+                    status[step["name"]] = "ok"
+                # Any step error stays that step's failure; independent steps carry on
+                except Exception as e:
+                    status[step["name"]] = "failed"
+                    print(f"❌ Step {step['name']} failed")
+                    expected = isinstance(e, (subprocess.SubprocessError, OSError))
+                    print(f"   Error: {e if expected else f'{type(e).__name__}: {e}'}")
 
-            print(f"✅ {app} has been installed successfully.")
-            result = subprocess.run([app, "--version"], check=True, capture_output=True, text=True)
-            print(f"Current {app} version: {result.stdout.strip()}")
-
-        elif app == "node":
-            print("📥 Installing NVM (Node Version Manager)...")
-            subprocess.run(
-            "curl -o- https://raw.githubusercontent.com/nvm-sh/nvm/v0.40.3/install.sh | bash",
-            shell=True,
-            check=True,
-            )
-
-            # 🧩 Add NVM to .bashrc so node is available in future sessions
-            with open(os.path.expanduser("~/.bashrc"), "a") as f:
-                f.write(r'\nexport NVM_DIR="$HOME/.nvm"\n[ -s "$NVM_DIR/nvm.sh" ] && \. "$NVM_DIR/nvm.sh"\n')
-
-            # Detect the correct NVM_DIR
-            nvm_paths = [
-            os.path.expanduser("~/.nvm"),
-            "/usr/local/share/nvm",
-            "/opt/nvm"
-            ]
-            nvm_dir = next((p for p in nvm_paths if os.path.exists(os.path.join(p, "nvm.sh"))), None)
-
-            if not nvm_dir:
-                print("❌ Could not find NVM directory after installation.")
-                return
+    wall = time.monotonic() - wall_start
+    path, path_seconds = critical_path(steps, durations)
+    print("\n📊 Install summary")
+    for step in steps:
+        name = step["name"]
+        icon = {"ok": "✅", "failed": "❌"}.get(status[name], "⏭️")
+        seconds = f"{durations[name]:.1f}s" if name in durations else "-"
+        print(f"   {icon} {name:<20} {seconds}")
+    print(f"⏱️ Wall clock: {wall:.1f}s (sequential would be ~{sum(durations.values()):.1f}s)")
+    if path:
+        print(f"🧭 Critical path ({path_seconds:.1f}s): {' → '.join(path)}")
+    return status, durations
 
-            print(f"📍 Detected NVM at: {nvm_dir}")
+# ✅ Offline bundles: build on a connected machine, install with no network at all
+# Format 2 carries release assets; format 1 bundles (raw binaries, nvm trees) are refused
+BUNDLE_FORMAT = 2
 
-            node_version = input("⬇️ Enter Node.js version to install (default: 22): ").strip() or "22"
-            print("⬇️ Installing Node.js via NVM...")
-            subprocess.run(
-            f'export NVM_DIR="{nvm_dir}" && '
-            f'[ -s "$NVM_DIR/nvm.sh" ] && . "$NVM_DIR/nvm.sh" && '
-            f'nvm install {node_version} && nvm use {node_version}',
-            shell=True,
-            executable="/bin/bash",
-            check=True,
-            )
+def _extract_tar(archive, dest, strip_components=0, members=None):
+    """Extracts archive into dest, dropping leading path components like `tar --strip-components`."""
+    import tarfile
 
-            print(f"✅ {app} has been installed successfully.")
-            result = subprocess.run([app, "--version"], check=True, capture_output=True, text=True)
-            print(f"Current {app} version: {result.stdout.strip()}")
+    with tarfile.open(archive) as tar:
+        for member in tar.getmembers():
+            parts = member.name.split("/")[strip_components:]
+            if not parts or not parts[0] or (members and member.name not in members):
+                continue
+            member.name = "/".join(parts)
+            if hasattr(tarfile, "data_filter"):
+                tar.extract(member, dest, filter="data")
+            else:
+                tar.extract(member, dest)
 
-        else:
-            # Default APT install
-            subprocess.run(["sudo", "apt", "install", "-y", app], check=True)
+def _apt_dependency_closure(packages):
+    """Every real package the given ones depend on, so the bundle is self-contained."""
+    result = run_command(["apt-cache", "depends", "--recurse", "--no-recommends", "--no-suggests",
+                          "--no-conflicts", "--no-breaks", "--no-replaces", "--no-enhances"] + packages,
+                         capture_output=True, text=True, check=True)
+    return sorted({line.strip() for line in result.stdout.splitlines()
+                   if line and not line.startswith((" ", "<"))})
 
-        from datetime import datetime
+def _node_release(node_version, max_age=None):
+    """Resolves "22" or "22.3.0" to the newest matching release name, e.g. v22.3.0."""
+    url = f"{select_source('node')}/index.json"
+    releases = read_artifact_text(url, max_age=max_age, mirrors=source_mirrors("node", url),
+                                  parse=lambda text: [release["version"] for release in json.loads(text)])
+    wanted = "v" + node_version.lstrip("v")
+    for release in releases:
+        if release == wanted or release.startswith(wanted + "."):
+            return release
+    raise OSError(f"No Node.js release matches {node_version}")
 
-        with open("install_log.txt", "a") as log_file:
-            log_file.write(f"[{datetime.now()}] {app} installed successfully\n")
-            
-    except subprocess.CalledProcessError as e:
-        print(f"❌ Failed to install {app}")
-        print(f"   Error: {e}")
+def _checksum_from_list(url, filename, mirrors=()):
+    for line in read_artifact_text(url, max_age=float("inf"), mirrors=mirrors).splitlines():
+        fields = line.split()
+        if len(fields) == 2 and fields[1].lstrip("*") == filename:
+            return fields[0]
+        if len(fields) == 1:
+            return fields[0]
+    raise OSError(f"No checksum for {filename} in {url}")
+
+@traced("bundle")
+def build_bundle(apps, output=None, node_version="22"):
+    """Collects everything the selected tools need into one versioned archive."""
+    import tarfile
+    import tempfile
+    from datetime import datetime
+
+    created = datetime.now()
+    output = output or f"devops-bundle-{created:%Y%m%d-%H%M%S}.tar.gz"
+    manifest = {"format": BUNDLE_FORMAT, "created": created.isoformat(timespec="seconds"),
+                "arch": RELEASE_ARCHES.get(os.uname().machine, os.uname().machine), "tools": {}, "files": {}}
+
+    with tempfile.TemporaryDirectory(prefix="devops-bundle-") as staging:
+        def add(src, rel):
+            dest = os.path.join(staging, rel)
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            shutil.copyfile(src, dest)
+            return rel
+
+        apt_apps = [app for app in apps if is_apt_backed(app)]
+        if apt_apps:
+            print(f"\n📦 Collecting APT repositories and packages for: {', '.join(apt_apps)}")
+            for app in apt_apps:
+                if app in APT_REPOS:
+                    setup_apt_repo(app)
+            run_network_command(["sudo", "apt-get", *apt_network_options("apt-update"), "update"], "apt-update")
+            packages = _unique(pkg for app in apt_apps for pkg in APT_PACKAGES.get(app, [app]))
+            deb_dir = os.path.join(staging, "apt", "debs")
+            os.makedirs(deb_dir)
+            run_network_command(["apt-get", *apt_network_options("apt-install"), "download"]
+                                + _apt_dependency_closure(packages), "apt-install", cwd=deb_dir)
+            for app in apt_apps:
+                repo = APT_REPOS.get(app, {})
+                files = [add(repo[kind], "apt/files" + repo[kind]) for kind in ("keyring", "sources") if repo]
+                manifest["tools"][app] = {"kind": "apt", "packages": APT_PACKAGES.get(app, [app]),
+                                          "repo_files": files}
+
+        for app in apps:
+            if is_apt_backed(app):
+                continue
+            print(f"\n📦 Collecting {app}...")
+            if app in RELEASE_ASSETS:
+                asset = release_asset(app, {"node_version": node_version})
+                path = fetch_artifact(asset["url"], sha256=asset["sha256"], mirrors=asset["mirrors"])
+                manifest["tools"][app] = {"kind": "release", "file": add(path, f"release/{asset['name']}"),
+                                          "asset": {key: value for key, value in asset.items()
+                                                    if key not in ("url", "mirrors")}}
+            else:
+                print(f"⚠️ {app} cannot be bundled for offline installs; skipping.")
+
+        for dirpath, _, filenames in os.walk(staging):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                manifest["files"][os.path.relpath(path, staging)] = _sha256_file(path)
+        with open(os.path.join(staging, "manifest.json"), "w") as f:
+            json.dump(manifest, f, indent=2)
+
+        with tarfile.open(output, "w:gz") as tar:
+            tar.add(staging, arcname=".")
+
+    print(f"\n✅ Bundle written to {output} ({os.path.getsize(output) / 1024 / 1024:.1f} MB, "
+          f"{len(manifest['tools'])} tools)")
+    return output
+
+def _install_bundled_tool(app, tool, root):
+    if tool["kind"] != "release":
+        raise OSError(f"Unknown bundle entry kind {tool['kind']!r} for {app}")
+    place_release(app, os.path.join(root, tool["file"]), tool["asset"]["version"])
+    pin_release(tool["asset"])
+
+@traced("install-bundle")
+def install_from_bundle(bundle, apps=None):
+    """Installs tools from a bundle built by build_bundle(), touching only local disk."""
+    import tempfile
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="devops-bundle-") as root:
+        print(f"📦 Unpacking {bundle}...")
+        _extract_tar(bundle, root)
+        with open(os.path.join(root, "manifest.json")) as f:
+            manifest = json.load(f)
+        if manifest.get("format") != BUNDLE_FORMAT:
+            print(f"❌ Unsupported bundle format {manifest.get('format')}")
+            return results
+
+        print("🔍 Verifying checksums...")
+        for rel, checksum in manifest["files"].items():
+            path = os.path.join(root, rel)
+            if not os.path.exists(path) or _sha256_file(path) != checksum:
+                print(f"❌ {rel} is missing or corrupt. Aborting install.")
+                return results
+
+        tools = manifest["tools"]
+        apps = apps or list(tools)
+        for app in apps:
+            if app not in tools:
+                print(f"⚠️ {app} is not in this bundle.")
+                results[app] = False
+
+        apt_apps = [app for app in apps if tools.get(app, {}).get("kind") == "apt"]
+        if apt_apps:
+            try:
+                for app in apt_apps:
+                    for rel in tools[app]["repo_files"]:
+                        target = "/" + rel.removeprefix("apt/files/")
+                        run_command(["sudo", "install", "-D", "-m", "644", os.path.join(root, rel), target],
+                                    check=True)
+                # Only packages missing here; never downgrade what the host already has
+                deb_dir = os.path.join(root, "apt", "debs")
+                debs = {name.split("_")[0]: os.path.join(deb_dir, name)
+                        for name in sorted(os.listdir(deb_dir)) if name.endswith(".deb")}
+                missing = _missing_apt_packages(list(debs))
+                if missing:
+                    run_command(["sudo", "apt-get", "install", "-y", "--no-download"]
+                                + [debs[pkg] for pkg in missing], check=True)
+                results.update((app, True) for app in apt_apps)
+            except (subprocess.CalledProcessError, OSError) as e:
+                print("❌ Failed to install APT packages from the bundle")
+                print(f"   Error: {e}")
+                results.update((app, False) for app in apt_apps)
+
+        for app in apps:
+            if app in results or app not in tools:
+                continue
+            try:
+                with span(app, kind="step", tool=app):
+                    _install_bundled_tool(app, tools[app], root)
+                results[app] = True
+            except (subprocess.CalledProcessError, OSError) as e:
+                print(f"❌ Failed to install {app}")
+                print(f"   Error: {e}")
+                results[app] = False
+
+    for app, ok in results.items():
+        if ok:
+            print(f"✅ {app} has been installed from the bundle.")
+            log_install(app)
+        invalidate_detect_cache(app)
+        refresh_inventory_entry(app)
+    return results
 
 # ✅ Setup Git global configuration
+@traced("git-config")
 def setup_git_config():
     print("\n🛠️ Setting up Git config...")
     name = input("   Git username: ")
     email = input("   Git email: ")
-    subprocess.run(["git", "config", "--global", "user.name", name])
-    subprocess.run(["git", "config", "--global", "user.email", email])
+    run_command(["git", "config", "--global", "user.name", name])
+    run_command(["git", "config", "--global", "user.email", email])
     print("✅ Git config updated")
 
 
 # ✅ Generate SSH key and show user how to add it to GitHub
-def setup_github_ssh():
+# ssh-keygen arguments per key type; ed25519 keys generate near-instantly even on small VMs
+SSH_KEY_TYPES = {
+    "ed25519": ["-t", "ed25519"],
+    "ecdsa": ["-t", "ecdsa", "-b", "521"],
+    "rsa": ["-t", "rsa", "-b", "4096"],
+}
+DEFAULT_SSH_KEY_TYPE = "ed25519"
+
+# An agent started here listens on a fixed socket, so later runs find it instead of starting another
+SSH_AGENT_SOCKET = os.path.join(CACHE_DIR, "ssh-agent.sock")
+
+# Git hosts whose SSH connections share one master connection (ControlMaster);
+# hosts of SSH remotes configured through setup_git_remote() are added as they come up
+SSH_GIT_HOSTS = ["github.com", "gitlab.com", "bitbucket.org"]
+SSH_CONTROL_PERSIST = "10m"
+SSH_CONFIG_BEGIN = "# >>> devops-setup: git host multiplexing >>>"
+SSH_CONFIG_END = "# <<< devops-setup: git host multiplexing <<<"
+
+def _ssh_dir():
+    return os.path.expanduser("~/.ssh")
+
+def find_ssh_key():
+    """The first default key (~/.ssh/id_<type>) that exists, in SSH_KEY_TYPES order."""
+    for key_type in SSH_KEY_TYPES:
+        path = os.path.join(_ssh_dir(), f"id_{key_type}")
+        if os.path.exists(path):
+            return path
+    return None
+
+def _public_key_blob(key_path):
+    import base64
+
+    try:
+        with open(f"{key_path}.pub") as f:
+            return base64.b64decode(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+
+def agent_identities(sock_path, timeout=2):
+    """Public key blobs held by the agent listening on sock_path; None if no agent answers.
+
+    Speaks the agent protocol directly, so probing costs no ssh-add process."""
+    import struct
+
+    try:
+        with socket.socket(socket.AF_UNIX) as conn:
+            conn.settimeout(timeout)
+            conn.connect(sock_path)
+            # SSH_AGENTC_REQUEST_IDENTITIES
+            conn.sendall(struct.pack(">IB", 1, 11))
+            with conn.makefile("rb") as stream:
+                length, = struct.unpack(">I", stream.read(4))
+                body = stream.read(length)
+        # SSH_AGENT_IDENTITIES_ANSWER: a count, then (key blob, comment) string pairs
+        if body[:1] != b"\x0c":
+            return None
+        count, = struct.unpack_from(">I", body, 1)
+        offset = 5
+        blobs = set()
+        for _ in range(count):
+            size, = struct.unpack_from(">I", body, offset)
+            blobs.add(body[offset + 4:offset + 4 + size])
+            offset += 4 + size
+            size, = struct.unpack_from(">I", body, offset)
+            offset += 4 + size
+        return blobs
+    except (OSError, struct.error):
+        return None
+
+def find_ssh_agent():
+    """Socket of a live agent, from SSH_AUTH_SOCK or SSH_AGENT_SOCKET, exported as SSH_AUTH_SOCK."""
+    for candidate in (os.environ.get("SSH_AUTH_SOCK"), SSH_AGENT_SOCKET):
+        if candidate and agent_identities(candidate) is not None:
+            os.environ["SSH_AUTH_SOCK"] = candidate
+            return candidate
+    return None
+
+def ensure_ssh_agent():
+    """Returns (socket path, started): a live agent is reused, otherwise one is started on SSH_AGENT_SOCKET."""
+    import re
+
+    sock = find_ssh_agent()
+    if sock:
+        return sock, False
+    # Whatever is left at the socket path belongs to an agent that has exited
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(SSH_AGENT_SOCKET)
+    os.makedirs(os.path.dirname(SSH_AGENT_SOCKET), exist_ok=True)
+    output = run_command(["ssh-agent", "-s", "-a", SSH_AGENT_SOCKET],
+                         capture_output=True, text=True, check=True).stdout
+    os.environ["SSH_AUTH_SOCK"] = SSH_AGENT_SOCKET
+    pid = re.search(r"SSH_AGENT_PID=(\d+)", output)
+    if pid:
+        os.environ["SSH_AGENT_PID"] = pid.group(1)
+    return SSH_AGENT_SOCKET, True
+
+def ensure_ssh_multiplexing(hosts=None, assume_yes=False):
+    """Keeps a managed block in ~/.ssh/config that multiplexes connections to the git hosts.
+
+    The block's Host line keeps every host it already had plus `hosts` (default
+    SSH_GIT_HOSTS). It goes after the user's own entries, so their settings win.
+    The block is shown first and written only once the user agrees (or assume_yes).
+    Returns True if the file changed."""
+    config_path = os.path.join(_ssh_dir(), "config")
+    try:
+        with open(config_path) as f:
+            text = f.read()
+    except FileNotFoundError:
+        text = ""
+
+    begin = text.find(SSH_CONFIG_BEGIN)
+    end = text.find(SSH_CONFIG_END, begin) if begin != -1 else -1
+    current = []
+    if end != -1:
+        current = next((line.split()[1:] for line in text[begin:end].splitlines()
+                        if line.startswith("Host ")), [])
+    block = "\n".join([
+        SSH_CONFIG_BEGIN,
+        f"Host {' '.join(_unique(current + list(hosts or SSH_GIT_HOSTS)))}",
+        "    ControlMaster auto",
+        "    ControlPath ~/.ssh/cm-%C",
+        f"    ControlPersist {SSH_CONTROL_PERSIST}",
+        SSH_CONFIG_END,
+    ]) + "\n"
+
+    if end != -1:
+        rest = text[end + len(SSH_CONFIG_END):]
+        updated = text[:begin] + block + (rest[1:] if rest.startswith("\n") else rest)
+    elif text:
+        updated = text + ("" if text.endswith("\n") else "\n") + "\n" + block
+    else:
+        updated = block
+    if updated == text:
+        return False
+
+    print(f"\n📝 Multiplexing SSH connections needs this block in {config_path}:\n")
+    print(block)
+    if not assume_yes:
+        choice = input("   Add it to your SSH config? [y/n]: ").strip().lower()
+        if choice != "y":
+            print("⏭️ Left the SSH config unchanged.")
+            return False
+
+    os.makedirs(_ssh_dir(), mode=0o700, exist_ok=True)
+    tmp_file = f"{config_path}.{os.getpid()}.tmp"
+    with open(os.open(tmp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w") as f:
+        f.write(updated)
+    os.replace(tmp_file, config_path)
+    return True
+
+def ssh_remote_host(url):
+    """Host of an SSH git URL (ssh://[user@]host[:port]/path or [user@]host:path), else None."""
+    import re
+
+    if url.startswith("ssh://"):
+        return urllib.parse.urlsplit(url).hostname
+    if "://" in url:
+        return None
+    match = re.match(r"(?:[^@/]+@)?([^:/]+):", url)
+    return match.group(1) if match else None
+
+def prepare_ssh_remote(url):
+    """Before git talks to an SSH remote: reuse a live agent and multiplex connections to its host."""
+    host = ssh_remote_host(url)
+    if not host:
+        return
+    find_ssh_agent()
+    if ensure_ssh_multiplexing([host]):
+        print(f"🔌 Connections to {host} now share one SSH session (~/.ssh/config)")
+
+@traced("ssh-key")
+def setup_github_ssh(key_type=None, email=None, ssh_config=False):
     print("\n🔐 Setting up GitHub SSH key...")
 
-    ssh_path = os.path.expanduser("~/.ssh")
-    key_path = os.path.join(ssh_path, "id_rsa")
+    key_path = os.path.join(_ssh_dir(), f"id_{key_type}") if key_type else find_ssh_key()
 
-    if not os.path.exists(key_path):
-        os.makedirs(ssh_path, exist_ok=True)
+    if not key_path or not os.path.exists(key_path):
+        os.makedirs(_ssh_dir(), mode=0o700, exist_ok=True)
 
-        email = input("   Enter your GitHub email for SSH key: ")
-        subprocess.run(["ssh-keygen", "-t", "rsa", "-b", "4096", "-C", email, "-f", key_path, "-N", ""])
+        if not key_type:
+            choices = "/".join(SSH_KEY_TYPES)
+            key_type = input(f"   Key type [{choices}] (default: {DEFAULT_SSH_KEY_TYPE}): ").strip().lower() \
+                or DEFAULT_SSH_KEY_TYPE
+            if key_type not in SSH_KEY_TYPES:
+                print(f"❌ Unknown key type: {key_type}")
+                return
+            key_path = os.path.join(_ssh_dir(), f"id_{key_type}")
 
-        # Start the ssh-agent and add the new key
-        agent_output = subprocess.check_output('eval "$(ssh-agent -s)" && echo $SSH_AUTH_SOCK', shell=True, executable='/bin/bash', text=True)
-        os.environ["SSH_AUTH_SOCK"] = agent_output.strip()
-        subprocess.run(["ssh-add", key_path])
+        email = email or input("   Enter your GitHub email for SSH key: ")
+        run_command(["ssh-keygen", *SSH_KEY_TYPES[key_type], "-C", email, "-f", key_path, "-N", ""], check=True)
 
         print("\n📋 Public SSH key:")
-        subprocess.run(["cat", f"{key_path}.pub"])
+        run_command(["cat", f"{key_path}.pub"])
         print("\n🔗 Add this public key to your GitHub account under 'SSH and GPG keys'")
     else:
-        print("✅ SSH key already exists at ~/.ssh/id_rsa")
+        print(f"✅ SSH key already exists at {key_path}")
+
+    # Load the key into a live agent, starting one only when none answers
+    sock, started = ensure_ssh_agent()
+    if _public_key_blob(key_path) in (agent_identities(sock) or set()):
+        print("🔑 The key is already loaded in the ssh-agent")
+    else:
+        run_command(["ssh-add", key_path])
+    if started:
+        print(f"🧷 Started an ssh-agent; use it from your shell with: export SSH_AUTH_SOCK={sock}")
+    else:
+        print(f"♻️ Reusing the ssh-agent at {sock}")
+
+    if ensure_ssh_multiplexing(assume_yes=ssh_config):
+        print("🔌 Git hosts now share one SSH connection per host (~/.ssh/config)")
 
 ###########
 
@@ -368,7 +3054,7 @@ def show_git_url_tip(url: str):
 def run_git_command(args, check=True, capture_output=False, text=True):
     """Helper to run git commands with error handling."""
     try:
-        return subprocess.run(args, check=check, capture_output=capture_output, text=text)
+        return run_command(args, check=check, capture_output=capture_output, text=text)
     except subprocess.CalledProcessError as e:
         print(f"❌ Git command failed: {' '.join(args)}")
         print(f"   Error: {e}")
@@ -376,32 +3062,121 @@ def run_git_command(args, check=True, capture_output=False, text=True):
             print(f"   Output: {e.output}")
         raise
 
-def has_unstaged_or_untracked_changes():
-    proc = run_git_command(["git", "status", "--porcelain"], capture_output=True)
-    lines = proc.stdout.strip().splitlines()
-    for line in lines:
-        if not line:
-            continue
-        # Untracked files start with "??"
-        if line.startswith("??") or line[1] != ' ':
-            return True
-    return False
+def _iter_nul_records(stream, block_size=64 * 1024):
+    """Yields NUL-terminated records from a byte stream without reading it all at once."""
+    pending = b""
+    for block in iter(lambda: stream.read(block_size), b""):
+        records = (pending + block).split(b"\0")
+        pending = records.pop()
+        yield from records
+    if pending:
+        yield pending
+
+class RepoState:
+    """Snapshot of the current repository from a single `git status --porcelain=v2 -z --branch`.
+
+    Only counts are kept for the common cases, so huge worktrees stay cheap;
+    paths are kept for deleted tracked files because callers show them.
+    Call refresh() after anything that changes the index or worktree."""
+
+    def __init__(self, cwd=None):
+        self.cwd = cwd
+        self.refresh()
 
-def has_staged_changes():
-    proc = run_git_command(["git", "diff", "--cached", "--name-only"], capture_output=True)
-    return bool(proc.stdout.strip())
+    def refresh(self):
+        import tempfile
 
-def confirm_commit_or_stash():
+        self.oid = None
+        self.head = None
+        self.upstream = None
+        self.ahead = 0
+        self.behind = 0
+        self.staged = 0
+        self.unstaged = 0
+        self.untracked = 0
+        self.conflicted = 0
+        self.deleted = []
+
+        args = ["git", "status", "--porcelain=v2", "-z", "--branch"]
+        # stderr goes to a file, so a chatty git can't stall on a full pipe while stdout streams
+        with tempfile.TemporaryFile() as errors, \
+                popen_command(args, stdout=subprocess.PIPE, stderr=errors, cwd=self.cwd) as proc:
+            records = _iter_nul_records(proc.stdout)
+            for record in records:
+                kind = record[:1]
+                if kind == b"#":
+                    self._parse_header(record.decode(errors="surrogateescape"))
+                elif kind in (b"1", b"2"):
+                    # 1 XY sub mH mI mW hH hI path / 2 ... Xscore path, then origPath as its own record
+                    x, y = chr(record[2]), chr(record[3])
+                    if x != ".":
+                        self.staged += 1
+                    if y != ".":
+                        self.unstaged += 1
+                    if x == "." and y == "D":
+                        fields = 9 if kind == b"1" else 10
+                        self.deleted.append(os.fsdecode(record.split(b" ", fields - 1)[-1]))
+                    if kind == b"2":
+                        next(records, None)
+                elif kind == b"u":
+                    self.conflicted += 1
+                    self.staged += 1
+                    self.unstaged += 1
+                elif kind == b"?":
+                    self.untracked += 1
+
+            proc.wait()
+            errors.seek(0)
+            stderr = errors.read().decode(errors="replace")
+        if proc.returncode != 0:
+            print(f"❌ Git command failed: {' '.join(args)}")
+            print(f"   Error: {stderr.strip()}")
+            raise subprocess.CalledProcessError(proc.returncode, args, stderr=stderr)
+        return self
+
+    def _parse_header(self, line):
+        key, _, value = line[2:].partition(" ")
+        if key == "branch.oid":
+            self.oid = value
+        elif key == "branch.head":
+            self.head = value
+        elif key == "branch.upstream":
+            self.upstream = value
+        elif key == "branch.ab":
+            ahead, behind = value.split()
+            self.ahead, self.behind = int(ahead), -int(behind)
+
+    @property
+    def has_commits(self):
+        return self.oid not in (None, "(initial)")
+
+    @property
+    def has_changes(self):
+        return bool(self.staged or self.unstaged or self.untracked)
+
+def has_unstaged_or_untracked_changes(state=None):
+    state = state or RepoState()
+    return bool(state.unstaged or state.untracked)
+
+def has_staged_changes(state=None):
+    state = state or RepoState()
+    return bool(state.staged)
+
+def confirm_commit_or_stash(state=None):
     print("⚠️ You have staged changes that are not committed.")
     while True:
         choice = input("Do you want to [c]ommit, [s]tash, or [a]bort? ").strip().lower()
         if choice == "c":
             msg = input("📝 Commit message: ").strip() or "WIP commit"
             run_git_command(["git", "commit", "-m", msg])
+            if state:
+                state.refresh()
             return True
         elif choice == "s":
             run_git_command(["git", "stash"])
             print("🧹 Changes stashed.")
+            if state:
+                state.refresh()
             return True
         elif choice == "a":
             print("🚫 Operation aborted.")
@@ -411,31 +3186,114 @@ def confirm_commit_or_stash():
 
 #########
 
-def get_deleted_tracked_files():
+def get_deleted_tracked_files(state=None):
     """Returns a list of deleted tracked files."""
-    proc = run_git_command(["git", "status", "--porcelain"], capture_output=True)
-    deleted = []
-    for line in proc.stdout.strip().splitlines():
-        if line.startswith(" D "):  # Tracked file deleted (in index)
-            deleted.append(line[3:])
-    return deleted
-
-def recover_deleted_files():
+    state = state or RepoState()
+    return list(state.deleted)
+
+def index_deleted_files(commits=None, since=None, until=None):
+    """Maps each deleted path to the newest commit that deleted it, from one `git log` pass.
+
+    The file can be restored from that commit's parent. Results are cached in the
+    git dir per HEAD and search range; since/until are resolved to absolute
+    timestamps first, so "2.weeks.ago" never answers from a stale window."""
+    # rev-parse turns --since/--until into --max-age/--min-age with git's own date parsing
+    bounds = [f"--since={since}"] * bool(since) + [f"--until={until}"] * bool(until)
+    proc = run_git_command(["git", "rev-parse", "--show-toplevel", "--git-dir", "HEAD", *bounds],
+                           capture_output=True)
+    toplevel, git_dir, head, *window = proc.stdout.splitlines()
+    git_dir = os.path.join(toplevel, git_dir) if not os.path.isabs(git_dir) else git_dir
+
+    cache_file = os.path.join(git_dir, "devops-setup-deleted.json")
+    cache_key = ":".join([head, str(commits), *window])
+    try:
+        with open(cache_file) as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        cache = {}
+
+    if cache_key in cache:
+        index = cache[cache_key]
+    else:
+        revisions = "HEAD"
+        if commits:
+            # HEAD~N only exists when the history is long enough; otherwise search all of it
+            boundary = run_command(["git", "rev-parse", "--verify", "--quiet", f"HEAD~{commits}"],
+                                   capture_output=True, text=True)
+            if boundary.returncode == 0:
+                revisions = f"{boundary.stdout.strip()}..HEAD"
+        args = ["git", "log", "-z", "--diff-filter=D", "--name-only", "--no-renames",
+                "--first-parent", "-m", "--format=@@%H", revisions, *window]
+
+        index = {}
+        with popen_command(args, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, cwd=toplevel) as proc:
+            commit = None
+            for record in _iter_nul_records(proc.stdout):
+                record = os.fsdecode(record)
+                if record.startswith("@@"):
+                    commit = record[2:]
+                    continue
+                path = record[1:] if record.startswith("\n") else record
+                # Newest deletion wins: git log walks from HEAD backwards
+                if path and commit:
+                    index.setdefault(path, commit)
+        if proc.returncode != 0:
+            raise subprocess.CalledProcessError(proc.returncode, args)
+
+        cache = {cache_key: index}  # Older HEADs can never be asked for again
+        try:
+            with open(cache_file, "w") as f:
+                json.dump(cache, f)
+        except OSError:
+            pass
+
+    # Paths that have since come back are not candidates for recovery
+    return {path: commit for path, commit in index.items()
+            if not os.path.lexists(os.path.join(toplevel, path))}
+
+def restore_files(files_by_commit):
+    """Restores files into index and worktree with one `git restore` per source commit."""
+    by_source = {}
+    for path, commit in files_by_commit.items():
+        by_source.setdefault(commit, []).append(path)
+    for commit, paths in by_source.items():
+        args = ["git", "restore", f"--source={commit}^", "--staged", "--worktree",
+                "--pathspec-from-file=-", "--pathspec-file-nul"]
+        try:
+            run_command(args, input="\0".join(paths).encode(), check=True)
+        except subprocess.CalledProcessError as e:
+            print(f"❌ Git command failed: {' '.join(args)}")
+            print(f"   Error: {e}")
+            raise
+        for path in paths:
+            print(f"✅ Recovered: {path}")
+
+@traced("recover-deleted")
+def recover_deleted_files(commits=None, since=None, until=None):
     print("\n🔁 Recover Deleted Files")
 
-    proc = run_git_command(["git", "log", "-1", "--pretty=format:%H"], capture_output=True)
-    last_commit = proc.stdout.strip()
+    if commits is None and since is None and until is None:
+        scope = input("🔎 Search the last N commits or since a date (e.g. 10, 2.weeks.ago) [default: 1]: ").strip() or "1"
+        if scope.isdigit():
+            commits = int(scope)
+        else:
+            since = scope
 
-    proc = run_git_command(["git", "diff-tree", "--no-commit-id", "--diff-filter=D", "--name-only", "-r", last_commit], capture_output=True)
-    deleted_files = proc.stdout.strip().splitlines()
+    try:
+        deleted = index_deleted_files(commits, since, until)
+    except (subprocess.CalledProcessError, ValueError):
+        print("❌ Could not read the commit history.")
+        return
+    deleted_files = list(deleted)
+    where = f"the last {commits} commit(s)" if commits else f"commits since {since}" if since else "history"
 
     if not deleted_files:
-        print("✅ No deleted files found in the last commit.")
+        print(f"✅ No deleted files found in {where}.")
         return
 
-    print("🗑️ Files deleted in last commit:")
+    print(f"🗑️ Files deleted in {where}:")
     for i, file in enumerate(deleted_files, 1):
-        print(f"  {i}. {file}")
+        print(f"  {i}. {file}  (deleted in {deleted[file][:8]})")
 
     indices = input("\nSelect files to recover (e.g., 1 2 3) or [a]ll / [n]one: ").strip().lower()
 
@@ -456,11 +3314,7 @@ def recover_deleted_files():
         print("🚫 No files selected for recovery.")
         return
 
-    for file in to_restore:
-        run_git_command(["git", "checkout", f"{last_commit}^", "--", file])
-        print(f"✅ Recovered: {file}")
-
-    run_git_command(["git", "add"] + to_restore)
+    restore_files({path: deleted[path] for path in to_restore})
     run_git_command(["git", "commit", "-m", "🔁 Recovered deleted files"])
 
     push = input("📤 Push the recovered files to remote? [y/n]: ").strip().lower()
@@ -473,17 +3327,190 @@ def recover_deleted_files():
 
 #########
 
+# ✅ Single-ref remote probe, cached for the rest of the run
+_remote_ref_cache = {}
+
+def probe_remote_ref(remote, branch, refresh=False):
+    """Returns the commit the remote branch points at (None if it does not exist).
+
+    Asks only for refs/heads/<branch>, so repos with thousands of refs stay cheap."""
+    key = (remote, branch)
+    if refresh or key not in _remote_ref_cache:
+        proc = run_git_command(["git", "ls-remote", remote, f"refs/heads/{branch}"], capture_output=True)
+        fields = proc.stdout.split()
+        _remote_ref_cache[key] = fields[0] if fields else None
+    return _remote_ref_cache[key]
+
+def remote_sync_plan(remote_sha):
+    """Compares the remote head with the local commit graph. Returns (needs_pull, needs_push)."""
+    local = run_command(["git", "rev-parse", "--verify", "--quiet", "HEAD"], capture_output=True, text=True)
+    local_sha = local.stdout.strip() or None
+    if remote_sha is None:
+        return False, local_sha is not None
+    if remote_sha == local_sha:
+        return False, False
+    if local_sha is None:
+        return True, False
+    # Only an object we already have can be checked for ancestry without fetching
+    known = run_command(["git", "cat-file", "-e", f"{remote_sha}^{{commit}}"], capture_output=True)
+    if known.returncode == 0:
+        contained = run_command(["git", "merge-base", "--is-ancestor", remote_sha, local_sha])
+        if contained.returncode == 0:
+            return False, True
+    return True, True
+
+# ✅ Partial, shallow, sparse and mirror-referenced clones
+MIRROR_DIR = os.path.join(CACHE_DIR, "mirrors")
+CLONE_FILTERS = {"b": "blob:none", "t": "tree:0"}
+
+def _dir_size(path):
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            with contextlib.suppress(OSError):
+                total += os.lstat(os.path.join(dirpath, name)).st_size
+    return total
+
+def update_mirror(url):
+    """Returns a bare mirror of url under MIRROR_DIR, creating or refreshing it."""
+    os.makedirs(MIRROR_DIR, exist_ok=True)
+    mirror = os.path.join(MIRROR_DIR, hashlib.sha256(url.encode()).hexdigest()[:16] + ".git")
+    with open(f"{mirror}.lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        if os.path.isdir(mirror):
+            print("🪞 Refreshing reference mirror...")
+            run_git_command(["git", "-C", mirror, "fetch", "--prune", "--quiet"])
+        else:
+            print("🪞 Creating reference mirror (first clone of this remote)...")
+            run_git_command(["git", "clone", "--mirror", "--quiet", url, mirror])
+    return mirror
+
+@traced("clone")
+def clone_repo(url, dest=None, filter_spec=None, depth=None, sparse=None, use_mirror=False):
+    """Clones url with optional --filter, --depth, cone sparse-checkout and a reference mirror."""
+    dest = dest or os.path.basename(url.rstrip("/")).removesuffix(".git")
+    source = url
+    if (filter_spec or depth) and os.path.isdir(url):
+        # Local paths are hard-linked and ignore --depth/--filter unless given as file:// URLs
+        source = "file://" + os.path.abspath(url)
+
+    args = ["git", "clone"]
+    if filter_spec:
+        args.append(f"--filter={filter_spec}")
+    if depth:
+        args += ["--depth", str(depth)]
+    if sparse:
+        args.append("--sparse")
+    if use_mirror:
+        args += ["--reference", update_mirror(url), "--dissociate"]
+
+    started = time.monotonic()
+    run_git_command(args + [source, dest])
+    if sparse:
+        run_git_command(["git", "-C", dest, "sparse-checkout", "set", "--cone"] + list(sparse))
+    print(f"⏱️ Cloned in {time.monotonic() - started:.1f}s, {_dir_size(dest) / 1024 / 1024:.1f} MB on disk")
+    return dest
+
+def prompt_clone_repo():
+    url = input("🔗 Enter remote repo URL: ").strip()
+    kind = input("📦 Clone type: [f]ull / [b]lobless / [t]reeless (default: f): ").strip().lower()
+    depth = input("📏 History depth (blank for full history): ").strip()
+    sparse = input("🌲 Sparse-checkout directories (space separated, blank for all): ").split()
+    mirror = input("🪞 Borrow objects from a local reference mirror? [y/n]: ").strip().lower()
+    return clone_repo(url, filter_spec=CLONE_FILTERS.get(kind), depth=int(depth) if depth.isdigit() else None,
+                      sparse=sparse, use_mirror=mirror == "y")
+
+# ✅ Large-repository performance profile
+LARGE_REPO_SETTINGS = {
+    "core.commitGraph": "true",
+    "fetch.writeCommitGraph": "true",
+    "gc.writeCommitGraph": "true",
+    "core.multiPackIndex": "true",
+    "core.untrackedCache": "true",
+    "feature.manyFiles": "true",
+}
+
+# Local config key recording that the profile was declined, so the prompt is not repeated
+TUNE_DECLINED_KEY = "devops-setup.tuneDeclined"
+
+def _fsmonitor_supported():
+    # Builds that include the daemon (macOS, Windows, some Linux) list it among their features
+    proc = run_command(["git", "version", "--build-options"], capture_output=True, text=True)
+    return proc.returncode == 0 and "feature: fsmonitor--daemon" in map(str.strip, proc.stdout.splitlines())
+
+def time_git_status(repo=".", runs=3):
+    """Median wall-clock seconds of `git status` after one warm-up run."""
+    timings = []
+    for _ in range(runs + 1):
+        started = time.monotonic()
+        run_command(["git", "-C", repo, "status", "--porcelain"],
+                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        timings.append(time.monotonic() - started)
+    return sorted(timings[1:])[runs // 2]
+
+def _local_config(repo):
+    proc = _git_in(repo, "config", "--local", "--get-regexp", ".")
+    config = dict(line.split(" ", 1) for line in proc.stdout.splitlines() if " " in line)
+    return {key.lower(): value for key, value in config.items()}
+
+def is_repo_tuned(repo=".", config=None):
+    config = _local_config(repo) if config is None else config
+    return (all(config.get(key.lower()) == value for key, value in LARGE_REPO_SETTINGS.items())
+            and "maintenance.strategy" in config)
+
+def should_offer_tuning(repo="."):
+    """False once the profile is applied or was declined for this repository."""
+    config = _local_config(repo)
+    return config.get(TUNE_DECLINED_KEY.lower()) != "true" and not is_repo_tuned(repo, config)
+
+@traced("tune-repo")
+def tune_large_repo(repo="."):
+    """Applies the large-repo profile and reports the `git status` speedup."""
+    print("\n⚡ Large repository performance profile")
+    if is_repo_tuned(repo):
+        print("✅ Repository is already tuned. Skipping.")
+        return
+
+    before = time_git_status(repo)
+    print(f"⏱️ git status before: {before * 1000:.0f} ms")
+
+    for key, value in LARGE_REPO_SETTINGS.items():
+        _git_in(repo, "config", "--local", key, value)
+    if _fsmonitor_supported():
+        _git_in(repo, "config", "--local", "core.fsmonitor", "true")
+        print("👀 Built-in fsmonitor enabled")
+    else:
+        print("ℹ️ Built-in fsmonitor is not available on this platform")
+    _git_in(repo, "update-index", "--untracked-cache")
+
+    print("🧮 Writing commit-graph and multi-pack-index...")
+    _git_in(repo, "commit-graph", "write", "--reachable", "--changed-paths")
+    _git_in(repo, "multi-pack-index", "write")
+
+    maintenance = _git_in(repo, "maintenance", "start")
+    if maintenance.returncode != 0:
+        # No cron/systemd/launchd available: register so `git maintenance run --schedule` covers it
+        _git_in(repo, "maintenance", "register")
+        _git_in(repo, "config", "--local", "maintenance.strategy", "incremental")
+        print("⚠️ Could not schedule background maintenance; repository registered instead.")
+    else:
+        print("🗓️ Background maintenance scheduled")
+
+    after = time_git_status(repo)
+    speedup = before / after if after else 0
+    print(f"⏱️ git status after: {after * 1000:.0f} ms ({speedup:.1f}x)")
+
+@traced("git-remote")
 def setup_git_remote():
     print("\n🔗 Git Remote Setup")
 
     # Step 1: Check if inside a Git repo
-    inside_git = subprocess.run(["git", "rev-parse", "--is-inside-work-tree"],
-                                capture_output=True, text=True)
+    inside_git = run_command(["git", "rev-parse", "--is-inside-work-tree"],
+                             capture_output=True, text=True)
     if inside_git.returncode != 0:
         choice = input("📁 No Git repo found. Clone one? [y/n]: ").strip().lower()
         if choice == "y":
-            url = input("🔗 Enter remote repo URL: ").strip()
-            run_git_command(["git", "clone", url])
+            prompt_clone_repo()
             print("✅ Repo cloned. Navigate into it and rerun this function.")
             return
         else:
@@ -494,6 +3521,18 @@ def setup_git_remote():
                 print("❌ Skipping remote setup.")
                 return
 
+    # Step 1.5: Optional performance profile for big repositories
+    if should_offer_tuning():
+        tune = input("⚡ Apply the large-repo performance profile? [y/n]: ").strip().lower()
+        if tune == "y":
+            tune_large_repo()
+        else:
+            _git_in(".", "config", "--local", TUNE_DECLINED_KEY, "true")
+            print("ℹ️ Not asking again for this repository; run `tune-repo` to apply it later.")
+
+    # One status snapshot, refreshed only after commands that change the tree
+    state = RepoState()
+
     # Step 2: Check existing remotes
     remotes_proc = run_git_command(["git", "remote"], capture_output=True)
     remotes = remotes_proc.stdout.strip().splitlines()
@@ -504,6 +3543,7 @@ def setup_git_remote():
         url = url_proc.stdout.strip()
         print(f"✅ Remote 'origin' exists: {url}")
         show_git_url_tip(url)
+        prepare_ssh_remote(url)
 
         action = input("🔁 Action: [k]eep / [c]hange / [p]ull / [u]push: ").strip().lower()
 
@@ -511,23 +3551,27 @@ def setup_git_remote():
             branch = input("⬇️ Branch to pull (default: main): ").strip() or "main"
 
             # SAFETY CHECKS BEFORE PULL
-            if has_unstaged_or_untracked_changes():
+            if has_unstaged_or_untracked_changes(state):
                 print("❌ Unstaged or untracked changes detected. Please commit, stash, or discard them before pulling.")
                 return
-            if has_staged_changes():
-                if not confirm_commit_or_stash():
+            if has_staged_changes(state):
+                if not confirm_commit_or_stash(state):
                     return
 
+            needs_pull, _ = remote_sync_plan(probe_remote_ref("origin", branch))
+            if not needs_pull:
+                print(f"✅ Already contains origin/{branch}. Nothing to pull.")
+                return
             run_git_command(["git", "pull", "--rebase", "origin", branch], check=False)
             return
 
         elif action == "u":
             # SAFETY CHECKS BEFORE PUSH
-            if has_unstaged_or_untracked_changes():
+            if has_unstaged_or_untracked_changes(state):
                 print("❌ Unstaged or untracked changes detected. Please commit, stash, or discard them before pushing.")
                 return
-            if has_staged_changes():
-                if not confirm_commit_or_stash():
+            if has_staged_changes(state):
+                if not confirm_commit_or_stash(state):
                     return
             # Continue to push after checks
 
@@ -543,11 +3587,12 @@ def setup_git_remote():
         remote_url = input("🔗 Enter new remote URL (SSH or HTTPS): ").strip()
         run_git_command(["git", "remote", "add", "origin", remote_url])
         show_git_url_tip(remote_url)
+        prepare_ssh_remote(remote_url)
 
     # Step 4: Test remote connection
     print("🔍 Testing connection to 'origin'...")
     try:
-        run_git_command(["git", "ls-remote", "origin"])
+        probe_remote_ref("origin", state.head if state.head not in (None, "(detached)") else "main")
         print("✅ Connection successful.")
     except subprocess.CalledProcessError:
         print("❌ Could not connect to remote. Check your URL or SSH config.")
@@ -555,13 +3600,13 @@ def setup_git_remote():
 
     # Step 5: Stage all files
     run_git_command(["git", "add", "."], check=False)
+    state.refresh()
 
     # Step 6: Commit if needed
-    has_commits = subprocess.run(["git", "log"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-    status_proc = run_git_command(["git", "status", "--porcelain"], capture_output=True)
-    if has_commits.returncode != 0 and status_proc.stdout.strip():
+    if not state.has_commits and state.has_changes:
         msg = input("📝 Commit message [default: Initial commit]: ").strip() or "Initial commit"
         run_git_command(["git", "commit", "-m", msg])
+        state.refresh()
 
     # Step 7: Choose branch name
     branch = input("🌿 Branch name to push (default: main): ").strip() or "main"
@@ -574,19 +3619,26 @@ def setup_git_remote():
         return
 
     # SAFETY CHECKS BEFORE PULL + PUSH
-    if has_unstaged_or_untracked_changes():
+    if has_unstaged_or_untracked_changes(state):
         print("❌ Unstaged or untracked changes detected. Please commit, stash, or discard them before pushing.")
         return
-    if has_staged_changes():
-        if not confirm_commit_or_stash():
+    if has_staged_changes(state):
+        if not confirm_commit_or_stash(state):
             return
 
-    # Step 9: Pull with rebase to avoid push conflicts
-    print(f"🔄 Rebasing from origin/{branch}...")
-    run_git_command(["git", "pull", "--rebase", "origin", branch], check=False)
+    # Step 9: Pull with rebase to avoid push conflicts, unless origin has nothing new
+    remote_sha = probe_remote_ref("origin", branch)
+    needs_pull, needs_push = remote_sync_plan(remote_sha)
+    if needs_pull:
+        print(f"🔄 Rebasing from origin/{branch}...")
+        run_git_command(["git", "pull", "--rebase", "origin", branch], check=False)
+        state.refresh()
+        _, needs_push = remote_sync_plan(remote_sha)
+    else:
+        print(f"⏭️ origin/{branch} has nothing new. Skipping rebase.")
 
     # Step 9.9: Check for deleted tracked files
-    deleted_files = get_deleted_tracked_files()
+    deleted_files = get_deleted_tracked_files(state)
     if deleted_files:
         print("⚠️ You're about to delete the following tracked files:")
         for f in deleted_files:
@@ -600,9 +3652,21 @@ def setup_git_remote():
         return
 
     # Step 10: Push
+    if not needs_push:
+        print(f"✅ origin/{branch} is already up to date. Nothing to push.")
+    else:
+        push_branch(branch)
+
+    # Step 11: Summary
+    print("\n📦 Remote setup complete.")
+    print(f"🔗 Remote: origin")
+    print(f"🌿 Branch: {branch}")
+
+def push_branch(branch):
     print(f"🚀 Pushing to origin/{branch}...")
     try:
         run_git_command(["git", "push", "-u", "origin", branch])
+        _remote_ref_cache.pop(("origin", branch), None)
         print("✅ Push successful.")
     except subprocess.CalledProcessError as e:
         print("❌ Push failed.")
@@ -610,10 +3674,286 @@ def setup_git_remote():
             print("💡 Hint: You may need to set an upstream branch.")
         print(f"   Error: {e}")
 
-    # Step 11: Summary
-    print("\n📦 Remote setup complete.")
-    print(f"🔗 Remote: origin")
-    print(f"🌿 Branch: {branch}")
+#########
+# ✅ Workspace mode: sync every repository under a directory
+WORKSPACE_WORKERS = 8
+
+def discover_repos(root):
+    """Returns every git work tree under root, without descending into repositories."""
+    repos = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        if ".git" in dirnames or ".git" in filenames:
+            repos.append(dirpath)
+            dirnames.clear()
+            continue
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith("."))
+    return sorted(repos)
+
+def _git_in(repo, *args):
+    return run_command(["git", "-C", repo] + list(args), capture_output=True, text=True)
+
+@traced("sync-repo")
+def sync_repo(repo, pull=True, push=True):
+    """Runs the setup_git_remote safety checks on one repo, then fetch/rebase/push as needed.
+
+    Returns (outcome, detail)."""
+    try:
+        state = RepoState(cwd=repo)
+    except subprocess.CalledProcessError as e:
+        return "failed", (e.stderr or str(e)).strip()
+
+    if state.head in (None, "(detached)"):
+        return "skipped", "detached HEAD"
+    if not state.upstream:
+        return "skipped", "no upstream branch"
+    if has_unstaged_or_untracked_changes(state):
+        return "skipped", "unstaged or untracked changes"
+    if has_staged_changes(state):
+        return "skipped", "staged changes not committed"
+
+    remote, _, branch = state.upstream.partition("/")
+
+    # One cheap round-trip: compare the remote head with what we already have
+    probe = _git_in(repo, "ls-remote", remote, f"refs/heads/{branch}")
+    if probe.returncode != 0:
+        return "failed", probe.stderr.strip().splitlines()[-1] if probe.stderr.strip() else "ls-remote failed"
+    remote_head = probe.stdout.split()[0] if probe.stdout.strip() else None
+    tracking = _git_in(repo, "rev-parse", "--verify", "--quiet", state.upstream).stdout.strip()
+    if remote_head in (tracking, state.oid) and not state.ahead and not state.behind:
+        return "up to date", ""
+
+    actions = []
+    if remote_head and remote_head != tracking:
+        fetch = _git_in(repo, "fetch", "--quiet", remote, branch)
+        if fetch.returncode != 0:
+            return "failed", fetch.stderr.strip()
+        state.refresh()
+
+    if state.behind:
+        if not pull:
+            return "skipped", f"{state.behind} commit(s) behind, pulling disabled"
+        rebase = _git_in(repo, "rebase", "--quiet", state.upstream)
+        if rebase.returncode != 0:
+            _git_in(repo, "rebase", "--abort")
+            return "failed", f"rebase onto {state.upstream} hit conflicts"
+        actions.append(f"pulled {state.behind}")
+        state.refresh()
+
+    if state.ahead:
+        if not push:
+            actions.append(f"{state.ahead} to push, pushing disabled")
+        else:
+            result = _git_in(repo, "push", "--quiet", remote, f"HEAD:{branch}")
+            if result.returncode != 0:
+                return "failed", result.stderr.strip()
+            actions.append(f"pushed {state.ahead}")
+
+    return ("synced", ", ".join(actions)) if actions else ("up to date", "")
+
+@traced("workspace")
+def sync_workspace(root, workers=WORKSPACE_WORKERS, pull=True, push=True):
+    repos = discover_repos(root)
+    if not repos:
+        print(f"❌ No Git repositories found under {root}")
+        return {}
+    print(f"🔄 Syncing {len(repos)} repositories under {root}, {workers} at a time...")
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(repos)))) as pool:
+        outcomes = dict(zip(repos, pool.map(_propagate(lambda repo: sync_repo(repo, pull, push)), repos)))
+
+    icons = {"synced": "✅", "up to date": "✅", "skipped": "⏭️", "failed": "❌"}
+    width = max(len(os.path.relpath(repo, root)) for repo in repos)
+    print(f"\n{'Repository':<{width}}  Outcome")
+    for repo, (outcome, detail) in outcomes.items():
+        name = os.path.relpath(repo, root)
+        print(f"{name:<{width}}  {icons[outcome]} {outcome}{f' ({detail})' if detail else ''}")
+    print(f"⏱️ Workspace synced in {time.monotonic() - started:.1f}s")
+    return outcomes
+
+#########
+# ✅ Fleet provisioning: push detection/install plans to many hosts at once
+FLEET_WORKERS = 16
+FLEET_TIMEOUT = 3600
+FLEET_RESULT_MARKER = "@@FLEET_RESULT@@"
+
+def load_host_inventory(path):
+    """Reads one host per line: ssh://user@host:22, local://name or chroot:///srv/root.
+
+    Bare names are treated as SSH hosts; blank lines and # comments are ignored."""
+    hosts = []
+    with open(path) as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if line:
+                hosts.append(line if "://" in line else f"ssh://{line}")
+    return hosts
+
+def _script_source():
+    with open(os.path.abspath(__file__)) as f:
+        return f.read()
+
+# A transport runs this script on a host: transport(host, args, script, timeout) -> CompletedProcess
+def ssh_transport(host, args, script, timeout):
+    import shlex
+
+    parts = urllib.parse.urlsplit(host)
+    target = f"{parts.username}@{parts.hostname}" if parts.username else parts.hostname
+    cmd = ["ssh", "-o", "BatchMode=yes", "-o", "ConnectTimeout=10"]
+    if parts.port:
+        cmd += ["-p", str(parts.port)]
+    cmd += [target, shlex.join(["python3", "-"] + args)]
+    return run_command(cmd, input=script, capture_output=True, text=True, timeout=timeout)
+
+def local_transport(host, args, script, timeout):
+    import sys
+
+    return run_command([sys.executable, "-"] + args, input=script,
+                       capture_output=True, text=True, timeout=timeout)
+
+def chroot_transport(host, args, script, timeout):
+    root = urllib.parse.urlsplit(host).path
+    return run_command(["sudo", "chroot", root, "python3", "-"] + args, input=script,
+                       capture_output=True, text=True, timeout=timeout)
+
+FLEET_TRANSPORTS = {
+    "ssh": ssh_transport,
+    "local": local_transport,
+    "chroot": chroot_transport,
+}
+
+def run_agent_plan(plan):
+    """Executes a fleet plan on this machine and prints the result for the controller."""
+    # Detection is enough to know what is missing; versions are probed once, at the end
+    before = {app: installed for entries in detect_inventory().values() for app, installed in entries}
+    if plan.get("action") == "install":
+        wanted = plan.get("tools") or list(before)
+        missing = [app for app in wanted if app in before and not before[app]]
+        install_apps(missing, plan.get("workers"), node_version=plan.get("node_version") or "22")
+    rows = collect_versions()
+    print(FLEET_RESULT_MARKER + json.dumps({"before": before, "rows": rows}))
+
+@traced("fleet-host")
+def _run_on_host(host, plan, script, timeout):
+    scheme = urllib.parse.urlsplit(host).scheme
+    transport = FLEET_TRANSPORTS.get(scheme)
+    started = time.monotonic()
+    result = {"host": host, "status": "failed", "rows": [], "before": {}, "error": None, "seconds": 0.0}
+    if transport is None:
+        result["error"] = f"unknown transport '{scheme}'"
+        return result
+
+    args = ["agent", "--plan", json.dumps(plan)]
+    try:
+        proc = transport(host, args, script, timeout)
+        for line in proc.stdout.splitlines():
+            if line.startswith(FLEET_RESULT_MARKER):
+                result.update(json.loads(line[len(FLEET_RESULT_MARKER):]))
+                result["status"] = "ok" if proc.returncode == 0 else "failed"
+        if result["status"] != "ok":
+            result["error"] = (proc.stderr.strip().splitlines() or [f"exit code {proc.returncode}"])[-1]
+    except subprocess.TimeoutExpired:
+        result["error"] = f"timed out after {timeout}s"
+    except (OSError, ValueError) as e:
+        result["error"] = str(e)
+    result["seconds"] = round(time.monotonic() - started, 2)
+    return result
+
+@traced("fleet")
+def run_fleet(hosts, plan, workers=FLEET_WORKERS, timeout=FLEET_TIMEOUT):
+    """Runs the plan on every host with bounded concurrency. Returns per-host results."""
+    script = _script_source()
+    print(f"🚚 Running '{plan['action']}' on {len(hosts)} host(s), {workers} at a time...")
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(hosts)))) as pool:
+        results = list(pool.map(_propagate(lambda host: _run_on_host(host, plan, script, timeout)), hosts))
+
+    print("\n📊 Fleet report")
+    for result in results:
+        icon = "✅" if result["status"] == "ok" else "❌"
+        missing = [row["tool"] for row in result["rows"] if not row["installed"]]
+        installed = [tool for tool, was in result["before"].items()
+                     if not was and tool not in missing]
+        detail = result["error"] or f"missing: {', '.join(missing) or 'none'}"
+        if installed:
+            detail = f"installed: {', '.join(installed)}; {detail}"
+        print(f"   {icon} {result['host']:<30} {result['seconds']:>7.1f}s  {detail}")
+    ok = sum(result["status"] == "ok" for result in results)
+    slowest = max((result["seconds"] for result in results), default=0)
+    print(f"🏁 {ok}/{len(results)} hosts succeeded; slowest host took {slowest:.1f}s")
+    return results
+
+#########
+# ✅ Trace report: where provisioning time goes, across runs
+def load_trace(path=None, runs=None):
+    """Reads spans from the trace (and its rotated predecessor), keeping the last `runs` runs."""
+    path = path or TRACE_FILE
+    spans = []
+    for name in (path + ".1", path):
+        try:
+            with open(name) as f:
+                for line in f:
+                    try:
+                        spans.append(json.loads(line))
+                    except ValueError:
+                        continue  # A run killed mid-write leaves a truncated line
+        except OSError:
+            continue
+    if runs:
+        keep = set(list(dict.fromkeys(record["run"] for record in spans))[-runs:])
+        spans = [record for record in spans if record["run"] in keep]
+    return spans
+
+def _span_failed(record):
+    return bool(record.get("error")) or record.get("exit_code") not in (0, None)
+
+def summarize_trace(spans, top=10):
+    """Slowest individual steps plus per-tool and per-command totals."""
+    work = [record for record in spans if record["kind"] in ("subprocess", "download")]
+
+    def group(key):
+        totals = {}
+        for record in work:
+            entry = totals.setdefault(key(record) or "-", {"count": 0, "seconds": 0.0, "max": 0.0,
+                                                           "failures": 0, "bytes": 0})
+            entry["count"] += 1
+            entry["seconds"] += record["seconds"]
+            entry["max"] = max(entry["max"], record["seconds"])
+            entry["failures"] += _span_failed(record)
+            entry["bytes"] += record.get("bytes", 0)
+        return dict(sorted(totals.items(), key=lambda item: -item[1]["seconds"])[:top])
+
+    return {
+        "runs": len({record["run"] for record in spans}),
+        "spans": len(spans),
+        "seconds": round(sum(record["seconds"] for record in work), 2),
+        "bytes": sum(record.get("bytes", 0) for record in work),
+        "slowest": sorted(work, key=lambda record: -record["seconds"])[:top],
+        "tools": group(lambda record: record.get("tool") or record.get("operation")),
+        "commands": group(lambda record: record["name"]),
+    }
+
+def print_trace_report(summary):
+    if not summary["spans"]:
+        print(f"ℹ️ No spans recorded yet in {TRACE_FILE}")
+        return
+    print(f"📊 {summary['runs']} run(s), {summary['spans']} spans, "
+          f"{summary['seconds']:.1f}s in subprocesses and downloads, "
+          f"{summary['bytes'] / 1024 / 1024:.1f} MB downloaded")
+
+    print("\n🐢 Slowest steps")
+    for record in summary["slowest"]:
+        icon = "❌" if _span_failed(record) else "✅"
+        owner = record.get("tool") or record.get("operation") or "-"
+        detail = record.get("command") or record.get("url") or record["name"]
+        print(f"   {icon} {record['seconds']:>8.2f}s  {owner:<12} {detail[:80]}")
+
+    for title, key in (("🧰 By tool", "tools"), ("⚙️ By command", "commands")):
+        print(f"\n{title}")
+        width = max(len(name) for name in summary[key])
+        print(f"   {'':<{width}}  {'runs':>5} {'total':>9} {'max':>8} {'failed':>6}")
+        for name, entry in summary[key].items():
+            print(f"   {name:<{width}}  {entry['count']:>5} {entry['seconds']:>8.1f}s "
+                  f"{entry['max']:>7.1f}s {entry['failures']:>6}")
 
 #########
 # ✅ Main menu loop
@@ -648,4 +3988,170 @@ def main_menu():
 
 # ✅ Run main menu if executed directly
 if __name__ == "__main__":
-    main_menu()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Automated DevOps environment setup")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="ignore the on-disk detection cache and probe every tool")
+    parser.add_argument("--workers", type=int, default=INSTALL_WORKERS,
+                        help=f"parallel install steps (default: {INSTALL_WORKERS})")
+    commands = parser.add_subparsers(dest="command")
+
+    inventory_parser = commands.add_parser("inventory", help="report installed tool versions")
+    inventory_parser.add_argument("--format", choices=["json", "csv"], default="json")
+    inventory_parser.add_argument("--output", help="write to a file instead of stdout")
+
+    install_parser = commands.add_parser("install", help="install tools without prompting")
+    install_parser.add_argument("tools", nargs="*",
+                                help="tools to converge (default: every tool that is not installed)")
+    install_parser.add_argument("--node-version", default="22")
+    install_parser.add_argument("--dry-run", action="store_true",
+                                help="show which steps would run and their estimated cost, then stop")
+    install_parser.add_argument("--force", action="store_true", help="rerun steps even when already converged")
+    install_parser.add_argument("--upgrade", action="store_true",
+                                help="move release-installed tools past their lockfile pins to the latest release")
+    install_parser.add_argument("--prefix", help=f"install release binaries under PREFIX/bin (default: {RELEASE_PREFIX})")
+    install_parser.add_argument("--from-bundle", metavar="ARCHIVE",
+                                help="install from an offline bundle without touching the network")
+
+    bundle_parser = commands.add_parser("bundle", help="build an offline bundle for air-gapped installs")
+    bundle_parser.add_argument("tools", nargs="*", help="tools to bundle (default: the whole catalog)")
+    bundle_parser.add_argument("--output", help="archive path (default: devops-bundle-<timestamp>.tar.gz)")
+    bundle_parser.add_argument("--node-version", default="22")
+
+    fleet_parser = commands.add_parser("fleet", help="run detection or installs across many hosts")
+    fleet_parser.add_argument("action", choices=["detect", "install"])
+    fleet_parser.add_argument("tools", nargs="*", help="tools to install (default: every missing tool)")
+    fleet_parser.add_argument("--hosts", required=True, help="host inventory file")
+    fleet_parser.add_argument("--parallel", type=int, default=FLEET_WORKERS, help="hosts at once")
+    fleet_parser.add_argument("--timeout", type=int, default=FLEET_TIMEOUT, help="seconds per host")
+    fleet_parser.add_argument("--node-version", default="22")
+    fleet_parser.add_argument("--report", help="write the combined JSON report here")
+
+    workspace_parser = commands.add_parser("workspace", help="sync every git repo under a directory")
+    workspace_parser.add_argument("root", nargs="?", default=".")
+    workspace_parser.add_argument("--parallel", type=int, default=WORKSPACE_WORKERS, help="repos at once")
+    workspace_parser.add_argument("--no-pull", action="store_true", help="never rebase onto the upstream")
+    workspace_parser.add_argument("--no-push", action="store_true", help="never push local commits")
+
+    clone_parser = commands.add_parser("clone", help="clone with partial/shallow/sparse/mirror options")
+    clone_parser.add_argument("url")
+    clone_parser.add_argument("dest", nargs="?")
+    clone_parser.add_argument("--filter", dest="filter_spec", choices=sorted(CLONE_FILTERS.values()),
+                              help="partial clone: blob:none (blobless) or tree:0 (treeless)")
+    clone_parser.add_argument("--depth", type=int, help="shallow clone with this many commits")
+    clone_parser.add_argument("--sparse", nargs="+", metavar="DIR", help="cone-mode sparse-checkout directories")
+    clone_parser.add_argument("--mirror", action="store_true",
+                              help="borrow objects from a cached mirror (--reference --dissociate)")
+
+    commands.add_parser("endpoints", help="rank the configured download sources by latency")
+
+    ssh_parser = commands.add_parser("ssh-key", help="create or reuse an SSH key, load it into an agent")
+    ssh_parser.add_argument("--type", dest="key_type", choices=list(SSH_KEY_TYPES),
+                            help=f"key type to create when none exists (default: {DEFAULT_SSH_KEY_TYPE})")
+    ssh_parser.add_argument("--email", help="comment for a new key")
+    ssh_parser.add_argument("--ssh-config", action="store_true",
+                            help="add the connection-sharing block to ~/.ssh/config without asking")
+
+    watch_parser = commands.add_parser("watch", help="keep the inventory current from inotify events")
+    watch_parser.add_argument("--socket", default=WATCH_SOCKET, help="Unix socket readers connect to")
+    watch_parser.add_argument("--state-file", default=WATCH_STATE_FILE, help="JSON file kept up to date")
+    watch_parser.add_argument("--query", action="store_true", help="print a running watcher's inventory")
+
+    report_parser = commands.add_parser("report", help="summarize the slowest steps and tools across runs")
+    report_parser.add_argument("--trace", help=f"trace file (default: {TRACE_FILE})")
+    report_parser.add_argument("--runs", type=int, help="only the most recent N runs")
+    report_parser.add_argument("--top", type=int, default=10, help="rows per section")
+    report_parser.add_argument("--json", action="store_true", help="print the summary as JSON")
+
+    # Everything after `benchmark` goes to benchmarks/harness.py, which lives next to this script
+    commands.add_parser("benchmark", add_help=False, help="time detection, installs and git sync in a sandbox")
+
+    tune_parser = commands.add_parser("tune-repo", help="apply the large-repo performance profile")
+    tune_parser.add_argument("repo", nargs="?", default=".")
+
+    agent_parser = commands.add_parser("agent", help=argparse.SUPPRESS)
+    agent_parser.add_argument("--plan", required=True)
+
+    args, extra = parser.parse_known_args()
+    if extra and args.command != "benchmark":
+        parser.error(f"unrecognized arguments: {' '.join(extra)}")
+
+    if args.no_cache:
+        USE_DETECT_CACHE = False
+    INSTALL_WORKERS = max(1, args.workers)
+    if getattr(args, "prefix", None):
+        RELEASE_PREFIX = os.path.abspath(os.path.expanduser(args.prefix))
+
+    if args.command == "install" and args.from_bundle:
+        install_from_bundle(args.from_bundle, args.tools or None)
+    elif args.command == "bundle":
+        build_bundle(args.tools or [app for apps in APP_CATEGORIES.values() for app in apps],
+                     args.output, args.node_version)
+    elif args.command == "install":
+        if args.tools:
+            # Named tools are converged: steps that already hold are skipped, the rest rerun
+            wanted = args.tools
+        else:
+            installed = {app: ok for entries in detect_inventory().values() for app, ok in entries}
+            wanted = [app for apps in APP_CATEGORIES.values() for app in apps if not installed.get(app)]
+        install_apps(wanted, node_version=args.node_version, force=args.force, dry_run=args.dry_run,
+                     upgrade=args.upgrade)
+    elif args.command == "fleet":
+        plan = {"action": args.action, "tools": args.tools,
+                "node_version": args.node_version, "workers": INSTALL_WORKERS}
+        results = run_fleet(load_host_inventory(args.hosts), plan, args.parallel, args.timeout)
+        if args.report:
+            with open(args.report, "w") as f:
+                json.dump(results, f, indent=2)
+    elif args.command == "workspace":
+        sync_workspace(args.root, args.parallel, pull=not args.no_pull, push=not args.no_push)
+    elif args.command == "clone":
+        clone_repo(args.url, args.dest, args.filter_spec, args.depth, args.sparse, args.mirror)
+    elif args.command == "endpoints":
+        print(f"🌐 Internet: {'✅ online' if has_internet() else '❌ offline'}")
+        for name in SOURCE_ENDPOINTS:
+            print(f"\n📡 {name}")
+            ranked = dict(rank_endpoints(source_endpoints(name)))
+            for url in source_endpoints(name):
+                latency = ranked.get(url)
+                print(f"   {'✅' if latency is not None else '❌'} {url}"
+                      + (f"  {latency * 1000:.0f} ms" if latency is not None else "  unreachable"))
+    elif args.command == "ssh-key":
+        setup_github_ssh(args.key_type or (None if find_ssh_key() else DEFAULT_SSH_KEY_TYPE), args.email,
+                         args.ssh_config)
+    elif args.command == "tune-repo":
+        tune_large_repo(args.repo)
+    elif args.command == "watch" and args.query:
+        import sys
+
+        state = read_watch_state(args.socket)
+        if state is None:
+            print(f"❌ No watcher is answering on {args.socket}", file=sys.stderr)
+            sys.exit(1)
+        print(json.dumps(state, indent=2))
+    elif args.command == "watch":
+        watch_inventory(args.socket, args.state_file)
+    elif args.command == "benchmark":
+        import sys
+
+        from benchmarks import harness
+
+        sys.exit(harness.main(extra))
+    elif args.command == "report":
+        summary = summarize_trace(load_trace(args.trace, args.runs), args.top)
+        if args.json:
+            print(json.dumps(summary, indent=2))
+        else:
+            print_trace_report(summary)
+    elif args.command == "agent":
+        run_agent_plan(json.loads(args.plan))
+    elif args.command == "inventory":
+        rows = collect_versions()
+        if args.output:
+            with open(args.output, "w", newline="") as f:
+                write_inventory(rows, args.format, f)
+        else:
+            write_inventory(rows, args.format)
+    else:
+        main_menu()
@@ -0,0 +1 @@
+"""Benchmarks for DevOps_environment_setup.py; run them with `python3 -m benchmarks`."""
@@ -0,0 +1,9 @@
+import os
+import sys
+
+# The setup script is a top-level module next to this package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import harness  # noqa: E402
+
+sys.exit(harness.main())
@@ -0,0 +1,485 @@
+"""Hermetic benchmarks: fake shims, a local HTTP server and local bare repos.
+
+Every scenario runs the setup script's own code against a throwaway sandbox,
+so nothing on the host is installed, downloaded or rewritten."""
+
+import argparse
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+
+import DevOps_environment_setup as setup
+
+FORMAT = 1
+LATENCY = 0.02
+REPEAT = 3
+GIT_FILES = [1000, 100000]
+# A scenario regresses when its median wall-clock grows by more than this fraction
+TOLERANCE = 0.25
+# ...and by more than this many seconds, so millisecond-scale jitter is not flagged
+NOISE_FLOOR = 0.01
+
+# The fault-injection server answers each file's first GET with a 503 and then
+# stalls every later GET for this many seconds before answering
+STALL = 10
+
+# Network policy inside the sandbox: quick retries and early hedging, so the
+# faults scenario measures the policy rather than its production delays
+SANDBOX_NETWORK_POLICY = {
+    "default": {**setup.NETWORK_POLICY["default"], "read_timeout": 5, "backoff": 0.05, "backoff_max": 0.2,
+                "hedge_after": 0.2},
+    "hosts": {},
+    "steps": setup.NETWORK_POLICY["steps"],
+}
+
+# Stand-ins for the system commands installs shell out to. Each one sleeps for
+# $DEVOPS_SHIM_LATENCY seconds. apt-get install records its packages in
+# $DEVOPS_SHIM_STATE and dpkg-query reports exactly those as installed, so a
+# second install finds a converged host. sudo runs the shimmed package tools,
+# only ever writes files inside $DEVOPS_SANDBOX and swallows everything else.
+SHIMS = {
+    "sudo": '''case "$1" in
+apt-get|dpkg-query) exec "$@";;
+tee) cat > /dev/null;;
+install)
+    # sudo install -D -o root -g root -m MODE SRC DEST: keep the file, drop the ownership
+    while [ $# -gt 2 ]; do shift; done
+    case "$2" in "$DEVOPS_SANDBOX"/*) mkdir -p "${2%/*}" && cp "$1" "$2";; esac;;
+esac
+sleep "$DEVOPS_SHIM_LATENCY"
+''',
+    "apt-get": '''sleep "$DEVOPS_SHIM_LATENCY"
+while [ "$1" = -o ]; do shift 2; done
+if [ "$1" = install ]; then
+    shift
+    for pkg in "$@"; do
+        case "$pkg" in -*) ;; *) mkdir -p "${DEVOPS_SHIM_STATE%/*}" && echo "$pkg" >> "$DEVOPS_SHIM_STATE";; esac
+    done
+fi
+''',
+    "dpkg-query": '''sleep "$DEVOPS_SHIM_LATENCY"
+for pkg in "$@"; do
+    case "$pkg" in -*) continue;; esac
+    grep -qx "$pkg" "$DEVOPS_SHIM_STATE" 2>/dev/null && echo "$pkg 1.0 install ok installed"
+done
+exit 0
+''',
+    "curl": 'sleep "$DEVOPS_SHIM_LATENCY"\n',
+    "gpg": 'sleep "$DEVOPS_SHIM_LATENCY"\n',
+    "dpkg": 'echo amd64\n',
+    "lsb_release": 'echo noble\n',
+}
+
+# Real commands the sandbox PATH keeps; nothing else from the host is visible
+HOST_COMMANDS = ["sh", "bash", "git", "python3", "sleep", "cat", "grep", "rm", "mv", "mkdir",
+                 "install", "cp", "ln"]
+
+# nvm.sh stand-in: every nvm command just takes time
+NVM_SH = 'nvm() { sleep "$DEVOPS_SHIM_LATENCY"; }\n'
+
+# Versions the fake release server reports as latest
+RELEASE_VERSIONS = {"node": "v22.0.0"}
+RELEASE_VERSION = "v1.0.0"
+
+
+def write_executable(path, body):
+    with open(path, "w") as f:
+        f.write("#!/bin/sh\n" + body)
+    os.chmod(path, 0o755)
+
+
+def start_server(www, latency, faults=False):
+    """Serves www on a random localhost port, adding latency to every request.
+
+    With faults, each path's first GET fails with a 503 and later GETs stall for
+    STALL seconds; HEAD requests stay healthy so the source still ranks first."""
+    import http.server
+
+    failed = set()
+    failed_lock = threading.Lock()
+
+    class Handler(http.server.SimpleHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, directory=www, **kwargs)
+
+        def do_GET(self):
+            if faults:
+                with failed_lock:
+                    first = self.path not in failed
+                    failed.add(self.path)
+                if first:
+                    self.send_error(503)
+                    return
+                time.sleep(STALL)
+            super().do_GET()
+
+        def send_head(self):
+            time.sleep(latency)
+            return super().send_head()
+
+        def log_message(self, *args):
+            pass
+
+    class Server(http.server.ThreadingHTTPServer):
+        daemon_threads = True
+
+        def handle_error(self, request, client_address):
+            # A stalled reply outlives the hedged request that gave up on it
+            if not isinstance(sys.exc_info()[1], ConnectionError):
+                super().handle_error(request, client_address)
+
+    server = Server(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def fixtures(root, latency):
+    """Lays out shims, a fake nvm, catalog binaries and the files the HTTP server hands out."""
+    shim_dir = os.path.join(root, "shims")
+    os.makedirs(shim_dir)
+    for name, body in SHIMS.items():
+        write_executable(os.path.join(shim_dir, name), body)
+    for name in HOST_COMMANDS:
+        if shutil.which(name):
+            os.symlink(shutil.which(name), os.path.join(shim_dir, name))
+    # Every catalog tool except the real git/python3 and node (found through nvm instead)
+    for app in [app for apps in setup.APP_CATEGORIES.values() for app in apps]:
+        if app not in ("git", "python3", "node"):
+            write_executable(os.path.join(shim_dir, app), f'echo "{app} version 1.0.0"\n')
+
+    nvm_dir = os.path.join(root, "home", ".nvm")
+    node_bin = os.path.join(nvm_dir, "versions", "node", "v22.0.0", "bin")
+    os.makedirs(node_bin)
+    os.makedirs(os.path.join(nvm_dir, "alias"))
+    with open(os.path.join(nvm_dir, "nvm.sh"), "w") as f:
+        f.write(NVM_SH)
+    with open(os.path.join(nvm_dir, "alias", "default"), "w") as f:
+        f.write("22\n")
+    write_executable(os.path.join(node_bin, "node"), 'echo v22.0.0\n')
+
+    www = os.path.join(root, "www")
+    os.makedirs(os.path.join(www, "keys"))
+    for app in setup.APT_REPO_KEYS:
+        with open(os.path.join(www, "keys", app), "w") as f:
+            f.write(f"{app} key\n")
+    release_fixtures(www)
+    return shim_dir, nvm_dir, www
+
+
+def release_fixtures(www):
+    """Publishes a release of every RELEASE_ASSETS tool for this machine's architecture,
+    laid out the way its upstream does, with checksums and a "latest" pointer."""
+    import io
+    import tarfile
+
+    def publish(rel, data):
+        path = os.path.join(www, rel)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+
+    def archive(files, mode):
+        buffer = io.BytesIO()
+        with tarfile.open(fileobj=buffer, mode=mode) as tar:
+            for name, data in files.items():
+                info = tarfile.TarInfo(name)
+                info.size, info.mode = len(data), 0o755
+                tar.addfile(info, io.BytesIO(data))
+        return buffer.getvalue()
+
+    # 1 MiB of noise per binary so downloads have a realistic cost
+    payload = os.urandom(1024 * 1024)
+    for app, spec in setup.RELEASE_ASSETS.items():
+        version = RELEASE_VERSIONS.get(app, RELEASE_VERSION)
+        arch = setup.release_arch(app)
+        fields = {"version": version, "bare": version.lstrip("v"), "arch": arch}
+        rel = spec["asset"].format(**fields)
+        if spec.get("tree"):
+            top = os.path.basename(rel).split(".tar.")[0]
+            data = archive({f"{top}/bin/{app}": f"#!/bin/sh\necho {version}\n".encode()}, "w:xz")
+        elif spec["member"]:
+            data = archive({spec["member"].format(arch=arch): payload}, "w:gz")
+        else:
+            data = payload
+        publish(rel, data)
+        publish(spec["checksum"].format(**fields),
+                f"{hashlib.sha256(data).hexdigest()}  {os.path.basename(rel)}\n".encode())
+
+    publish("release/stable.txt", f"{RELEASE_VERSION}\n".encode())
+    publish("helm-latest-version", f"{RELEASE_VERSION}\n".encode())
+    tag = json.dumps({"tag_name": RELEASE_VERSION}).encode()
+    publish("repos/kubernetes/minikube/releases/latest", tag)
+    publish("projects/gitlab-org/cli/releases/permalink/latest", tag)
+    publish("index.json", json.dumps([{"version": RELEASE_VERSIONS["node"]}]).encode())
+
+
+def _sandboxed(root, path):
+    """Where an absolute system path lives inside the sandbox."""
+    return os.path.join(root, "system", path.lstrip("/"))
+
+
+@contextlib.contextmanager
+def sandbox(root, latency):
+    """Points every cache, download source, system path, PATH and HOME of the setup
+    module into root for the duration.
+
+    Yields the base URL of a second server that injects errors and stalls."""
+    shim_dir, nvm_dir, www = fixtures(root, latency)
+    server = start_server(www, latency)
+    faulty = start_server(www, 0, faults=True)
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    home = os.path.dirname(nvm_dir)
+    with open(os.path.join(home, ".gitconfig"), "w") as f:
+        f.write("[user]\n\tname = Benchmark\n\temail = benchmark@example.invalid\n"
+                "[init]\n\tdefaultBranch = main\n[gc]\n\tauto = 0\n[maintenance]\n\tauto = false\n")
+
+    overrides = {
+        "DETECT_CACHE_FILE": os.path.join(root, "cache", "detect.json"),
+        "VERSION_CACHE_FILE": os.path.join(root, "cache", "versions.json"),
+        "CONNECTIVITY_CACHE_FILE": os.path.join(root, "cache", "connectivity.json"),
+        "ARTIFACT_DIR": os.path.join(root, "cache", "artifacts"),
+        "TRACE_FILE": os.path.join(root, "trace.jsonl"),
+        "MIRROR_DIR": os.path.join(root, "cache", "mirrors"),
+        "CONVERGE_STATE_FILE": os.path.join(root, "cache", "converge.json"),
+        "NETWORK_LATENCY_FILE": os.path.join(root, "cache", "latency.json"),
+        "NETWORK_POLICY": SANDBOX_NETWORK_POLICY,
+        "NVM_PATHS": [nvm_dir],
+        "SOURCE_ENDPOINTS": {name: [base] for name in setup.SOURCE_ENDPOINTS},
+        "INTERNET_PROBES": [("127.0.0.1", server.server_address[1])],
+        "APT_REPO_KEYS": {app: f"{base}/keys/{app}" for app in setup.APT_REPO_KEYS},
+        "APT_REPOS": {app: {**repo, "keyring": _sandboxed(root, repo["keyring"]),
+                            "sources": _sandboxed(root, repo["sources"])}
+                      for app, repo in setup.APT_REPOS.items()},
+        "DPKG_STATUS_FILE": os.path.join(root, "system", "installed"),
+        "RELEASE_PREFIX": os.path.join(root, "prefix"),
+        "RELEASE_LOCK_FILE": os.path.join(root, "tools.lock.json"),
+        "INSTALL_LOG_FILE": os.path.join(root, "install_log.txt"),
+    }
+    environ = {"PATH": shim_dir, "HOME": home, "DEVOPS_SANDBOX": root,
+               "DEVOPS_SHIM_STATE": os.path.join(root, "system", "installed"),
+               "DEVOPS_SHIM_LATENCY": str(latency), "GIT_CONFIG_NOSYSTEM": "1"}
+    unset = ["NVM_DIR", "DEVOPS_ENDPOINTS", "DEVOPS_NETWORK_POLICY", "http_proxy", "https_proxy", "HTTP_PROXY",
+             "HTTPS_PROXY", "XDG_CONFIG_HOME", "GIT_CONFIG_GLOBAL", "GIT_DIR", "GIT_WORK_TREE"]
+
+    saved = {name: getattr(setup, name) for name in overrides}
+    saved_environ = {name: os.environ.get(name) for name in list(environ) + unset}
+    saved_cwd = os.getcwd()
+    for name, value in overrides.items():
+        setattr(setup, name, value)
+    os.environ.update(environ)
+    for name in unset:
+        os.environ.pop(name, None)
+    os.chdir(root)
+    try:
+        yield f"http://127.0.0.1:{faulty.server_address[1]}"
+    finally:
+        os.chdir(saved_cwd)
+        for name, value in saved_environ.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+        for name, value in saved.items():
+            setattr(setup, name, value)
+        for httpd in (server, faulty):
+            httpd.shutdown()
+            httpd.server_close()
+
+
+def reset_state(root, cold=True):
+    """Forgets everything the setup module cached in memory; cold also wipes the
+    on-disk caches and whatever the sandbox's host has installed."""
+    for name in ("_inventory", "_detect_cache", "_connectivity_cache", "_converge_state", "_latency_history"):
+        setattr(setup, name, None)
+    setup._remote_ref_cache.clear()
+    if cold:
+        shutil.rmtree(os.path.join(root, "cache"), ignore_errors=True)
+        # ...and what earlier runs installed and pinned, so the next install starts over
+        for name in ("prefix", "system"):
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+        with contextlib.suppress(OSError):
+            os.remove(os.path.join(root, "tools.lock.json"))
+
+
+def make_repo(root, files):
+    """A bare remote holding `files` files plus two clones tracking it."""
+    remote = os.path.join(root, f"remote-{files}.git")
+    pusher = os.path.join(root, f"pusher-{files}")
+    puller = os.path.join(root, f"puller-{files}")
+    setup.run_command(["git", "init", "--quiet", "--bare", remote], check=True)
+    setup.run_command(["git", "init", "--quiet", pusher], check=True)
+    for i in range(files):
+        directory = os.path.join(pusher, f"d{i // 1000:03d}")
+        if i % 1000 == 0:
+            os.makedirs(directory)
+        with open(os.path.join(directory, f"f{i:06d}.txt"), "w") as f:
+            f.write(f"{i}\n")
+    setup.run_command(["git", "-C", pusher, "add", "-A"], check=True)
+    setup.run_command(["git", "-C", pusher, "commit", "--quiet", "-m", "seed"], check=True)
+    setup.run_command(["git", "-C", pusher, "remote", "add", "origin", remote], check=True)
+    setup.run_command(["git", "-C", pusher, "push", "--quiet", "-u", "origin", "main"], check=True)
+    setup.run_command(["git", "clone", "--quiet", remote, puller], check=True)
+    return pusher, puller
+
+
+def commit_change(repo, n):
+    with open(os.path.join(repo, "d000", "f000000.txt"), "a") as f:
+        f.write(f"change {n}\n")
+    setup.run_command(["git", "-C", repo, "commit", "--quiet", "-am", f"change {n}"], check=True)
+
+
+def scenarios(root, selected, git_files, faulty_base=None):
+    """Yields (name, prepare, run): prepare runs untimed before every timed run()."""
+    apps = [app for category_apps in setup.APP_CATEGORIES.values() for app in category_apps]
+    installable = [app for app in apps if app not in ("git", "python3")]
+
+    def detect_cold():
+        setup.USE_DETECT_CACHE = False
+        try:
+            setup.detect_inventory(refresh=True)
+        finally:
+            setup.USE_DETECT_CACHE = True
+
+    if "detect" in selected:
+        yield "detect-cold", lambda: reset_state(root), detect_cold
+        yield ("detect-warm", lambda: (reset_state(root), setup.detect_inventory(refresh=True),
+                                       reset_state(root, cold=False)),
+               lambda: setup.detect_inventory(refresh=True))
+    if "install" in selected:
+        yield ("install-cold", lambda: reset_state(root),
+               lambda: setup.install_apps(installable, node_version="22"))
+        yield ("install-warm", lambda: reset_state(root, cold=False),
+               lambda: setup.install_apps(installable, node_version="22"))
+    if "faults" in selected and faulty_base:
+        def install_faults():
+            healthy = setup.SOURCE_ENDPOINTS
+            setup.SOURCE_ENDPOINTS = {name: [faulty_base, *urls] for name, urls in healthy.items()}
+            # Rank the faulty server first, like a mirror that has only just started misbehaving
+            setup._connectivity_cached(faulty_base)
+            setup._connectivity_store(faulty_base, latency=0.0)
+            try:
+                status = setup.install_apps(["kubectl", "minikube", "helm"], force=True)
+            finally:
+                setup.SOURCE_ENDPOINTS = healthy
+            failed = [name for name, outcome in status.items() if outcome != "ok"]
+            if failed:
+                raise RuntimeError(f"steps failed despite retries and hedging: {', '.join(failed)}")
+
+        yield "install-faults", lambda: reset_state(root), install_faults
+    if "git" in selected:
+        for files in git_files:
+            label = f"{files // 1000}k" if files >= 1000 else str(files)
+            repos = {}
+            counter = iter(range(1, 1 << 30))
+
+            def prepare_push(files=files, repos=repos, counter=counter):
+                reset_state(root, cold=False)
+                if not repos:
+                    repos["pusher"], repos["puller"] = make_repo(root, files)
+                commit_change(repos["pusher"], next(counter))
+
+            def prepare_pull(repos=repos, counter=counter):
+                reset_state(root, cold=False)
+                commit_change(repos["pusher"], next(counter))
+                setup.run_command(["git", "-C", repos["pusher"], "push", "--quiet"], check=True)
+
+            def check(outcome):
+                if outcome[0] != "synced":
+                    raise RuntimeError(f"sync did not happen: {outcome}")
+
+            yield (f"git-push-{label}", prepare_push,
+                   lambda repos=repos: check(setup.sync_repo(repos["pusher"])))
+            yield (f"git-pull-{label}", prepare_pull,
+                   lambda repos=repos: check(setup.sync_repo(repos["puller"])))
+
+
+def run_benchmarks(selected=("detect", "install", "faults", "git"), repeat=REPEAT, latency=LATENCY,
+                   git_files=None):
+    """Times each scenario `repeat` times inside a throwaway sandbox. Returns the results document."""
+    import io
+    import platform
+    import statistics
+    import tempfile
+    from datetime import datetime
+
+    results = {"format": FORMAT, "created": datetime.now().isoformat(timespec="seconds"),
+               "python": platform.python_version(), "machine": platform.machine(),
+               "cpus": os.cpu_count(), "latency": latency, "repeat": repeat, "scenarios": {}}
+    with (tempfile.TemporaryDirectory(prefix="devops-bench-", ignore_cleanup_errors=True) as root,
+          sandbox(root, latency) as faulty_base):
+        for name, prepare, run in scenarios(root, selected, git_files or GIT_FILES, faulty_base):
+            walls, subprocesses, downloaded = [], [], []
+            for attempt in range(repeat):
+                with contextlib.redirect_stdout(io.StringIO()):
+                    prepare()
+                    with contextlib.suppress(FileNotFoundError):
+                        os.remove(setup.TRACE_FILE)
+                    started = time.perf_counter()
+                    run()
+                    walls.append(time.perf_counter() - started)
+                spans = setup.load_trace(setup.TRACE_FILE)
+                subprocesses.append(sum(record["kind"] == "subprocess" for record in spans))
+                downloaded.append(sum(record.get("bytes", 0) for record in spans))
+            results["scenarios"][name] = {
+                "wall_median": round(statistics.median(walls), 4),
+                "wall_min": round(min(walls), 4),
+                "walls": [round(wall, 4) for wall in walls],
+                "subprocesses": max(subprocesses),
+                "bytes": max(downloaded),
+            }
+            print(f"⏱️ {name:<16} {statistics.median(walls):>8.3f}s median  "
+                  f"{max(subprocesses):>4} subprocesses  {max(downloaded) / 1024:>7.0f} KB")
+    return results
+
+
+def compare_benchmarks(results, baseline, tolerance=TOLERANCE):
+    """Prints each scenario against the baseline. Returns the names that regressed."""
+    regressions = []
+    print(f"\n📊 Against baseline from {baseline.get('created', '?')} (tolerance {tolerance:.0%})")
+    for name, current in results["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if not before:
+            print(f"   🆕 {name:<16} no baseline")
+            continue
+        ratio = current["wall_median"] / before["wall_median"] if before["wall_median"] else 1.0
+        slower = ratio > 1 + tolerance and current["wall_median"] - before["wall_median"] > NOISE_FLOOR
+        more_calls = current["subprocesses"] > before["subprocesses"]
+        if slower or more_calls:
+            regressions.append(name)
+        print(f"   {'❌' if slower or more_calls else '✅'} {name:<16} {ratio:>6.2f}x wall  "
+              f"subprocesses {before['subprocesses']} → {current['subprocesses']}")
+    return regressions
+
+
+def main(argv=None):
+    """Runs the benchmark CLI. Returns the exit status: 1 when a scenario regressed."""
+    parser = argparse.ArgumentParser(prog="benchmark",
+                                     description="time detection, installs and git sync in a sandbox")
+    parser.add_argument("--only", nargs="+", choices=["detect", "install", "faults", "git"],
+                        default=["detect", "install", "faults", "git"])
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="timed runs per scenario")
+    parser.add_argument("--latency", type=float, default=LATENCY, help="seconds each shim and HTTP request takes")
+    parser.add_argument("--git-files", type=int, nargs="+", default=GIT_FILES,
+                        help="repository sizes for the push/pull scenarios")
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--baseline", help="compare against an earlier --output file")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE,
+                        help="allowed fractional slowdown before a scenario counts as regressed")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.only, max(1, args.repeat), args.latency, args.git_files)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            if compare_benchmarks(results, json.load(f), args.tolerance):
+                return 1
+    return 0
@@ -0,0 +1,283 @@
+import hashlib
+import http.server
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+
+import pytest
+
+# Caches, traces and config the module resolves at import time must never touch the real ones
+_import_home = tempfile.mkdtemp(prefix="devops-setup-tests-")
+os.environ["XDG_CACHE_HOME"] = os.path.join(_import_home, "cache")
+os.environ["XDG_CONFIG_HOME"] = os.path.join(_import_home, "config")
+for name in ("DEVOPS_TRACE", "DEVOPS_ARTIFACT_CACHE", "DEVOPS_ENDPOINTS", "DEVOPS_NETWORK_POLICY",
+             "DEVOPS_PREFIX", "DEVOPS_LOCKFILE"):
+    os.environ.pop(name, None)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import DevOps_environment_setup as setup  # noqa: E402
+from benchmarks import harness  # noqa: E402
+
+
+@pytest.fixture
+def devops(tmp_path, monkeypatch):
+    """The module with every on-disk cache and in-memory cache pointed at tmp_path."""
+    cache = tmp_path / "cache"
+    for name, value in {
+        "DETECT_CACHE_FILE": cache / "detect.json",
+        "VERSION_CACHE_FILE": cache / "versions.json",
+        "CONNECTIVITY_CACHE_FILE": cache / "connectivity.json",
+        "ARTIFACT_DIR": cache / "artifacts",
+        "TRACE_FILE": tmp_path / "trace.jsonl",
+        "MIRROR_DIR": cache / "mirrors",
+        "CONVERGE_STATE_FILE": cache / "converge.json",
+        "NETWORK_LATENCY_FILE": cache / "latency.json",
+        "RELEASE_PREFIX": tmp_path / "prefix",
+        "RELEASE_LOCK_FILE": tmp_path / "tools.lock.json",
+        "INSTALL_LOG_FILE": tmp_path / "install_log.txt",
+    }.items():
+        monkeypatch.setattr(setup, name, str(value))
+    for name in ("_inventory", "_detect_cache", "_connectivity_cache", "_converge_state", "_latency_history"):
+        monkeypatch.setattr(setup, name, None)
+    monkeypatch.setattr(setup, "_connection_pool", {})
+    setup._remote_ref_cache.clear()
+    setup._network_policy_overrides.cache_clear()
+    return setup
+
+
+@pytest.fixture
+def git_env(tmp_path, monkeypatch):
+    """A HOME with a known identity, so commits work without the user's git config."""
+    home = tmp_path / "home"
+    home.mkdir()
+    (home / ".gitconfig").write_text("[user]\n\tname = Test\n\temail = test@example.invalid\n"
+                                     "[init]\n\tdefaultBranch = main\n")
+    monkeypatch.setenv("HOME", str(home))
+    monkeypatch.setenv("GIT_CONFIG_NOSYSTEM", "1")
+    for name in ("GIT_DIR", "GIT_WORK_TREE", "GIT_CONFIG_GLOBAL"):
+        monkeypatch.delenv(name, raising=False)
+    return home
+
+
+def git(repo, *args):
+    return subprocess.run(["git", "-C", str(repo), *args], check=True,
+                          capture_output=True, text=True).stdout.strip()
+
+
+def write_executable(path, body):
+    path.write_text("#!/bin/sh\n" + body)
+    path.chmod(0o755)
+
+
+def commit(repo, name, content="x\n"):
+    (repo / name).write_text(content)
+    git(repo, "add", name)
+    git(repo, "commit", "--quiet", "-m", f"add {name}")
+    return git(repo, "rev-parse", "HEAD")
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    """Serves server.root with ETag, Range and If-Range, applying queued faults per path."""
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_HEAD(self):
+        self._serve(body=False)
+
+    def do_GET(self):
+        self._serve(body=True)
+
+    def _serve(self, body):
+        server = self.server
+        path = urllib.parse.unquote(urllib.parse.urlsplit(self.path).path)
+        with server.lock:
+            server.requests.append((self.command, path, self.headers.get("Range")))
+            queued = server.faults.get(path) if body else None
+            fault = queued.pop(0) if queued else None
+        if server.latency:
+            time.sleep(server.latency)
+        if fault and fault[0] == "status":
+            return self._reply(fault[1], b"error\n", body)
+        if fault and fault[0] == "stall":
+            time.sleep(fault[1])
+
+        file = os.path.join(server.root, path.lstrip("/"))
+        if not os.path.isfile(file):
+            return self._reply(404, b"not found\n", body)
+        with open(file, "rb") as f:
+            data = f.read()
+        etag = '"%s"' % hashlib.sha256(data).hexdigest()[:16]
+        start, end, status = 0, len(data) - 1, 200
+        wanted = self.headers.get("Range")
+        if_range = self.headers.get("If-Range")
+        if wanted and server.ranges and (not if_range or if_range == etag):
+            first, _, last = wanted.removeprefix("bytes=").partition("-")
+            start = int(first)
+            end = min(int(last), len(data) - 1) if last else len(data) - 1
+            if start >= len(data):
+                return self._reply(416, b"", body, {"Content-Range": f"bytes */{len(data)}"})
+            status = 206
+        headers = {"ETag": etag, "Accept-Ranges": "bytes" if server.ranges else "none"}
+        if status == 206:
+            headers["Content-Range"] = f"bytes {start}-{end}/{len(data)}"
+        payload = data[start:end + 1]
+        if fault and fault[0] == "cut":
+            # Promise the whole range, send only part of it, then drop the connection
+            self._reply(status, payload[:fault[1]], body, headers, length=len(payload))
+            self.close_connection = True
+            return
+        self._reply(status, payload, body, headers)
+
+    def _reply(self, status, payload, body, headers=None, length=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(payload) if length is None else length))
+        self.end_headers()
+        if body:
+            self.wfile.write(payload)
+
+
+class _Server(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Stalled replies outlive the client that gave up on them
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+@pytest.fixture
+def make_http_server(tmp_path):
+    """Starts threaded HTTP servers, each serving its own directory under tmp_path. Queue
+    faults per path in server.faults: ("status", 503), ("stall", seconds) or ("cut",
+    bytes sent before hanging up); server.latency delays every reply."""
+    servers = []
+
+    def start(name="www"):
+        root = tmp_path / name
+        root.mkdir()
+        server = _Server(("127.0.0.1", 0), _Handler)
+        server.root = str(root)
+        server.requests, server.faults, server.lock = [], {}, threading.Lock()
+        server.latency, server.ranges = 0, True
+        server.url = f"http://127.0.0.1:{server.server_address[1]}"
+        threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def http_server(make_http_server):
+    """A server for tmp_path/www; see make_http_server."""
+    return make_http_server()
+
+
+def publish(server, rel, data):
+    path = os.path.join(server.root, rel)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data if isinstance(data, bytes) else data.encode())
+    return f"{server.url}/{rel}"
+
+
+@pytest.fixture
+def fast_network(devops, monkeypatch):
+    """Quick retries and early hedging, so fault tests take milliseconds."""
+    monkeypatch.setattr(devops, "NETWORK_POLICY", harness.SANDBOX_NETWORK_POLICY)
+    return devops
+
+
+# Package-manager stand-ins. Every call is logged; dpkg-query answers from the
+# packages apt-get has "installed", and apt-get fails any install naming a
+# package listed in $APT_FAIL.
+_SHIMS = {
+    "sudo": '''echo "sudo $*" >> "$SHIM_LOG"
+if [ "$1" = install ]; then
+    # sudo install -D -o root -g root -m MODE SRC DEST: keep the file, drop the ownership
+    while [ $# -gt 2 ]; do shift; done
+    mkdir -p "$(dirname "$2")" && cp "$1" "$2"
+else
+    exec "$@"
+fi
+''',
+    "apt-get": '''echo "apt-get $*" >> "$SHIM_LOG"
+while [ "$1" = -o ]; do shift 2; done
+command=$1
+shift
+case "$command" in
+install)
+    for pkg in "$@"; do
+        case " $APT_FAIL " in *" $pkg "*) exit 100;; esac
+    done
+    for pkg in "$@"; do
+        case "$pkg" in
+        -*) ;;
+        *.deb) name=$(basename "$pkg"); echo "${name%%_*}" >> "$SHIM_STATE";;
+        *) echo "$pkg" >> "$SHIM_STATE";;
+        esac
+    done;;
+download)
+    for pkg in "$@"; do echo "$pkg" > "${pkg}_1.0_amd64.deb"; done;;
+esac
+''',
+    "apt-cache": '''for pkg in "$@"; do case "$pkg" in -*|depends) ;; *) echo "$pkg";; esac; done
+''',
+    "dpkg-query": '''for pkg in "$@"; do
+    case "$pkg" in -*) continue;; esac
+    grep -qx "$pkg" "$SHIM_STATE" 2>/dev/null && echo "$pkg 1.0 install ok installed"
+done
+exit 0
+''',
+    "dpkg": "echo amd64\n",
+}
+
+
+class Shims:
+    def __init__(self, root):
+        self.dir, self.log_file, self.state_file = root / "bin", root / "calls.log", root / "installed"
+
+    def calls(self, command=None):
+        lines = self.log_file.read_text().splitlines() if self.log_file.exists() else []
+        return [line for line in lines if command is None or line.split()[0] == command]
+
+    def installed(self):
+        return self.state_file.read_text().split() if self.state_file.exists() else []
+
+
+@pytest.fixture
+def apt_shims(devops, tmp_path, monkeypatch):
+    """sudo, apt-get, apt-cache, dpkg-query and dpkg stand-ins first on PATH."""
+    shims = Shims(tmp_path / "shims")
+    shims.dir.mkdir(parents=True)
+    for name, body in _SHIMS.items():
+        write_executable(shims.dir / name, body)
+    monkeypatch.setenv("PATH", f"{shims.dir}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setenv("SHIM_LOG", str(shims.log_file))
+    monkeypatch.setenv("SHIM_STATE", str(shims.state_file))
+    monkeypatch.delenv("APT_FAIL", raising=False)
+    monkeypatch.setattr(devops, "DPKG_STATUS_FILE", str(shims.state_file))
+    devops._dpkg_arch.cache_clear()
+    yield shims
+    devops._dpkg_arch.cache_clear()
+
+
+@pytest.fixture
+def releases(fast_network, http_server, monkeypatch):
+    """Every RELEASE_ASSETS tool published on the local server, as the benchmark lays them out."""
+    devops = fast_network
+    harness.release_fixtures(http_server.root)
+    monkeypatch.setattr(devops, "SOURCE_ENDPOINTS", {name: [http_server.url] for name in devops.SOURCE_ENDPOINTS})
+    monkeypatch.setattr(devops, "INTERNET_PROBES", [("127.0.0.1", http_server.server_address[1])])
+    return devops
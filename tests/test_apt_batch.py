@@ -0,0 +1,126 @@
+import pytest
+
+from conftest import publish
+
+
+@pytest.fixture
+def apt_repos(devops, apt_shims, fast_network, http_server, tmp_path, monkeypatch):
+    """terraform and gh with their keys on the local server and their repo files under tmp_path."""
+    keys, repos = {}, {}
+    for app in ("terraform", "gh"):
+        keys[app] = publish(http_server, f"keys/{app}", f"{app} key\n")
+        repos[app] = {**devops.APT_REPOS[app],
+                      "keyring": str(tmp_path / "keyrings" / f"{app}.gpg"),
+                      "sources": str(tmp_path / "sources.list.d" / f"{app}.list")}
+    monkeypatch.setattr(devops, "APT_REPO_KEYS", keys)
+    monkeypatch.setattr(devops, "APT_REPOS", repos)
+    # terraform's prerequisite is already there, so only the tools themselves get installed
+    apt_shims.state_file.write_text("gpg\n")
+    return repos
+
+
+def apt_commands(shims, command):
+    return [call for call in shims.calls("apt-get") if f" {command}" in call]
+
+
+def test_one_refresh_and_one_transaction_for_every_tool(devops, apt_repos, apt_shims):
+    results = devops.install_apt_apps(["terraform", "gh", "ansible"])
+
+    assert results == {"terraform": True, "gh": True, "ansible": True}
+    assert len(apt_commands(apt_shims, "update")) == 1
+    installs = apt_commands(apt_shims, "install")
+    assert len(installs) == 1
+    assert installs[0].endswith("install -y terraform gh ansible")
+    for repo in apt_repos.values():
+        assert open(repo["sources"]).read().startswith("deb [")
+
+
+def test_converged_tools_run_no_apt_at_all(devops, apt_repos, apt_shims):
+    devops.install_apt_apps(["terraform", "gh", "ansible"])
+    before = len(apt_shims.calls())
+
+    results = devops.install_apt_apps(["terraform", "gh", "ansible"])
+
+    assert results == {"terraform": True, "gh": True, "ansible": True}
+    new_calls = apt_shims.calls()[before:]
+    assert not [call for call in new_calls if call.startswith(("apt-get", "sudo"))]
+
+
+def test_only_missing_packages_are_installed(devops, apt_repos, apt_shims):
+    devops.install_apt_apps(["gh"])
+    before = len(apt_shims.calls("apt-get"))
+
+    devops.install_apt_apps(["terraform", "gh"])
+
+    installs = [call for call in apt_shims.calls("apt-get")[before:] if " install" in call]
+    assert installs and installs[0].endswith("install -y terraform")
+
+
+def test_failed_batch_falls_back_to_per_tool_outcomes(devops, apt_repos, apt_shims, monkeypatch, capsys):
+    monkeypatch.setenv("APT_FAIL", "gh")
+
+    results = devops.install_apt_apps(["terraform", "gh", "ansible"])
+
+    assert results == {"terraform": True, "gh": False, "ansible": True}
+    assert len(apt_commands(apt_shims, "update")) == 1
+    assert sorted(apt_shims.installed()) == ["ansible", "gpg", "terraform"]
+    out = capsys.readouterr().out
+    assert "Retrying tool by tool" in out
+    assert "❌ Failed to install gh" in out
+
+
+def test_broken_repo_setup_fails_only_that_tool(devops, apt_repos, apt_shims, http_server):
+    import os
+
+    os.remove(os.path.join(http_server.root, "keys", "gh"))
+
+    results = devops.install_apt_apps(["terraform", "gh"])
+
+    assert results == {"terraform": True, "gh": False}
+    assert apt_shims.installed() == ["gpg", "terraform"]
+
+
+@pytest.fixture
+def online(devops, http_server, monkeypatch):
+    monkeypatch.setattr(devops, "INTERNET_PROBES", [("127.0.0.1", http_server.server_address[1])])
+
+
+def test_second_converge_runs_no_subprocess(devops, apt_repos, apt_shims, online, monkeypatch, capsys):
+    status = devops.install_apps(["terraform", "gh", "ansible"])
+    assert status == {"apt": "ok"}
+
+    def no_subprocess(*args, **kwargs):
+        raise AssertionError(f"unexpected subprocess: {args[0]}")
+
+    monkeypatch.setattr(devops.subprocess, "Popen", no_subprocess)
+    devops._converge_state = None
+    assert devops.install_apps(["terraform", "gh", "ansible"]) == {}
+    assert "Everything selected is already converged" in capsys.readouterr().out
+
+
+def test_dpkg_change_is_rechecked_without_downloading(devops, apt_repos, apt_shims, online, http_server,
+                                                      monkeypatch):
+    devops.install_apps(["terraform", "gh"])
+    # Some other package changes the dpkg database; the cached keys are enough to re-plan
+    with open(apt_shims.state_file, "a") as f:
+        f.write("unrelated\n")
+    requests = len(http_server.requests)
+    planned = []
+    plan_apt = devops.plan_apt
+    monkeypatch.setattr(devops, "plan_apt", lambda apps: planned.append(apps) or plan_apt(apps))
+
+    rows = devops.converge_plan(["terraform", "gh"])
+
+    assert [row["run"] for row in rows] == [False, False]
+    assert planned == [["terraform", "gh"]]
+    assert len(http_server.requests) == requests
+
+
+def test_dry_run_never_downloads_keys(devops, apt_repos, apt_shims, http_server, capsys):
+    devops.install_apps(["gh"], dry_run=True)
+
+    assert http_server.requests == []
+    assert not apt_shims.calls("apt-get") and not apt_shims.calls("sudo")
+    out = capsys.readouterr().out
+    assert f"write {apt_repos['gh']['keyring']}" in out
+    assert "install gh" in out
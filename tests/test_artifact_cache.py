@@ -0,0 +1,99 @@
+import hashlib
+import json
+import os
+
+import pytest
+
+from conftest import publish
+
+
+def gets(server, rel):
+    return [request for request in server.requests if request[:2] == ("GET", f"/{rel}")]
+
+
+def index(devops):
+    with open(os.path.join(devops.ARTIFACT_DIR, "index.json")) as f:
+        return json.load(f)
+
+
+def test_pinned_artifact_is_downloaded_once(devops, http_server):
+    data = b"kubectl binary\n"
+    url = publish(http_server, "bin/kubectl", data)
+    sha256 = hashlib.sha256(data).hexdigest()
+
+    first = devops.fetch_artifact(url, sha256=sha256)
+    second = devops.fetch_artifact(url, sha256=sha256)
+
+    assert first == second == devops._blob_path(sha256)
+    assert open(first, "rb").read() == data
+    assert len(gets(http_server, "bin/kubectl")) == 1
+
+
+def test_checksum_mismatch_caches_nothing(devops, http_server):
+    url = publish(http_server, "bin/kubectl", b"tampered\n")
+
+    with pytest.raises(OSError, match="sha256 mismatch"):
+        devops.fetch_artifact(url, sha256="0" * 64)
+
+    assert index(devops) == {}
+    assert os.listdir(os.path.join(devops.ARTIFACT_DIR, "objects")) == []
+
+
+def test_corrupted_blob_is_fetched_again(devops, http_server):
+    data = b"helm archive\n"
+    url = publish(http_server, "helm.tgz", data)
+    sha256 = hashlib.sha256(data).hexdigest()
+    path = devops.fetch_artifact(url, sha256=sha256)
+    with open(path, "wb") as f:
+        f.write(b"bit rot\n")
+
+    path = devops.fetch_artifact(url, sha256=sha256)
+
+    assert open(path, "rb").read() == data
+    assert len(gets(http_server, "helm.tgz")) == 2
+
+
+def test_unpinned_artifact_expires(devops, http_server):
+    url = publish(http_server, "stable.txt", "v1.30.0\n")
+    devops.fetch_artifact(url)
+    devops.fetch_artifact(url)
+    assert len(gets(http_server, "stable.txt")) == 1
+
+    publish(http_server, "stable.txt", "v1.31.0\n")
+    path = devops.fetch_artifact(url, max_age=0)
+
+    assert open(path).read() == "v1.31.0\n"
+    assert len(gets(http_server, "stable.txt")) == 2
+
+
+def test_same_content_under_two_urls_is_stored_once(devops, http_server):
+    a = publish(http_server, "a/key.gpg", b"same key\n")
+    b = publish(http_server, "b/key.gpg", b"same key\n")
+
+    assert devops.fetch_artifact(a) == devops.fetch_artifact(b)
+    assert len(os.listdir(os.path.join(devops.ARTIFACT_DIR, "objects"))) == 1
+    assert set(index(devops)) == {a, b}
+
+
+def test_least_recently_used_blob_is_evicted(devops, http_server, monkeypatch):
+    monkeypatch.setattr(devops, "ARTIFACT_CACHE_MAX_BYTES", 2500)
+    urls = {name: publish(http_server, name, name.encode() * 1000) for name in "abc"}
+    devops.fetch_artifact(urls["a"])
+    devops.fetch_artifact(urls["b"])
+    devops.fetch_artifact(urls["a"])  # a is now the more recently used one
+
+    devops.fetch_artifact(urls["c"])
+
+    assert set(index(devops)) == {urls["a"], urls["c"]}
+    assert not os.path.exists(devops._blob_path(hashlib.sha256(b"b" * 1000).hexdigest()))
+    assert len(gets(http_server, "a")) == 1
+
+
+def test_cached_artifact_needs_no_server(devops, http_server):
+    data = b"minikube\n"
+    url = publish(http_server, "minikube", data)
+    sha256 = hashlib.sha256(data).hexdigest()
+    devops.fetch_artifact(url, sha256=sha256)
+    os.remove(os.path.join(http_server.root, "minikube"))
+
+    assert open(devops.fetch_artifact(url, sha256=sha256), "rb").read() == data
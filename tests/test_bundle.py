@@ -0,0 +1,115 @@
+import io
+import json
+import os
+import shutil
+import tarfile
+
+import pytest
+
+from conftest import publish
+
+
+@pytest.fixture
+def catalog(releases, apt_shims, http_server, tmp_path, monkeypatch):
+    """helm and kubectl from the fake release server; terraform (with its repo files
+    under tmp_path) and ansible from the apt shims."""
+    devops = releases
+    key_url = publish(http_server, "keys/terraform", "terraform key\n")
+    repo = {**devops.APT_REPOS["terraform"],
+            "keyring": str(tmp_path / "etc" / "terraform.gpg"),
+            "sources": str(tmp_path / "etc" / "terraform.list")}
+    monkeypatch.setattr(devops, "APT_REPO_KEYS", {"terraform": key_url})
+    monkeypatch.setattr(devops, "APT_REPOS", {"terraform": repo})
+    return devops
+
+
+@pytest.fixture
+def bundle(catalog, apt_shims, http_server, tmp_path):
+    """A bundle built online, after which the server goes away and the host is reset."""
+    path = catalog.build_bundle(["helm", "kubectl", "terraform", "ansible"], output=str(tmp_path / "bundle.tar.gz"))
+    http_server.shutdown()
+    http_server.server_close()
+    for name in ("etc", "prefix"):
+        shutil.rmtree(tmp_path / name, ignore_errors=True)
+    apt_shims.state_file.write_text("")
+    apt_shims.log_file.write_text("")
+    return path
+
+
+def manifest(path):
+    with tarfile.open(path) as tar:
+        return json.load(tar.extractfile("./manifest.json"))
+
+
+def test_bundle_records_every_tool_and_file(catalog, bundle):
+    contents = manifest(bundle)
+
+    assert contents["format"] == catalog.BUNDLE_FORMAT
+    assert {app: tool["kind"] for app, tool in contents["tools"].items()} == \
+        {"helm": "release", "kubectl": "release", "terraform": "apt", "ansible": "apt"}
+    assert "manifest.json" not in contents["files"]
+    assert any(rel.endswith("terraform_1.0_amd64.deb") for rel in contents["files"])
+
+
+def test_bundle_build_refreshes_apt_through_the_network_policy(catalog, apt_shims, tmp_path):
+    catalog.build_bundle(["ansible"], output=str(tmp_path / "apt.tar.gz"))
+
+    update = next(call for call in apt_shims.calls("apt-get") if call.endswith(" update"))
+    assert "Acquire::http::Timeout=" in update
+
+
+def test_round_trip_installs_offline(catalog, bundle, apt_shims, tmp_path):
+    results = catalog.install_from_bundle(bundle)
+
+    assert results == {"helm": True, "kubectl": True, "terraform": True, "ansible": True}
+    for app in ("helm", "kubectl"):
+        assert os.access(tmp_path / "prefix" / "bin" / app, os.X_OK)
+    with open(catalog.RELEASE_LOCK_FILE) as f:
+        assert set(json.load(f)["tools"]) >= {"helm", "kubectl"}
+    assert (tmp_path / "etc" / "terraform.list").read_text().startswith("deb [")
+    assert sorted(apt_shims.installed()) == ["ansible", "terraform"]
+    assert all("--no-download" in call for call in apt_shims.calls("apt-get"))
+
+
+def test_packages_already_present_are_left_alone(catalog, bundle, apt_shims):
+    apt_shims.state_file.write_text("ansible\n")
+
+    catalog.install_from_bundle(bundle, apps=["ansible", "terraform"])
+
+    install = apt_shims.calls("apt-get")[-1]
+    assert "terraform_1.0_amd64.deb" in install and "ansible" not in install
+
+
+def test_selected_tools_only(catalog, bundle, tmp_path):
+    results = catalog.install_from_bundle(bundle, apps=["helm", "glab"])
+
+    assert results == {"glab": False, "helm": True}
+    assert not (tmp_path / "prefix" / "bin" / "kubectl").exists()
+
+
+def test_corrupt_bundle_installs_nothing(catalog, bundle, tmp_path, capsys):
+    tampered = tmp_path / "tampered.tar.gz"
+    with tarfile.open(bundle) as src, tarfile.open(tampered, "w:gz") as dst:
+        for member in src.getmembers():
+            data = src.extractfile(member).read() if member.isfile() else None
+            if member.name.startswith("./release/") and "helm" in member.name:
+                data = b"tampered" + data
+                member.size = len(data)
+            dst.addfile(member, io.BytesIO(data) if data is not None else None)
+
+    assert catalog.install_from_bundle(str(tampered)) == {}
+    assert "missing or corrupt" in capsys.readouterr().out
+    assert not (tmp_path / "prefix").exists()
+
+
+def test_format_1_bundle_is_refused(catalog, tmp_path, capsys):
+    old = tmp_path / "old"
+    (old / "bin").mkdir(parents=True)
+    (old / "bin" / "kubectl").write_bytes(b"kubectl binary\n")
+    (old / "manifest.json").write_text(json.dumps({
+        "format": 1, "tools": {"kubectl": {"kind": "binary", "file": "bin/kubectl"}}, "files": {}}))
+    with tarfile.open(tmp_path / "old.tar.gz", "w:gz") as tar:
+        tar.add(old, arcname=".")
+
+    assert catalog.install_from_bundle(str(tmp_path / "old.tar.gz")) == {}
+    assert "Unsupported bundle format 1" in capsys.readouterr().out
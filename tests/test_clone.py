@@ -0,0 +1,77 @@
+import os
+
+import pytest
+
+from conftest import commit, git
+
+
+@pytest.fixture
+def remote(tmp_path, git_env):
+    """A bare remote with three commits touching docs/, src/ and the top level."""
+    remote = tmp_path / "project.git"
+    git(tmp_path, "init", "--quiet", "--bare", str(remote))
+    git(remote, "config", "uploadpack.allowFilter", "true")
+    seed = tmp_path / "seed"
+    git(tmp_path, "clone", "--quiet", str(remote), str(seed))
+    (seed / "docs").mkdir()
+    (seed / "src").mkdir()
+    commit(seed, "README")
+    commit(seed, "docs/guide.md")
+    commit(seed, "src/main.py")
+    git(seed, "push", "--quiet", "origin", "HEAD:main")
+    return remote
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    path = tmp_path / "work"
+    path.mkdir()
+    monkeypatch.chdir(path)
+    return path
+
+
+def test_full_clone_names_the_checkout_after_the_repo(devops, remote, workdir):
+    dest = devops.clone_repo(str(remote))
+
+    assert dest == "project"
+    assert git(workdir / dest, "rev-list", "--count", "HEAD") == "3"
+
+
+def test_shallow_clone_of_a_local_path_really_is_shallow(devops, remote, workdir):
+    dest = devops.clone_repo(str(remote), depth=1)
+
+    assert git(workdir / dest, "rev-list", "--count", "HEAD") == "1"
+    assert git(workdir / dest, "rev-parse", "--is-shallow-repository") == "true"
+
+
+@pytest.mark.parametrize("kind, spec", [("b", "blob:none"), ("t", "tree:0")])
+def test_partial_clone_records_its_filter(devops, remote, workdir, kind, spec):
+    dest = devops.clone_repo(str(remote), filter_spec=devops.CLONE_FILTERS[kind])
+
+    assert git(workdir / dest, "config", "remote.origin.partialclonefilter") == spec
+    assert (workdir / dest / "src" / "main.py").exists()
+
+
+def test_sparse_clone_checks_out_only_the_cone(devops, remote, workdir):
+    dest = workdir / devops.clone_repo(str(remote), dest="sparse", sparse=["docs"])
+
+    assert sorted(os.listdir(dest)) == [".git", "README", "docs"]
+    assert git(dest, "sparse-checkout", "list") == "docs"
+
+
+def test_mirror_reference_is_created_then_refreshed_and_dissociated(devops, remote, workdir, tmp_path):
+    first = workdir / devops.clone_repo(str(remote), dest="first", use_mirror=True)
+    mirrors = [name for name in os.listdir(devops.MIRROR_DIR) if name.endswith(".git")]
+    assert len(mirrors) == 1
+    mirror = os.path.join(devops.MIRROR_DIR, mirrors[0])
+
+    seed = tmp_path / "seed"
+    head = commit(seed, "CHANGELOG")
+    git(seed, "push", "--quiet", "origin", "HEAD:main")
+    second = workdir / devops.clone_repo(str(remote), dest="second", use_mirror=True)
+
+    assert git(mirror, "rev-parse", "main") == head
+    assert git(second, "rev-parse", "HEAD") == head
+    # --dissociate: neither clone depends on the mirror once it exists
+    for clone in (first, second):
+        assert not (clone / ".git" / "objects" / "info" / "alternates").exists()
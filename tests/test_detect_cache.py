@@ -0,0 +1,131 @@
+import os
+
+import pytest
+
+
+@pytest.fixture
+def bin_dir(devops, tmp_path, monkeypatch):
+    """The only directory on PATH, with nvm looked up under tmp_path/nvm."""
+    path = tmp_path / "bin"
+    path.mkdir()
+    monkeypatch.setenv("PATH", str(path))
+    monkeypatch.setenv("NVM_DIR", str(tmp_path / "nvm"))
+    monkeypatch.setattr(devops, "NVM_PATHS", [])
+    return path
+
+
+@pytest.fixture
+def probes(devops, monkeypatch):
+    """Every tool _probe_installed() is actually asked about."""
+    seen = []
+    real_probe = devops._probe_installed
+    monkeypatch.setattr(devops, "_probe_installed", lambda app: seen.append(app) or real_probe(app))
+    return seen
+
+
+def executable(path, body="#!/bin/sh\n"):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        f.write(body)
+    os.chmod(tmp, 0o755)
+    os.replace(tmp, path)
+
+
+def test_unchanged_fingerprint_answers_from_cache(devops, bin_dir, probes):
+    executable(bin_dir / "helm")
+
+    assert devops.is_installed("helm") is True
+    assert devops.is_installed("helm") is True
+    assert probes == ["helm"]
+
+
+def test_answers_survive_a_restart(devops, bin_dir, probes, monkeypatch):
+    executable(bin_dir / "helm")
+    devops.is_installed("helm")
+    monkeypatch.setattr(devops, "_detect_cache", None)
+
+    assert devops.is_installed("helm") is True
+    assert probes == ["helm"]
+
+
+def test_new_binary_on_path_is_noticed(devops, bin_dir, probes):
+    assert devops.is_installed("helm") is False
+    executable(bin_dir / "helm")
+
+    assert devops.is_installed("helm") is True
+    assert probes == ["helm", "helm"]
+
+
+def test_removed_binary_is_noticed(devops, bin_dir):
+    executable(bin_dir / "helm")
+    assert devops.is_installed("helm") is True
+    os.remove(bin_dir / "helm")
+
+    assert devops.is_installed("helm") is False
+
+
+def test_replaced_binary_is_reprobed(devops, bin_dir, probes):
+    executable(bin_dir / "helm")
+    devops.is_installed("helm")
+    executable(bin_dir / "helm", "#!/bin/sh\necho v2\n")
+
+    devops.is_installed("helm")
+    assert probes == ["helm", "helm"]
+
+
+def test_path_change_is_reprobed(devops, bin_dir, tmp_path, monkeypatch):
+    devops.is_installed("helm")
+    other = tmp_path / "other"
+    other.mkdir()
+    executable(other / "helm")
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{other}")
+
+    assert devops.is_installed("helm") is True
+
+
+def test_nvm_default_alias_change_is_noticed(devops, bin_dir, tmp_path):
+    nvm = tmp_path / "nvm"
+    (nvm / "alias").mkdir(parents=True)
+    assert devops.is_installed("node") is False
+
+    node = nvm / "versions" / "node" / "v22.3.0" / "bin"
+    node.mkdir(parents=True)
+    executable(node / "node")
+    (nvm / "alias" / "default").write_text("22\n")
+
+    assert devops.is_installed("node") is True
+
+
+def test_invalidate_forces_a_probe(devops, bin_dir, probes):
+    executable(bin_dir / "helm")
+    devops.is_installed("helm")
+    devops.invalidate_detect_cache("helm")
+
+    devops.is_installed("helm")
+    assert probes == ["helm", "helm"]
+
+
+def test_cache_can_be_disabled(devops, bin_dir, probes, monkeypatch):
+    monkeypatch.setattr(devops, "USE_DETECT_CACHE", False)
+    devops.is_installed("helm")
+    devops.is_installed("helm")
+
+    assert probes == ["helm", "helm"]
+    assert not os.path.exists(devops.DETECT_CACHE_FILE)
+
+
+def test_inventory_is_published_under_the_lock(devops, bin_dir):
+    import threading
+
+    (bin_dir / "kubectl").write_text("#!/bin/sh\n")
+    (bin_dir / "kubectl").chmod(0o755)
+    done = threading.Event()
+    with devops._inventory_lock:
+        worker = threading.Thread(target=lambda: (devops.detect_inventory(), done.set()))
+        worker.start()
+        assert not done.wait(0.2)
+    worker.join(5)
+
+    assert done.is_set()
+    installed = {app for entries in devops.detect_inventory().values() for app, ok in entries if ok}
+    assert installed == {"kubectl"}
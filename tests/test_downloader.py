@@ -0,0 +1,165 @@
+import hashlib
+import json
+import os
+
+import pytest
+
+from conftest import publish
+
+SIZE = 10_000
+
+
+@pytest.fixture
+def payload():
+    return bytes(range(256)) * (SIZE // 256) + b"tail" * ((SIZE % 256) // 4)
+
+
+@pytest.fixture
+def small_chunks(fast_network, monkeypatch):
+    """1000-byte ranges, downloaded one after another unless a test lowers the threshold."""
+    monkeypatch.setattr(fast_network, "DOWNLOAD_CHUNK_SIZE", 1000)
+    monkeypatch.setattr(fast_network, "DOWNLOAD_PARALLEL_THRESHOLD", 10 ** 9)
+    return fast_network
+
+
+@pytest.fixture
+def connections(devops, monkeypatch):
+    opened = []
+    real_open = devops._open_connection
+    monkeypatch.setattr(devops, "_open_connection", lambda parts: opened.append(parts) or real_open(parts))
+    return opened
+
+
+def ranges(server):
+    return [request[2] for request in server.requests if request[0] == "GET"]
+
+
+def interrupt_after_first_range(devops, server, monkeypatch):
+    """The second range stalls past the read timeout, and so does the fresh-connection
+    resend of it, and nothing is retried: the download fails with one range on disk."""
+    policy = devops.NETWORK_POLICY
+    monkeypatch.setattr(devops, "NETWORK_POLICY", {
+        **policy, "default": {**policy["default"], "retries": 0, "read_timeout": 0.2}})
+    server.faults["/minikube"] = [("stall", 0), ("stall", 0.6), ("stall", 0.6)]
+
+
+def test_sha256_is_computed_while_streaming(devops, http_server, payload, tmp_path):
+    url = publish(http_server, "minikube", payload)
+
+    actual, size = devops.download(url, str(tmp_path / "minikube"), sha256=hashlib.sha256(payload).hexdigest())
+
+    assert (actual, size) == (hashlib.sha256(payload).hexdigest(), SIZE)
+    assert (tmp_path / "minikube").read_bytes() == payload
+    assert not (tmp_path / "minikube.json").exists()
+
+
+def test_checksum_mismatch_removes_the_file(devops, http_server, payload, tmp_path):
+    url = publish(http_server, "minikube", payload)
+
+    with pytest.raises(OSError, match="sha256 mismatch"):
+        devops.download(url, str(tmp_path / "minikube"), sha256="0" * 64)
+
+    assert os.listdir(tmp_path) == ["www"]
+
+
+def test_sequential_ranges_share_one_connection(small_chunks, http_server, payload, tmp_path, connections):
+    url = publish(http_server, "minikube", payload)
+
+    small_chunks.download(url, str(tmp_path / "minikube"))
+
+    assert ranges(http_server) == [f"bytes={start}-{start + 999}" for start in range(0, SIZE, 1000)]
+    assert len(connections) == 1
+
+
+def test_parallel_chunks_are_merged_in_order(small_chunks, http_server, payload, tmp_path, monkeypatch):
+    monkeypatch.setattr(small_chunks, "DOWNLOAD_PARALLEL_THRESHOLD", 2000)
+    url = publish(http_server, "minikube", payload)
+
+    actual, size = small_chunks.download(url, str(tmp_path / "minikube"))
+
+    assert (tmp_path / "minikube").read_bytes() == payload
+    assert actual == hashlib.sha256(payload).hexdigest()
+    assert sorted(ranges(http_server), key=lambda r: int(r[6:].split("-")[0])) == \
+        [f"bytes={start}-{start + 999}" for start in range(0, SIZE, 1000)]
+
+
+def test_cut_chunk_resumes_within_its_range(small_chunks, http_server, payload, tmp_path, monkeypatch):
+    monkeypatch.setattr(small_chunks, "DOWNLOAD_PARALLEL_THRESHOLD", 2000)
+    url = publish(http_server, "minikube", payload)
+    # The first range arrives whole; one of the parallel chunks is cut after 300 bytes
+    http_server.faults["/minikube"] = [("stall", 0), ("cut", 300)]
+
+    actual, _ = small_chunks.download(url, str(tmp_path / "minikube"))
+
+    assert actual == hashlib.sha256(payload).hexdigest()
+    resumed = [r for r in ranges(http_server) if int(r[6:].split("-")[0]) % 1000 == 300]
+    assert len(resumed) == 1
+
+
+def test_dropped_range_continues_at_the_received_offset(small_chunks, http_server, payload, tmp_path, monkeypatch):
+    monkeypatch.setattr(small_chunks, "DOWNLOAD_CHUNK_SIZE", 4000)
+    url = publish(http_server, "minikube", payload)
+    http_server.faults["/minikube"] = [("cut", 1500)]
+
+    actual, _ = small_chunks.download(url, str(tmp_path / "minikube"))
+
+    assert actual == hashlib.sha256(payload).hexdigest()
+    assert ranges(http_server)[:2] == ["bytes=0-3999", "bytes=1500-5499"]
+
+
+def test_interrupted_run_resumes_next_time(small_chunks, http_server, payload, tmp_path, monkeypatch):
+    url = publish(http_server, "minikube", payload)
+    dest = str(tmp_path / "minikube")
+    interrupt_after_first_range(small_chunks, http_server, monkeypatch)
+    with pytest.raises(OSError):
+        small_chunks.download(url, dest)
+    assert os.path.getsize(dest) == 1000
+    assert json.load(open(f"{dest}.json"))["url"] == url
+    http_server.requests.clear()
+
+    actual, _ = small_chunks.download(url, dest)
+
+    assert actual == hashlib.sha256(payload).hexdigest()
+    assert http_server.requests[0][2] == "bytes=1000-1999"
+
+
+def test_changed_file_restarts_from_zero(small_chunks, http_server, payload, tmp_path, monkeypatch):
+    url = publish(http_server, "minikube", payload)
+    dest = str(tmp_path / "minikube")
+    interrupt_after_first_range(small_chunks, http_server, monkeypatch)
+    with pytest.raises(OSError):
+        small_chunks.download(url, dest)
+    changed = payload[::-1]
+    publish(http_server, "minikube", changed)
+
+    actual, size = small_chunks.download(url, dest)
+
+    # If-Range no longer matches, so the server sends the whole new file
+    assert (actual, size) == (hashlib.sha256(changed).hexdigest(), SIZE)
+    assert open(dest, "rb").read() == changed
+
+
+def test_server_without_ranges_sends_everything(small_chunks, http_server, payload, tmp_path):
+    http_server.ranges = False
+    url = publish(http_server, "minikube", payload)
+
+    actual, size = small_chunks.download(url, str(tmp_path / "minikube"))
+
+    assert (actual, size) == (hashlib.sha256(payload).hexdigest(), SIZE)
+    assert len(ranges(http_server)) == 1
+
+
+def test_empty_file(devops, http_server, tmp_path):
+    url = publish(http_server, "empty", b"")
+
+    assert devops.download(url, str(tmp_path / "empty")) == (hashlib.sha256(b"").hexdigest(), 0)
+
+
+def test_cut_full_body_is_not_taken_for_the_whole_file(small_chunks, http_server, payload, tmp_path):
+    http_server.ranges = False
+    url = publish(http_server, "minikube", payload)
+    http_server.faults["/minikube"] = [("cut", 500)]
+
+    actual, size = small_chunks.download(url, str(tmp_path / "minikube"))
+
+    assert (actual, size) == (hashlib.sha256(payload).hexdigest(), SIZE)
@@ -0,0 +1,132 @@
+import json
+import os
+import socket
+import time
+
+import pytest
+
+
+@pytest.fixture
+def closed_url():
+    """A localhost URL nothing listens on."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    return f"http://127.0.0.1:{port}"
+
+
+@pytest.fixture
+def mirrors(make_http_server):
+    """Three mirrors answering after 0.25s, 0.1s and at once."""
+    servers = []
+    for name, latency in (("slow", 0.25), ("medium", 0.1), ("fast", 0)):
+        server = make_http_server(name)
+        server.latency = latency
+        servers.append(server)
+    return servers
+
+
+def heads(server):
+    return [request for request in server.requests if request[0] == "HEAD"]
+
+
+def test_ranks_fastest_first(devops, mirrors):
+    slow, medium, fast = mirrors
+
+    ranked = devops.rank_endpoints([slow.url, medium.url, fast.url])
+
+    assert [url for url, _ in ranked] == [fast.url, medium.url, slow.url]
+    assert ranked[2][1] >= 0.25
+
+
+def test_probes_run_concurrently(devops, make_http_server):
+    servers = [make_http_server(f"m{n}") for n in range(4)]
+    for server in servers:
+        server.latency = 0.3
+
+    started = time.monotonic()
+    devops.rank_endpoints([server.url for server in servers])
+
+    assert time.monotonic() - started < 0.9
+
+
+def test_unreachable_endpoint_is_left_out(devops, mirrors, closed_url):
+    _, _, fast = mirrors
+
+    assert [url for url, _ in devops.rank_endpoints([closed_url, fast.url])] == [fast.url]
+
+
+def test_latencies_are_cached_across_runs(devops, mirrors, monkeypatch):
+    urls = [server.url for server in mirrors]
+    first = devops.rank_endpoints(urls)
+    monkeypatch.setattr(devops, "_connectivity_cache", None)
+
+    assert devops.rank_endpoints(urls) == first
+    assert all(len(heads(server)) == 1 for server in mirrors)
+
+
+def test_failures_expire_sooner_than_successes(devops, mirrors, closed_url, monkeypatch):
+    _, _, fast = mirrors
+    devops.rank_endpoints([closed_url, fast.url])
+    monkeypatch.setattr(devops, "CONNECTIVITY_NEGATIVE_TTL", 0)
+    probed = []
+    monkeypatch.setattr(devops, "_head_probe", lambda url, timeout: probed.append(url) or 0.0)
+
+    devops.rank_endpoints([closed_url, fast.url])
+
+    assert probed == [closed_url]
+
+
+def test_cache_file_is_replaced_whole(devops, mirrors):
+    devops.rank_endpoints([server.url for server in mirrors])
+
+    cache_dir = os.path.dirname(devops.CONNECTIVITY_CACHE_FILE)
+    assert os.listdir(cache_dir) == ["connectivity.json"]
+    with open(devops.CONNECTIVITY_CACHE_FILE) as f:
+        assert set(json.load(f)) == {server.url for server in mirrors}
+
+
+def test_select_source_prefers_the_fastest_mirror(devops, mirrors, monkeypatch):
+    slow, medium, fast = mirrors
+    monkeypatch.setitem(devops.SOURCE_ENDPOINTS, "helm", [slow.url, medium.url, fast.url])
+
+    assert devops.select_source("helm") == fast.url
+
+
+def test_select_source_falls_back_to_the_first_endpoint(devops, closed_url, monkeypatch):
+    monkeypatch.setitem(devops.SOURCE_ENDPOINTS, "helm", [closed_url, closed_url + "/other"])
+
+    assert devops.select_source("helm") == closed_url
+
+
+def test_extra_endpoints_are_tried_first(devops, mirrors, tmp_path, monkeypatch):
+    slow, medium, fast = mirrors
+    extra = tmp_path / "endpoints.json"
+    extra.write_text(json.dumps({"helm": [fast.url]}))
+    monkeypatch.setenv("DEVOPS_ENDPOINTS", str(extra))
+    monkeypatch.setitem(devops.SOURCE_ENDPOINTS, "helm", [slow.url, fast.url])
+
+    assert devops.source_endpoints("helm") == [fast.url, slow.url]
+
+
+def test_has_internet_with_one_reachable_probe(devops, mirrors, closed_url, monkeypatch):
+    port = int(mirrors[2].url.rsplit(":", 1)[1])
+    closed_port = int(closed_url.rsplit(":", 1)[1])
+    monkeypatch.setattr(devops, "INTERNET_PROBES", [("127.0.0.1", closed_port), ("127.0.0.1", port)])
+
+    assert devops.has_internet() is True
+
+
+def test_offline_result_is_rechecked_soon(devops, closed_url, mirrors, monkeypatch):
+    closed_port = int(closed_url.rsplit(":", 1)[1])
+    monkeypatch.setattr(devops, "INTERNET_PROBES", [("127.0.0.1", closed_port)])
+    assert devops.has_internet() is False
+    assert devops.has_internet() is False  # within the negative TTL
+
+    monkeypatch.setattr(devops, "CONNECTIVITY_NEGATIVE_TTL", 0)
+    monkeypatch.setattr(devops, "INTERNET_PROBES", [("127.0.0.1", int(mirrors[2].url.rsplit(":", 1)[1]))])
+    assert devops.has_internet() is True
+
+    # A positive answer is kept for the full TTL
+    monkeypatch.setattr(devops, "INTERNET_PROBES", [("127.0.0.1", closed_port)])
+    assert devops.has_internet() is True
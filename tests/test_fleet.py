@@ -0,0 +1,83 @@
+import json
+import os
+import time
+
+import pytest
+
+from conftest import write_executable
+
+
+@pytest.fixture
+def fleet_host(devops, apt_shims, tmp_path, monkeypatch):
+    """Environment for agents started through local_transport: every catalog tool but
+    ansible on PATH, the package-manager shims behind them and caches under tmp_path."""
+    tools = tmp_path / "tools"
+    tools.mkdir()
+    for apps in devops.APP_CATEGORIES.values():
+        for app in apps:
+            if app != "ansible":
+                write_executable(tools / app, f'echo "{app} version 1.0.0"\n')
+    monkeypatch.setenv("PATH", os.pathsep.join([str(tools), str(apt_shims.dir), "/usr/bin", "/bin"]))
+    monkeypatch.setenv("HOME", str(tmp_path / "home"))
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "agent-cache"))
+    monkeypatch.delenv("NVM_DIR", raising=False)
+    # A fresh connectivity answer, so agents never probe the real internet
+    cache = tmp_path / "agent-cache" / "devops-setup"
+    cache.mkdir(parents=True)
+    (cache / "connectivity.json").write_text(json.dumps({"internet": {"at": time.time(), "online": True}}))
+    # Agents log installs relative to their working directory
+    monkeypatch.chdir(tmp_path)
+    # A host whose agent dies before reporting anything
+    monkeypatch.setitem(devops.FLEET_TRANSPORTS, "broken",
+                        lambda host, args, script, timeout: devops.local_transport(
+                            host, args, "raise SystemExit('agent crashed')\n" + script, timeout))
+    return apt_shims
+
+
+def by_host(results):
+    return {result["host"]: result for result in results}
+
+
+def test_detect_plan_reports_every_host(devops, fleet_host):
+    plan = {"action": "detect", "tools": [], "node_version": None, "workers": 2}
+    results = by_host(devops.run_fleet(["local://a", "local://b", "broken://c"], plan, workers=3, timeout=60))
+
+    for host in ("local://a", "local://b"):
+        assert results[host]["status"] == "ok"
+        assert results[host]["error"] is None
+        rows = {row["tool"]: row for row in results[host]["rows"]}
+        assert not rows["ansible"]["installed"]
+        assert rows["kubectl"]["installed"] and rows["kubectl"]["version"] == "1.0.0"
+    assert results["broken://c"]["status"] == "failed"
+    assert results["broken://c"]["error"] == "agent crashed"
+    assert fleet_host.calls("apt-get") == []
+
+
+def test_install_plan_installs_only_what_is_missing(devops, fleet_host, tmp_path, capsys):
+    plan = {"action": "install", "tools": ["ansible", "kubectl"], "node_version": None, "workers": 2}
+    results = by_host(devops.run_fleet(["local://a", "broken://b"], plan, workers=2, timeout=60))
+
+    host = results["local://a"]
+    assert host["status"] == "ok"
+    assert host["before"]["ansible"] is False and host["before"]["kubectl"] is True
+    assert fleet_host.installed() == ["ansible"]
+    assert [call for call in fleet_host.calls("apt-get") if " install " in call][0].endswith("install -y ansible")
+    assert "ansible installed successfully" in (tmp_path / "install_log.txt").read_text()
+    assert results["broken://b"]["status"] == "failed"
+    assert "1/2 hosts succeeded" in capsys.readouterr().out
+
+
+def test_agent_probes_versions_once(devops, monkeypatch, capsys):
+    inventory = {"Tools": [("kubectl", True), ("helm", False)]}
+    calls, installed = [], []
+    monkeypatch.setattr(devops, "detect_inventory", lambda refresh=False: inventory)
+    monkeypatch.setattr(devops, "collect_versions",
+                        lambda: calls.append(1) or [{"tool": "kubectl", "installed": True}])
+    monkeypatch.setattr(devops, "install_apps", lambda apps, workers, node_version: installed.append(apps))
+
+    devops.run_agent_plan({"action": "install", "tools": ["kubectl", "helm"], "workers": 1})
+
+    assert len(calls) == 1
+    assert installed == [["helm"]]
+    report = json.loads(capsys.readouterr().out.split(devops.FLEET_RESULT_MARKER)[1])
+    assert report["before"] == {"kubectl": True, "helm": False}
@@ -0,0 +1,77 @@
+def step(name, run, deps=(), resources=()):
+    return {"name": name, "run": run, "deps": list(deps), "resources": set(resources), "app": None}
+
+
+def test_unexpected_step_error_only_fails_that_step(devops, capsys):
+    ran = []
+
+    def broken():
+        raise ValueError("not a tag")
+
+    steps = [step("broken", broken),
+             step("after-broken", lambda: ran.append("after-broken"), deps=["broken"]),
+             step("independent", lambda: ran.append("independent"))]
+    status, durations = devops.run_install_plan(steps, workers=2)
+
+    assert status == {"broken": "failed", "after-broken": "skipped", "independent": "ok"}
+    assert ran == ["independent"]
+    out = capsys.readouterr().out
+    assert "ValueError: not a tag" in out
+    assert "Install summary" in out
+
+
+def test_dependencies_run_in_order(devops):
+    order = []
+    steps = [step("a", lambda: order.append("a")),
+             step("b", lambda: order.append("b"), deps=["a"]),
+             step("c", lambda: order.append("c"), deps=["b"])]
+    status, _ = devops.run_install_plan(steps, workers=4)
+
+    assert order == ["a", "b", "c"]
+    assert set(status.values()) == {"ok"}
+
+
+def test_resource_limits_hold_across_workers(devops):
+    import threading
+    import time
+
+    lock = threading.Lock()
+    active = {"dpkg": 0, "network": 0}
+    peak = {"dpkg": 0, "network": 0}
+
+    def hold(resource):
+        def run():
+            with lock:
+                active[resource] += 1
+                peak[resource] = max(peak[resource], active[resource])
+            time.sleep(0.05)
+            with lock:
+                active[resource] -= 1
+        return run
+
+    steps = ([step(f"apt-{i}", hold("dpkg"), resources=["dpkg"]) for i in range(3)]
+             + [step(f"fetch-{i}", hold("network"), resources=["network"]) for i in range(3)])
+    status, _ = devops.run_install_plan(steps, workers=6)
+
+    assert set(status.values()) == {"ok"}
+    assert peak["dpkg"] == 1
+    assert peak["network"] == 3
+
+
+def test_critical_path_is_the_slowest_chain_not_the_longest(devops):
+    # Listed out of dependency order on purpose
+    steps = [step("b:place", None, deps=["b:fetch"]),
+             step("a:verify", None, deps=["a:place"]),
+             step("a:place", None, deps=["a:fetch"]),
+             step("a:fetch", None),
+             step("b:fetch", None)]
+    durations = {"a:fetch": 1.0, "a:place": 0.5, "a:verify": 0.5, "b:fetch": 3.0, "b:place": 0.5}
+
+    assert devops.critical_path(steps, durations) == (["b:fetch", "b:place"], 3.5)
+
+
+def test_critical_path_skips_steps_that_never_ran(devops):
+    steps = [step("apt", None), step("kubectl:fetch", None), step("kubectl:place", None, deps=["kubectl:fetch"])]
+
+    assert devops.critical_path(steps, {"apt": 2.0, "kubectl:fetch": 1.0}) == (["apt"], 2.0)
+    assert devops.critical_path(steps, {}) == ([], 0.0)
@@ -0,0 +1,179 @@
+import hashlib
+import time
+
+import pytest
+
+from conftest import publish
+
+
+def gets(server, rel):
+    return [request for request in server.requests if request[:2] == ("GET", f"/{rel}")]
+
+
+def test_missing_file_is_not_retried(fast_network, http_server, tmp_path):
+    url = f"{http_server.url}/nope"
+
+    with pytest.raises(OSError, match="404"):
+        fast_network.download(url, str(tmp_path / "nope"))
+
+    assert len(gets(http_server, "nope")) == 1
+
+
+@pytest.mark.parametrize("status", [408, 429, 503])
+def test_transient_statuses_are_retried(fast_network, http_server, tmp_path, status):
+    url = publish(http_server, "helm.tgz", b"helm\n")
+    http_server.faults["/helm.tgz"] = [("status", status)]
+
+    assert fast_network.download(url, str(tmp_path / "helm.tgz"))[1] == 5
+    assert len(gets(http_server, "helm.tgz")) == 2
+
+
+def policy_with(devops, monkeypatch, **default):
+    policy = devops.NETWORK_POLICY
+    monkeypatch.setattr(devops, "NETWORK_POLICY", {**policy, "default": {**policy["default"], **default}})
+
+
+def test_backoff_doubles_up_to_the_cap_with_jitter(devops):
+    policy = {"backoff": 0.5, "backoff_max": 3}
+    for attempt, ceiling in [(1, 0.5), (2, 1), (3, 2), (4, 3), (10, 3)]:
+        delays = [devops.backoff_delay(policy, attempt) for _ in range(200)]
+        assert ceiling / 2 <= min(delays) and max(delays) <= ceiling
+        assert len(set(delays)) > 1
+
+
+def test_policy_layers_default_host_step_then_file(devops, tmp_path, monkeypatch):
+    monkeypatch.setattr(devops, "NETWORK_POLICY", {
+        "default": {"retries": 4, "read_timeout": 60, "deadline": 1800},
+        "hosts": {"dl.k8s.io": {"read_timeout": 30}},
+        "steps": {"apt-update": {"retries": 3}},
+    })
+    overrides = tmp_path / "policy.json"
+    overrides.write_text('{"default": {"deadline": 60}, "hosts": {"dl.k8s.io": {"retries": 9}}}')
+    monkeypatch.setenv("DEVOPS_NETWORK_POLICY", str(overrides))
+
+    assert devops.network_policy(host="dl.k8s.io") == {"retries": 9, "read_timeout": 30, "deadline": 60}
+    assert devops.network_policy(step="apt-update") == {"retries": 3, "read_timeout": 60, "deadline": 60}
+
+
+def test_failing_command_is_retried_until_it_succeeds(fast_network, tmp_path):
+    counter = tmp_path / "attempts"
+    script = f'echo x >> {counter}; [ $(wc -l < {counter}) -ge 3 ]'
+
+    fast_network.run_network_command(["sh", "-c", script], "apt-update")
+
+    assert len(counter.read_text().split()) == 3
+
+
+def test_retries_are_bounded(fast_network, tmp_path, capsys):
+    counter = tmp_path / "attempts"
+
+    with pytest.raises(fast_network.subprocess.CalledProcessError):
+        fast_network.run_network_command(["sh", "-c", f"echo x >> {counter}; exit 1"], "apt-install")
+
+    # apt-install allows one retry
+    assert len(counter.read_text().split()) == 2
+    assert "retrying in" in capsys.readouterr().out
+
+
+def running(pid):
+    """False once pid has exited, even if nobody has reaped it yet."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().rpartition(")")[2].split()[0] != "Z"
+    except FileNotFoundError:
+        return False
+
+
+def test_stalled_command_is_stopped_with_its_children(devops, tmp_path, monkeypatch):
+    policy_with(devops, monkeypatch, attempt_timeout=0.3, retries=0)
+    pid_file = tmp_path / "child.pid"
+
+    started = time.monotonic()
+    with pytest.raises(devops.subprocess.TimeoutExpired):
+        devops.run_network_command(["sh", "-c", f"sleep 30 & echo $! > {pid_file}; wait"], "test-step")
+
+    assert time.monotonic() - started < 5
+    time.sleep(0.1)
+    assert not running(int(pid_file.read_text()))
+
+
+def test_download_retries_a_stall_past_the_read_timeout(devops, http_server, tmp_path, monkeypatch):
+    policy_with(devops, monkeypatch, read_timeout=0.2, backoff=0.01)
+    url = publish(http_server, "kubectl", b"kubectl\n")
+    http_server.faults["/kubectl"] = [("stall", 0.5)]
+
+    assert devops.download(url, str(tmp_path / "kubectl"))[1] == 8
+    assert len(gets(http_server, "kubectl")) == 2
+
+
+def test_download_gives_up_after_its_retries(devops, http_server, tmp_path, monkeypatch):
+    policy_with(devops, monkeypatch, retries=2, backoff=0.01)
+    url = publish(http_server, "kubectl", b"kubectl\n")
+    http_server.faults["/kubectl"] = [("status", 503)] * 5
+
+    with pytest.raises(OSError, match="after 2 retries"):
+        devops.download(url, str(tmp_path / "kubectl"))
+    assert len(gets(http_server, "kubectl")) == 3
+
+
+@pytest.fixture
+def hedge(fast_network, make_http_server, tmp_path):
+    """The same file on a primary and a mirror, and a place to download it to."""
+    data = b"minikube binary\n" * 100
+    primary, mirror = make_http_server("primary"), make_http_server("mirror")
+    urls = [publish(server, "minikube", data) for server in (primary, mirror)]
+    (tmp_path / "part").mkdir()
+    return {"data": data, "sha256": hashlib.sha256(data).hexdigest(), "servers": (primary, mirror),
+            "urls": urls, "part": str(tmp_path / "part" / "minikube")}
+
+
+def test_healthy_primary_is_not_hedged(fast_network, hedge):
+    primary, mirror = hedge["servers"]
+
+    sha256, _, winner, _ = fast_network._hedged_download(hedge["urls"], hedge["part"], hedge["sha256"])
+
+    assert (sha256, winner) == (hedge["sha256"], hedge["urls"][0])
+    assert not gets(mirror, "minikube")
+
+
+def test_slow_primary_is_raced_after_the_hedge_delay(fast_network, hedge):
+    primary, mirror = hedge["servers"]
+    primary.faults["/minikube"] = [("stall", 2)]
+
+    started = time.monotonic()
+    sha256, _, winner, done_file = fast_network._hedged_download(hedge["urls"], hedge["part"], hedge["sha256"])
+
+    # hedge_after is 0.2s in the test policy
+    assert 0.2 <= time.monotonic() - started < 1.5
+    assert winner == hedge["urls"][1]
+    assert open(done_file, "rb").read() == hedge["data"]
+
+
+def test_failing_primary_hands_over_without_waiting(fast_network, hedge, monkeypatch):
+    primary, mirror = hedge["servers"]
+    primary.faults["/minikube"] = [("status", 404)]
+    policy_with(fast_network, monkeypatch, hedge_after=30)
+
+    started = time.monotonic()
+    _, _, winner, _ = fast_network._hedged_download(hedge["urls"], hedge["part"], hedge["sha256"])
+
+    assert winner == hedge["urls"][1]
+    assert time.monotonic() - started < 1
+
+
+def test_hedge_delay_follows_observed_latency(fast_network, monkeypatch):
+    url = "http://mirror.example:8080/file"
+    assert fast_network.hedge_delay(url) == 0.2  # too few samples: hedge_after
+    for seconds in [0.01 * n for n in range(1, 21)]:
+        fast_network.record_latency("mirror.example:8080", seconds)
+
+    # 95th percentile of 0.01..0.20
+    assert fast_network.hedge_delay(url) == pytest.approx(0.20)
+
+
+def test_every_source_failing_raises(fast_network, hedge):
+    for server in hedge["servers"]:
+        server.faults["/minikube"] = [("status", 404)]
+
+    with pytest.raises(OSError, match="404"):
+        fast_network._hedged_download(hedge["urls"], hedge["part"], hedge["sha256"])
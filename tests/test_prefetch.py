@@ -0,0 +1,57 @@
+import threading
+
+from conftest import publish
+
+
+def stage(devops, prefetcher, app, url, results):
+    """fetch_artifact() as app's prefetch job would run it."""
+    control = {"app": app, "cancel": prefetcher.cancels.setdefault(app, threading.Event()),
+               "limiter": prefetcher.limiter, "prefetcher": prefetcher}
+
+    def job():
+        devops._prefetch_control.set(control)
+        try:
+            results[app] = devops.fetch_artifact(url)
+        except Exception as e:
+            results[app] = e
+
+    thread = threading.Thread(target=job)
+    thread.start()
+    return thread
+
+
+def test_jobs_waiting_for_a_slot_join_a_shared_download(fast_network, http_server, monkeypatch):
+    devops = fast_network
+    monkeypatch.setattr(devops, "PREFETCH_WORKERS", 1)
+    url = publish(http_server, "keys/shared.gpg", "shared key\n")
+    results = {}
+    with devops.Prefetcher() as prefetcher:
+        # Everyone queues for the only slot, so nobody sees the download start before it
+        prefetcher.slots.acquire()
+        threads = [stage(devops, prefetcher, app, url, results) for app in ("docker", "code", "gh")]
+        threading.Event().wait(0.1)
+        prefetcher.slots.release()
+        for thread in threads:
+            thread.join()
+
+        staged = set(results.values())
+        assert len(staged) == 1 and isinstance(next(iter(staged)), str)
+        assert len([r for r in http_server.requests if r[0] == "GET"]) == 1
+
+        # The install step then claims the staged file instead of downloading again
+        path = devops.fetch_artifact(url)
+    assert open(path).read() == "shared key\n"
+    assert len([r for r in http_server.requests if r[0] == "GET"]) == 1
+
+
+def test_cancelled_prefetch_does_not_stage(fast_network, http_server):
+    devops = fast_network
+    url = publish(http_server, "keys/docker.gpg", "docker key\n")
+    results = {}
+    with devops.Prefetcher() as prefetcher:
+        prefetcher.cancels["docker"] = threading.Event()
+        prefetcher.cancel("docker")
+        stage(devops, prefetcher, "docker", url, results).join()
+
+    assert isinstance(results["docker"], devops._Cancelled)
+    assert not http_server.requests
@@ -0,0 +1,89 @@
+import json
+import os
+
+import pytest
+
+from conftest import commit, git
+
+
+@pytest.fixture
+def repo(tmp_path, git_env, monkeypatch):
+    path = tmp_path / "repo"
+    path.mkdir()
+    git(path, "init", "--quiet")
+    commit(path, "README")
+    monkeypatch.chdir(path)
+    return path
+
+
+def delete(repo, *names, message="delete"):
+    git(repo, "rm", "--quiet", *names)
+    git(repo, "commit", "--quiet", "-m", message)
+    return git(repo, "rev-parse", "HEAD")
+
+
+def test_paths_with_spaces_map_to_the_newest_deleting_commit(devops, repo):
+    commit(repo, "my notes.txt", "first\n")
+    delete(repo, "my notes.txt")
+    commit(repo, "my notes.txt", "second\n")
+    newest = delete(repo, "my notes.txt")
+    commit(repo, "kept file.txt")
+
+    assert devops.index_deleted_files() == {"my notes.txt": newest}
+
+    devops.restore_files({"my notes.txt": newest})
+    assert (repo / "my notes.txt").read_text() == "second\n"
+    assert git(repo, "diff", "--cached", "--name-only") == "my notes.txt"
+
+
+def test_renamed_away_path_is_indexed_under_its_old_name(devops, repo):
+    commit(repo, "old name.txt", "content\n")
+    git(repo, "mv", "old name.txt", "new name.txt")
+    git(repo, "commit", "--quiet", "-m", "rename")
+    renamed = git(repo, "rev-parse", "HEAD")
+
+    assert devops.index_deleted_files() == {"old name.txt": renamed}
+
+
+def test_deletion_merged_from_a_branch_restores_from_the_first_parent(devops, repo):
+    commit(repo, "a.txt", "a\n")
+    commit(repo, "b.txt", "b\n")
+    git(repo, "checkout", "--quiet", "-b", "cleanup")
+    delete(repo, "a.txt", "b.txt")
+    git(repo, "checkout", "--quiet", "main")
+    commit(repo, "c.txt")
+    git(repo, "merge", "--quiet", "--no-ff", "--no-edit", "cleanup")
+    merge = git(repo, "rev-parse", "HEAD")
+
+    index = devops.index_deleted_files()
+    assert index == {"a.txt": merge, "b.txt": merge}
+
+    devops.restore_files(index)
+    assert (repo / "a.txt").read_text() == "a\n"
+    assert (repo / "b.txt").read_text() == "b\n"
+
+
+def test_commit_count_bounds_the_search(devops, repo):
+    commit(repo, "old.txt")
+    delete(repo, "old.txt")
+    commit(repo, "new.txt")
+    newest = delete(repo, "new.txt")
+
+    assert devops.index_deleted_files(commits=1) == {"new.txt": newest}
+    assert set(devops.index_deleted_files(commits=5)) == {"old.txt", "new.txt"}
+
+
+def test_relative_dates_are_cached_as_absolute_timestamps(devops, repo, monkeypatch):
+    monkeypatch.setenv("GIT_COMMITTER_DATE", "2020-01-01T12:00:00Z")
+    commit(repo, "ancient.txt")
+    delete(repo, "ancient.txt")
+    monkeypatch.delenv("GIT_COMMITTER_DATE")
+    commit(repo, "recent.txt")
+    recent = delete(repo, "recent.txt")
+
+    assert devops.index_deleted_files(since="2.weeks.ago") == {"recent.txt": recent}
+    assert devops.index_deleted_files(until="2021-01-01") == {"ancient.txt": git(repo, "rev-parse", "HEAD~2")}
+
+    with open(os.path.join(repo, ".git", "devops-setup-deleted.json")) as f:
+        [key] = json.load(f)
+    assert "2021-01-01" not in key and "--min-age=" in key
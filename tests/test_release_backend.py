@@ -0,0 +1,116 @@
+import json
+import os
+
+import pytest
+
+from benchmarks import harness
+from conftest import publish
+
+
+def republish(devops, server, version, monkeypatch):
+    monkeypatch.setattr(harness, "RELEASE_VERSION", version)
+    harness.release_fixtures(server.root)
+
+
+def lock(devops):
+    with open(devops.RELEASE_LOCK_FILE) as f:
+        return json.load(f)["tools"]
+
+
+def test_latest_pointer_that_is_not_json_raises_oserror_and_is_not_cached(releases, http_server):
+    pointer = "repos/kubernetes/minikube/releases/latest"
+    publish(http_server, pointer, "<html>rate limited</html>")
+
+    with pytest.raises(OSError, match=pointer):
+        releases.release_asset("minikube")
+    with releases._artifact_index() as index:
+        assert not any(pointer in key for key in index)
+
+    # Fixed upstream: the next attempt succeeds without waiting out ARTIFACT_TTL
+    publish(http_server, pointer, json.dumps({"tag_name": "v1.0.0"}))
+    assert releases.release_asset("minikube")["version"] == "v1.0.0"
+
+
+@pytest.mark.parametrize("body", ['{"name": "v1.0.0"}', '{"tag_name": null}', "[]", "<!doctype html>"])
+def test_malformed_latest_pointers_raise_oserror(releases, http_server, body):
+    publish(http_server, "projects/gitlab-org/cli/releases/permalink/latest", body)
+    with pytest.raises(OSError, match="Unexpected response"):
+        releases.release_asset("glab")
+
+
+def test_text_pointer_must_hold_a_version(releases, http_server):
+    publish(http_server, "release/stable.txt", "<html>error</html>")
+    with pytest.raises(OSError, match="stable.txt"):
+        releases.release_asset("kubectl")
+
+
+def test_bad_pointer_fails_only_its_tool(releases, http_server, capsys):
+    publish(http_server, "repos/kubernetes/minikube/releases/latest", "<html>rate limited</html>")
+
+    status = releases.install_apps(["minikube", "kubectl"])
+
+    assert status["minikube:fetch"] == "failed"
+    assert status["minikube:place"] == "skipped"
+    assert status["kubectl:verify"] == "ok"
+    assert "Install summary" in capsys.readouterr().out
+
+
+def test_install_places_binaries_and_trees_and_pins_them(releases):
+    status = releases.install_apps(["kubectl", "helm", "node"], node_version="22")
+    assert set(status.values()) == {"ok"}
+
+    bin_dir = os.path.join(releases.RELEASE_PREFIX, "bin")
+    for app in ("kubectl", "helm"):
+        assert os.access(os.path.join(bin_dir, app), os.X_OK)
+    assert os.readlink(os.path.join(bin_dir, "node")) == "../lib/nodejs/v22.0.0/bin/node"
+    assert not [name for name in os.listdir(bin_dir) if name.endswith(".tmp")]
+
+    pins = lock(releases)
+    arch = releases.release_arch("kubectl")
+    assert pins["kubectl"]["version"] == "v1.0.0"
+    assert pins["kubectl"]["channel"] == "latest"
+    assert pins["node"]["channel"] == "22"
+    with open(releases.fetch_artifact(releases.release_asset("helm")["url"]), "rb") as f:
+        assert pins["helm"]["assets"][arch]["sha256"] == releases.hashlib.sha256(f.read()).hexdigest()
+    with open(releases.INSTALL_LOG_FILE) as f:
+        assert sorted(line.split("] ")[1] for line in f) == \
+            [f"{app} installed successfully\n" for app in ("helm", "kubectl", "node")]
+
+
+def test_pin_wins_over_a_newer_release_until_upgrade(releases, http_server, monkeypatch):
+    releases.install_apps(["helm"])
+    republish(releases, http_server, "v1.1.0", monkeypatch)
+
+    assert releases.release_asset("helm")["version"] == "v1.0.0"
+    assert releases.release_asset("helm", {"upgrade": True})["version"] == "v1.1.0"
+
+    releases.install_apps(["helm"], upgrade=True)
+    assert lock(releases)["helm"]["version"] == "v1.1.0"
+
+
+def test_pinned_checksum_is_used_instead_of_the_published_one(releases, http_server):
+    releases.install_apps(["kubectl"])
+    arch = releases.release_arch("kubectl")
+    os.remove(os.path.join(http_server.root, f"release/v1.0.0/bin/linux/{arch}/kubectl.sha256"))
+
+    asset = releases.release_asset("kubectl")
+    assert asset["sha256"] == lock(releases)["kubectl"]["assets"][arch]["sha256"]
+
+
+def test_tampered_asset_is_rejected_against_the_pin(releases, http_server):
+    releases.install_apps(["kubectl"])
+    arch = releases.release_arch("kubectl")
+    publish(http_server, f"release/v1.0.0/bin/linux/{arch}/kubectl", b"tampered")
+    with releases._artifact_index() as index:
+        index.clear()
+
+    status = releases.install_apps(["kubectl"], force=True)
+    assert status["kubectl:fetch"] == "failed"
+
+
+def test_changing_the_node_channel_reinstalls(releases):
+    releases.install_apps(["node"], node_version="22")
+    rows = releases.converge_plan(["node"], {"node_version": "22"})
+    assert not rows[0]["run"]
+    rows = releases.converge_plan(["node"], {"node_version": "20"})
+    assert rows[0]["run"]
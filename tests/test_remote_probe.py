@@ -0,0 +1,88 @@
+import subprocess
+
+import pytest
+
+from conftest import commit, git
+
+
+@pytest.fixture
+def repos(tmp_path, git_env, monkeypatch):
+    """A bare remote with many branches and tags, a pushing clone, and the clone under
+    test as the working directory (probes run against the current repo)."""
+    remote = tmp_path / "remote.git"
+    git(tmp_path, "init", "--quiet", "--bare", str(remote))
+    other = tmp_path / "other"
+    git(tmp_path, "clone", "--quiet", str(remote), str(other))
+    head = commit(other, "README")
+    refs = "".join(f"create refs/heads/feature/{n} {head}\ncreate refs/tags/v0.{n} {head}\n" for n in range(50))
+    subprocess.run(["git", "-C", str(other), "update-ref", "--stdin"], input=refs, text=True, check=True)
+    git(other, "push", "--quiet", "origin", "refs/heads/*:refs/heads/*", "refs/tags/*:refs/tags/*")
+    local = tmp_path / "local"
+    git(tmp_path, "clone", "--quiet", str(remote), str(local))
+    monkeypatch.chdir(local)
+    return remote, local, other
+
+
+@pytest.fixture
+def git_calls(devops, monkeypatch):
+    calls = []
+    real = devops.run_git_command
+    monkeypatch.setattr(devops, "run_git_command", lambda args, **kwargs: calls.append(args) or real(args, **kwargs))
+    return calls
+
+
+def test_asks_for_the_one_branch_only(devops, repos, git_calls):
+    remote, _, _ = repos
+
+    assert devops.probe_remote_ref("origin", "main") == git(remote, "rev-parse", "main")
+    assert git_calls == [["git", "ls-remote", "origin", "refs/heads/main"]]
+
+
+def test_answer_is_reused_until_refreshed(devops, repos, git_calls):
+    _, _, other = repos
+    first = devops.probe_remote_ref("origin", "main")
+    head = commit(other, "later.txt")
+    git(other, "push", "--quiet", "origin", "HEAD:main")
+
+    assert devops.probe_remote_ref("origin", "main") == first
+    assert devops.probe_remote_ref("origin", "main", refresh=True) == head
+    assert len(git_calls) == 2
+
+
+def test_missing_branch_is_none(devops, repos):
+    assert devops.probe_remote_ref("origin", "no-such-branch") is None
+
+
+def test_in_sync_needs_nothing(devops, repos):
+    assert devops.remote_sync_plan(devops.probe_remote_ref("origin", "main")) == (False, False)
+
+
+def test_local_commits_only_need_a_push(devops, repos):
+    _, local, _ = repos
+    commit(local, "local.txt")
+
+    assert devops.remote_sync_plan(devops.probe_remote_ref("origin", "main")) == (False, True)
+
+
+def test_unknown_remote_commit_needs_a_pull(devops, repos):
+    _, local, other = repos
+    commit(other, "upstream.txt")
+    git(other, "push", "--quiet", "origin", "HEAD:main")
+    commit(local, "local.txt")
+
+    # Without fetching, the remote head is an object this clone has never seen
+    assert devops.remote_sync_plan(devops.probe_remote_ref("origin", "main")) == (True, True)
+
+
+def test_new_remote_branch_only_needs_a_push(devops, repos):
+    assert devops.remote_sync_plan(devops.probe_remote_ref("origin", "topic")) == (False, True)
+
+
+def test_empty_local_repo_only_needs_a_pull(devops, repos, tmp_path, monkeypatch):
+    remote, _, _ = repos
+    empty = tmp_path / "empty"
+    git(tmp_path, "init", "--quiet", str(empty))
+    git(empty, "remote", "add", "origin", str(remote))
+    monkeypatch.chdir(empty)
+
+    assert devops.remote_sync_plan(devops.probe_remote_ref("origin", "main")) == (True, False)
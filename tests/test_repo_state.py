@@ -0,0 +1,63 @@
+import os
+import subprocess
+
+import pytest
+
+from conftest import commit, git, write_executable
+
+
+@pytest.fixture
+def repo(tmp_path, git_env):
+    """A clone one commit ahead of its bare remote."""
+    remote = tmp_path / "remote.git"
+    git(tmp_path, "init", "--quiet", "--bare", str(remote))
+    path = tmp_path / "repo"
+    git(tmp_path, "clone", "--quiet", str(remote), str(path))
+    commit(path, "README")
+    git(path, "push", "--quiet", "origin", "HEAD:main")
+    commit(path, "ahead.txt")
+    return path
+
+
+def test_counts_every_kind_of_change(devops, repo):
+    commit(repo, "old name.txt")
+    commit(repo, "gone file.txt")
+    commit(repo, "edited.txt")
+    git(repo, "mv", "old name.txt", "new name.txt")
+    os.remove(repo / "gone file.txt")
+    (repo / "edited.txt").write_text("changed\n")
+    (repo / "new.txt").write_text("new\n")
+
+    state = devops.RepoState(cwd=str(repo))
+
+    assert (state.head, state.upstream, state.ahead, state.behind) == ("main", "origin/main", 4, 0)
+    assert (state.staged, state.unstaged, state.untracked, state.conflicted) == (1, 2, 1, 0)
+    assert state.deleted == ["gone file.txt"]
+    assert state.oid == git(repo, "rev-parse", "HEAD")
+
+
+def test_streams_large_status_output(devops, repo):
+    for i in range(3000):
+        (repo / f"untracked {i:04d}.txt").write_text("")
+
+    assert devops.RepoState(cwd=str(repo)).untracked == 3000
+
+
+def test_chatty_stderr_does_not_stall_the_reader(devops, repo, tmp_path, monkeypatch):
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    real_git = subprocess.run(["sh", "-c", "command -v git"], capture_output=True, text=True).stdout.strip()
+    # Far more stderr than a pipe buffer holds, all before the first byte of stdout
+    write_executable(bin_dir / "git",
+                     f'head -c 1000000 /dev/zero | tr "\\0" w >&2\nexec "{real_git}" "$@"\n')
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+
+    assert devops.RepoState(cwd=str(repo)).ahead == 1
+
+
+def test_failure_reports_git_stderr(devops, tmp_path, git_env, capsys):
+    with pytest.raises(subprocess.CalledProcessError) as raised:
+        devops.RepoState(cwd=str(tmp_path))
+
+    assert "not a git repository" in raised.value.stderr
+    assert "not a git repository" in capsys.readouterr().out
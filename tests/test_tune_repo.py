@@ -0,0 +1,43 @@
+import os
+import subprocess
+
+import pytest
+
+from conftest import git, write_executable
+
+
+@pytest.fixture
+def repo(tmp_path, git_env):
+    path = tmp_path / "repo"
+    path.mkdir()
+    git(path, "init", "--quiet")
+    return path
+
+
+def test_tuning_is_offered_until_applied_or_declined(devops, repo):
+    assert devops.should_offer_tuning(str(repo))
+
+    git(repo, "config", "--local", devops.TUNE_DECLINED_KEY, "true")
+    assert not devops.should_offer_tuning(str(repo))
+
+
+def test_applied_profile_is_not_offered_again(devops, repo):
+    for key, value in devops.LARGE_REPO_SETTINGS.items():
+        git(repo, "config", "--local", key, value)
+    git(repo, "config", "--local", "maintenance.strategy", "incremental")
+
+    assert devops.is_repo_tuned(str(repo))
+    assert not devops.should_offer_tuning(str(repo))
+
+
+@pytest.mark.parametrize("features, supported", [("feature: fsmonitor--daemon\n", True), ("", False)])
+def test_fsmonitor_support_comes_from_the_build_options(devops, tmp_path, monkeypatch, features, supported):
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    real_git = subprocess.run(["sh", "-c", "command -v git"], capture_output=True, text=True).stdout.strip()
+    build_options = f"git version 2.45.0\ncpu: x86_64\n{features}"
+    write_executable(bin_dir / "git", f'[ "$*" = "version --build-options" ] && printf "{build_options}" '
+                                      f'&& exit 0\nexec "{real_git}" "$@"\n')
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+
+    assert devops._fsmonitor_supported() is supported
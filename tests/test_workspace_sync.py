@@ -0,0 +1,71 @@
+import pytest
+
+from conftest import commit, git
+
+
+@pytest.fixture
+def repos(tmp_path, git_env):
+    """A bare remote with one commit, the clone under test and a second clone that pushes."""
+    remote = tmp_path / "remote.git"
+    git(tmp_path, "init", "--quiet", "--bare", str(remote))
+    seed = tmp_path / "seed"
+    git(tmp_path, "clone", "--quiet", str(remote), str(seed))
+    commit(seed, "README")
+    git(seed, "push", "--quiet", "origin", "HEAD:main")
+    local = tmp_path / "local"
+    git(tmp_path, "clone", "--quiet", str(remote), str(local))
+    return remote, local, seed
+
+
+def test_up_to_date(devops, repos):
+    _, local, _ = repos
+    assert devops.sync_repo(str(local)) == ("up to date", "")
+
+
+def test_behind_with_upstream_already_fetched_rebases(devops, repos):
+    remote, local, other = repos
+    head = commit(other, "upstream.txt")
+    git(other, "push", "--quiet", "origin", "HEAD:main")
+    # The remote head already matches the tracking ref, but the branch is behind it
+    git(local, "fetch", "--quiet")
+
+    assert devops.sync_repo(str(local)) == ("synced", "pulled 1")
+    assert git(local, "rev-parse", "HEAD") == head
+
+
+def test_ahead_pushes(devops, repos):
+    remote, local, _ = repos
+    head = commit(local, "local.txt")
+
+    assert devops.sync_repo(str(local)) == ("synced", "pushed 1")
+    assert git(remote, "rev-parse", "main") == head
+
+
+def test_diverged_rebases_then_pushes(devops, repos):
+    remote, local, other = repos
+    commit(other, "upstream.txt")
+    git(other, "push", "--quiet", "origin", "HEAD:main")
+    commit(local, "local.txt")
+
+    assert devops.sync_repo(str(local)) == ("synced", "pulled 1, pushed 1")
+    assert git(remote, "rev-parse", "main") == git(local, "rev-parse", "HEAD")
+    assert (local / "upstream.txt").exists()
+
+
+def test_dirty_worktree_is_skipped(devops, repos):
+    remote, local, other = repos
+    commit(other, "upstream.txt")
+    git(other, "push", "--quiet", "origin", "HEAD:main")
+    before = git(local, "rev-parse", "HEAD")
+    (local / "scratch.txt").write_text("wip\n")
+
+    assert devops.sync_repo(str(local)) == ("skipped", "unstaged or untracked changes")
+    assert git(local, "rev-parse", "HEAD") == before
+
+
+def test_pull_disabled_leaves_behind_repo_alone(devops, repos):
+    _, local, other = repos
+    commit(other, "upstream.txt")
+    git(other, "push", "--quiet", "origin", "HEAD:main")
+
+    assert devops.sync_repo(str(local), pull=False) == ("skipped", "1 commit(s) behind, pulling disabled")